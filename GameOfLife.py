@@ -1,25 +1,40 @@
+import argparse
 import math
+import os
 import sys
+import threading
 import time
+import traceback
 import pygame
 
-def time_counter(func):
-    def wrapper(*args, **kwargs):
-        t = time.monotonic()
-        result = func(*args, **kwargs)
-        print(func.__name__, math.ceil((time.monotonic() - t) * 1000))
-        return result
-    return wrapper
+from engine import patterns
+from engine import (BitboardEngine, BoundedEngine, DenseEngine, HashLifeEngine, PackedEngine, ParallelEngine,
+                    SparseEngine, TileEngine)
+from engine.autosave import Saver
+from engine.bounded import OUTSIDE
+from engine.census import census, write_census
+from engine.metrics import Metrics
+from engine.profiling import Profiler
+from engine.remote import RemoteSimulation
+from engine.saves import read_positions
+from engine.simulation import Simulation
+
+# Замеры производительности (F3 - включить вместе с панелью, F4 - выгрузить в metrics/)
+metrics = Metrics()
+# Снимки профиля (F5 - окно поколений, F6 - окно кадров, или флаг --profile)
+profiler = Profiler()
+# Запись сохранений в фоне: окно и воркер не ждут диска
+saver = Saver()
 
 
 class Window:
     def __init__(self, width: int, height: int,
                  fps_limit=20,
-                 scale=20, camera_pos=(0, 0)):
+                 scale=20, camera_pos=(0, 0), simulation=None):
         self.width = width
         self.height = height
 
-        self.game_screen = GameScreen(self, scale, camera_pos, fps_limit)
+        self.game_screen = GameScreen(self, scale, camera_pos, fps_limit, simulation)
         self.main_menu = MainMenu(self)
         self.settings_menu = SettingsMenu(self)
         self.screens = [self.game_screen, self.main_menu, self.settings_menu]
@@ -27,8 +42,18 @@ class Window:
         self.current_screen = self.main_menu
 
         self.display = pygame.display.set_mode((width, height), pygame.RESIZABLE)
+        # Частота обновления экрана: чаще кадры не рисуются. Старый pygame её не сообщает
+        self.refresh_rate = 60
+        if hasattr(pygame.display, "get_current_refresh_rate"):
+            self.refresh_rate = pygame.display.get_current_refresh_rate() or self.refresh_rate
+        # Обработчики событий только отмечают, что нужен кадр; рисует главный цикл
+        # один раз за проход, сколько бы событий ни пришло
+        self.redraw_needed = False
         self.draw()
 
+    def request_draw(self):
+        self.redraw_needed = True
+
     def update(self):
         self.current_screen.update()
 
@@ -37,9 +62,12 @@ class Window:
             screen.set_shape(width=w, height=h)
             screen.calculate_shapes()
 
-        self.draw()
+        self.request_draw()
 
+    @metrics.timed("draw_ms")
+    @profiler.captured("frames", lambda window: window.game_screen.simulation.describe())
     def draw(self):
+        self.redraw_needed = False
         self.current_screen.draw(self.display)
 
         pygame.display.flip()
@@ -49,41 +77,73 @@ class EventHandler:
     def __init__(self, window: Window):
         self._window = window
 
+    @metrics.timed("events_ms")
+    def handle(self, event):
+        if event.type == pygame.KEYDOWN:
+            self.key_down(event.dict["key"])
+
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            self.mouse_button_down(event.dict["button"])
+
+        elif event.type == pygame.MOUSEBUTTONUP:
+            self.mouse_button_up(event.dict["button"])
+
+        elif event.type == pygame.MOUSEWHEEL:
+            self.mouse_wheel(event.dict["y"])
+
+        elif event.type == pygame.WINDOWLEAVE:
+            self.window_leave()
+
+        elif event.type == pygame.VIDEORESIZE:
+            self.resize(event.dict["w"], event.dict["h"])
+
+        elif event.type == pygame.QUIT:
+            saver.wait()
+            pygame.quit()
+            sys.exit()
+
     def key_down(self, key_number: int):
+        if key_number == pygame.K_F3:
+            self._window.game_screen.toggle_hud()
+        elif key_number == pygame.K_F4:
+            self._window.game_screen.export_metrics()
+        elif key_number == pygame.K_F5:
+            profiler.start("generations")
+        elif key_number == pygame.K_F6:
+            profiler.start("frames")
+
         if key_number in self._window.game_screen.sim_field.possible_key_numbers:
             self._window.game_screen.sim_field.key_down(key_number)
 
-        self._window.draw()
+        self._window.request_draw()
 
     def mouse_button_down(self, key_number: int):
         if key_number == 1:
             self._window.current_screen.on_press()
 
-        self._window.draw()
+        self._window.request_draw()
 
     def mouse_button_up(self, key_number: int):
 
         if key_number == 1:
             self._window.current_screen.on_release()
 
-        self._window.draw()
+        self._window.request_draw()
 
     def mouse_wheel(self, value: int):
         self._window.current_screen.scroll(value)
 
-        self._window.draw()
+        self._window.request_draw()
 
     def resize(self, w, h):
         self._window.resize(w, h)
 
-        self._window.draw()
-
     def window_leave(self):
         if self._window.current_screen.pressed_widget is not None:
             self._window.current_screen.on_press_cancel()
             self._window.current_screen.pressed_widget = None
 
-            window.draw()
+            self._window.request_draw()
 
 
 class Widget:
@@ -103,6 +163,12 @@ class Widget:
     def get_size_hint(self):
         return self._size_hint
 
+    def get_pos(self):
+        return self._pos
+
+    def get_size(self):
+        return self._width, self._height
+
     def get_widgets(self):
         return [self]
 
@@ -344,36 +410,69 @@ class Button(Widget):
 
 
 class GameScreen(Screen):
-    def __init__(self, window: Window, scale, camera_pos, fps_limit):
+    def __init__(self, window: Window, scale, camera_pos, fps_limit, simulation=None):
         super().__init__(window)
         self.layout_base = BoxLayout(rotation="vertical")
         self.add_widget(self.layout_base)
 
-        self.last_frame_time = time.monotonic()
         self.fps_limit = fps_limit
         self.update_interval = 1 / fps_limit
         self.game_stopped = True
 
-        dot = dict(name="точка", data=[(0, 0)])
-        glider = dict(name="глайдер", data=[(0, -1), (1, 0), (-1, 1), (0, 1), (1, 1)])
-        ship = dict(name='корабль', data=[(3, 2), (-1, -1), (2, -1), (1, 2), (2, 2), (3, 1), (3, 0), (0, 2), (-1, 1)])
-        cross = dict(name='крест',
-                     data=[(4, 0), (3, -1), (-3, 0), (1, -3), (2, 2), (-2, -1), (-1, 4), (-1, -1), (-1, -2), (4, 2),
-                           (-3, 2), (2, -2), (2, 4), (2, -1), (0, 4), (-1, -3), (-1, 3), (4, -1), (3, 2), (-1, 2),
-                           (4, 1), (-3, -1), (0, -3), (-3, 1), (2, -3), (1, 4), (2, 3), (-2, 2)])
-        galaxy = dict(name='галактика',
-                      data=[(4, 0), (3, 4), (4, -3), (4, 3), (3, 1), (-3, -3), (3, -1), (-3, 0), (0, -4), (-3, 3),
-                            (1, -3), (2, -4), (1, 3), (-4, -2), (-4, -1), (-4, 4), (-4, 1), (-1, 4), (-2, 4), (3, -3),
-                            (4, -4), (4, 2), (3, 0), (3, 3), (-3, -4), (1, -4), (0, 4), (-4, -3), (-4, 0), (-1, -3),
-                            (-4, 3), (-2, 3), (-1, 3), (4, -1), (3, 2), (3, -4), (4, 1), (4, 4), (-3, -2), (0, -3),
-                            (-3, -1), (-3, 4), (-3, 1), (2, -3), (0, 3), (1, 4), (-4, -4), (-1, -4)])
+        # Гиперскорость: за один шаг мир продвигается на 2 ** hyper_speed_power поколений
+        self.hyper_speed = False
+        self.hyper_speed_power = 6
+
+        dot = dict(name="точка", data=patterns.DOT)
+        glider = dict(name="глайдер", data=patterns.GLIDER)
+        ship = dict(name='корабль', data=patterns.SHIP)
+        cross = dict(name='крест', data=patterns.CROSS)
+        galaxy = dict(name='галактика', data=patterns.GALAXY)
 
         self.brushes = [dot, glider, ship, cross, galaxy]
         self.current_brush_index = 0
 
+        # Сохранения лежат в saves/slot<N>.gol, рядом - экспорт в RLE
+        self.save_dir = "saves"
+        self.save_slot = 1
+        # Автосохранение в saves/autosave.gol (слот 0) каждые autosave_generations поколений
+        # или autosave_seconds секунд, что наступит раньше; None - без этого условия
+        self.autosave_enabled = False
+        self.autosave_generations = 1000
+        self.autosave_seconds = 60
+        self._autosave_generation = 0
+        self._autosave_time = time.monotonic()
+        self._saves_shown = []
+
+        # История: шаг назад и перемотка к поколению. seek_generation - выбранное колесом
+        # поколение, None - кнопка показывает текущее
+        self.history_enabled = False
+        self.seek_generation = None
+        self.seek_scroll_step = 10
+        # При найденном цикле игра останавливается
+        self.auto_pause = False
+        # Панель производительности поверх поля; замеры ведутся, пока она показана
+        self.hud_shown = False
+        self.metrics_dir = "metrics"
+        # Перепись объектов (engine.census) считается в отдельном потоке по снимку поля;
+        # census_result - dict(generation=..., objects=[...], error=...) последней переписи
+        self.census_spacing = 2
+        self.census_lines = 15
+        self.census_result = None
+        self.census_shown = False
+        self.census_dir = "census"
+        self._census_thread = None
+
         # Описание экрана
         if True:
-            self.sim_field = SimulationField(scale, list(camera_pos))
+            # Свой мир или мир сервера engine.server (engine.remote.RemoteSimulation)
+            self.simulation = simulation if simulation is not None else Simulation(metrics=metrics, profiler=profiler)
+            # Зрителю без права управления скорость не отправляется: сервер ответил бы ошибкой.
+            # Право приходит от сервера уже после подключения, update досылает скорость тогда
+            self._controlled = self._can_control()
+            if self._controlled:
+                self.simulation.set_interval(self.update_interval)
+            self.sim_field = SimulationField(self.simulation, scale, list(camera_pos))
             self.layout_base.add_widget(self.sim_field)
 
             self.layout_buttons = BoxLayout(size_hint=0.1, rotation="horizontal")
@@ -382,7 +481,7 @@ class GameScreen(Screen):
                 self.toggle = Button(on_release=self.toggle_on_release, text="Продолжить", color=(200, 100, 100))
                 self.layout_buttons.add_widget(self.toggle)
 
-                self.layout_speed_control = BoxLayout(size_hint=0.15, rotation="horizontal")
+                self.layout_speed_control = BoxLayout(size_hint=0.12, rotation="horizontal")
                 self.layout_buttons.add_widget(self.layout_speed_control)
                 if True:
                     self.game_speed_scroll_changer = Button(scroll=self.gs_changer_scroll, text=f"{self.fps_limit} fps")
@@ -396,38 +495,218 @@ class GameScreen(Screen):
 
                         self.game_speed_button_down = Button(text="-", color=(200, 100, 100), on_release=self.gs_btn_down_on_release)
                         self.layout_speed_buttons.add_widget(self.game_speed_button_down)
-                self.clear_button = Button(size_hint=0.15, text="Очистить", on_release=self.clear_btn_on_release)
+
+                self.hyper_speed_button = Button(size_hint=0.08, text="x1", on_release=self.hs_btn_on_release,
+                                                 scroll=self.hs_btn_scroll)
+                self.layout_buttons.add_widget(self.hyper_speed_button)
+                self.clear_button = Button(size_hint=0.1, text="Очистить", on_release=self.clear_btn_on_release)
                 self.layout_buttons.add_widget(self.clear_button)
 
-                self.brush_menu = MenuLayout(size_hint=0.15, text="Кисти")
+                self.brush_menu = MenuLayout(size_hint=0.1, text="Кисти")
                 self.layout_buttons.add_widget(self.brush_menu)
                 for i in range(len(self.brushes)):
                     self.add_brush_button(i)
 
-                self.save_menu = MenuLayout(size_hint=0.15, text="Сохранение")
+                self.save_menu = MenuLayout(size_hint=0.12, text="Сохранение")
                 self.layout_buttons.add_widget(self.save_menu)
                 if True:
                     self.save_button = Button(text="Сохранить", on_release=self.save_game)
                     self.save_menu.add_widget(self.save_button)
 
-                    self.save_button = Button(text="Загрузить", on_release=self.load_game)
-                    self.save_menu.add_widget(self.save_button)
+                    self.load_button = Button(text="Загрузить", on_release=self.load_game)
+                    self.save_menu.add_widget(self.load_button)
+
+                    self.slot_button = Button(text=f"Слот {self.save_slot}", scroll=self.slot_btn_scroll)
+                    self.save_menu.add_widget(self.slot_button)
+
+                    self.export_button = Button(text="Экспорт RLE", on_release=self.export_rle)
+                    self.save_menu.add_widget(self.export_button)
+
+                    self.import_button = Button(text="Импорт RLE", on_release=self.import_rle)
+                    self.save_menu.add_widget(self.import_button)
+
+                    self.autosave_button = Button(text="Автосохр.: выкл", on_release=self.autosave_btn_on_release)
+                    self.save_menu.add_widget(self.autosave_button)
+
+                self.history_menu = MenuLayout(size_hint=0.12, text="История")
+                self.layout_buttons.add_widget(self.history_menu)
+                if True:
+                    self.history_button = Button(text="Запись: выкл", on_release=self.history_btn_on_release)
+                    self.history_menu.add_widget(self.history_button)
+
+                    self.step_back_button = Button(text="Назад", on_release=self.step_back_btn_on_release)
+                    self.history_menu.add_widget(self.step_back_button)
+
+                    self.step_forward_button = Button(text="Вперёд", on_release=self.step_forward_btn_on_release)
+                    self.history_menu.add_widget(self.step_forward_button)
+
+                    self.seek_button = Button(text="Ген 0", on_release=self.seek_btn_on_release,
+                                              scroll=self.seek_btn_scroll)
+                    self.history_menu.add_widget(self.seek_button)
 
-                self.back_button = Button(size_hint=0.15, text="Меню", on_release=self.back_btn_on_release)
+                    self.cycle_button = Button(text="Цикл: нет")
+                    self.history_menu.add_widget(self.cycle_button)
+
+                    self.auto_pause_button = Button(text="Автопауза: выкл", on_release=self.auto_pause_btn_on_release)
+                    self.history_menu.add_widget(self.auto_pause_button)
+
+                self.census_menu = MenuLayout(size_hint=0.12, text="Перепись")
+                self.layout_buttons.add_widget(self.census_menu)
+                if True:
+                    self.census_button = Button(text="Посчитать", on_release=self.census_btn_on_release)
+                    self.census_menu.add_widget(self.census_button)
+
+                    self.census_show_button = Button(text="Скрыть", on_release=self.census_show_btn_on_release)
+                    self.census_menu.add_widget(self.census_show_button)
+
+                    self.census_spacing_button = Button(text=f"Зазор {self.census_spacing}",
+                                                        scroll=self.census_spacing_btn_scroll)
+                    self.census_menu.add_widget(self.census_spacing_button)
+
+                    self.census_export_button = Button(text="Экспорт CSV", on_release=self.export_census)
+                    self.census_menu.add_widget(self.census_export_button)
+
+                self.back_button = Button(size_hint=0.1, text="Меню", on_release=self.back_btn_on_release)
                 self.layout_buttons.add_widget(self.back_button)
 
     def update(self):
-        if not self.game_stopped:
-            if time.monotonic() - self.last_frame_time > self.update_interval:
-                self.sim_field.calculate_next_gen()
-
-                self._window.draw()
+        # Поколения считает фоновый воркер, здесь только запрос отрисовки готовых кадров
+        if self.sim_field.has_new_frame():
+            if self.seek_generation is None:
+                self.seek_button.set_text(f"Ген {self.simulation.get_generation()}")
+            self._update_cycle_btn_text()
+            # Воркер остановился сам (автопауза на цикле) или мир сервера запущен и остановлен другими:
+            # меняется только кнопка, состояние мира и так уже такое
+            if self.game_stopped == self.simulation.is_running():
+                self._set_game_stopped(not self.game_stopped)
+            self._window.request_draw()
+
+        controlled = self._can_control()
+        if controlled and not self._controlled:
+            self.simulation.set_interval(self.update_interval)
+            self.update_hs_btn_text()
+        self._controlled = controlled
+
+        if self._census_thread is not None and not self._census_thread.is_alive():
+            self._census_thread = None
+            self._window.request_draw()
+
+        if self.autosave_enabled:
+            self._autosave()
+        # Строка записей в работе перерисовывается, только когда они меняются
+        saves = saver.get_in_flight()
+        if saves != self._saves_shown:
+            self._saves_shown = saves
+            self._window.request_draw()
 
-                self.last_frame_time += self.update_interval
+    def draw(self, display: pygame.Surface):
+        super().draw(display)
+        if self.hud_shown:
+            self._draw_hud(display)
+        if self.census_shown:
+            self._draw_census(display)
+        self._draw_saves(display)
+
+    def toggle_hud(self):
+        self.hud_shown = not self.hud_shown
+        metrics.enabled = self.hud_shown
+
+    def export_metrics(self):
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        name = os.path.join(self.metrics_dir, time.strftime("metrics-%Y%m%d-%H%M%S"))
+        metrics.export(name + ".csv")
+        metrics.export(name + ".jsonl")
+
+    def _draw_hud(self, display: pygame.Surface):
+        def milliseconds(name, q):
+            value = metrics.percentile(name, q)
+            return "-" if value is None else f"{value:.1f}"
+
+        population = metrics.get_series("population")
+        # Кадр - промежуток между clock.tick главного цикла, отрисовка - только Window.draw
+        lines = [f"кадр p50 {milliseconds('frame_ms', 50)} мс, p99 {milliseconds('frame_ms', 99)} мс",
+                 f"отрисовка p50 {milliseconds('draw_ms', 50)} мс, p99 {milliseconds('draw_ms', 99)} мс",
+                 f"шаг p50 {milliseconds('step_ms', 50)} мс, p99 {milliseconds('step_ms', 99)} мс",
+                 f"поколений/с {metrics.rate('generations'):.1f}",
+                 f"клеток {'-' if population is None else int(population.get_last())}"]
+        if profiler.get_kind() is not None:
+            lines.append(f"профиль {profiler.get_kind()}: осталось {profiler.get_left()}")
+        elif profiler.last_path is not None:
+            lines.append(f"профиль: {profiler.last_path}.txt")
+
+        font = pygame.font.SysFont("couriernew", 16)
+        x, y = self.sim_field.get_pos()
+        for line in lines:
+            text = font.render(line, True, (255, 255, 0), (0, 0, 0))
+            display.blit(text, (x + 5, y + 5))
+            y += text.get_height()
+
+    def census_btn_on_release(self):
+        if self._census_thread is not None:
+            return
+        # Снимок неизменяем, поэтому мир может жить дальше, пока идёт перепись
+        generation, cells = self.simulation.snapshot()
+        rule = self.simulation.rule
+        spacing = self.census_spacing
+
+        def run():
+            try:
+                self.census_result = dict(generation=generation, objects=census(cells, rule, spacing), error=None)
+            except Exception as exception:
+                # Исключение потока иначе пропало бы: оно пишется в stderr и показывается в меню
+                traceback.print_exc()
+                self.census_result = dict(generation=generation, objects=[], error=exception)
+
+        self.census_shown = True
+        self.census_show_button.set_text("Скрыть")
+        self._census_thread = threading.Thread(target=run, daemon=True)
+        self._census_thread.start()
+
+    def census_show_btn_on_release(self):
+        self.census_shown = not self.census_shown
+        self.census_show_button.set_text("Скрыть" if self.census_shown else "Показать")
+
+    def census_spacing_btn_scroll(self, value):
+        self.census_spacing = min(8, max(1, self.census_spacing + value))
+        self.census_spacing_button.set_text(f"Зазор {self.census_spacing}")
+
+    def export_census(self):
+        if self.census_result is None or self.census_result["error"] is not None:
+            return
+        os.makedirs(self.census_dir, exist_ok=True)
+        name = time.strftime(f"census-gen{self.census_result['generation']}-%Y%m%d-%H%M%S.csv")
+        write_census(os.path.join(self.census_dir, name), self.census_result["objects"])
+
+    def _draw_census(self, display: pygame.Surface):
+        if self._census_thread is not None:
+            lines = ["перепись..."]
+        elif self.census_result is None:
+            lines = ["перепись: нет"]
+        elif self.census_result["error"] is not None:
+            lines = [f"ген {self.census_result['generation']}: ошибка переписи",
+                     f"{type(self.census_result['error']).__name__}: {self.census_result['error']}"]
+        else:
+            objects = self.census_result["objects"]
+            lines = [f"ген {self.census_result['generation']}: объектов {sum(item['count'] for item in objects)}"]
+            for item in objects[:self.census_lines]:
+                name = item["name"] or f"? {item['population']} кл."
+                lines.append(f"{item['count']:>7} {name}")
+            if len(objects) > self.census_lines:
+                lines.append(f"и ещё видов: {len(objects) - self.census_lines}")
+
+        font = pygame.font.SysFont("couriernew", 16)
+        texts = [font.render(line, True, (0, 255, 255), (0, 0, 0)) for line in lines]
+        x, y = self.sim_field.get_pos()
+        x += self.sim_field.get_size()[0] - max(text.get_width() for text in texts) - 5
+        for text in texts:
+            display.blit(text, (x, y + 5))
+            y += text.get_height()
 
     def toggle_on_release(self):
-        game_stopped = not self.game_stopped
+        self._set_game_stopped(not self.game_stopped)
+        self.simulation.set_running(not self.game_stopped)
 
+    def _set_game_stopped(self, game_stopped):
         if game_stopped:
             self.toggle.set_text("Продолжить")
             self.toggle.set_color((200, 100, 100))
@@ -437,27 +716,64 @@ class GameScreen(Screen):
 
         self.game_stopped = game_stopped
 
-        if not game_stopped:
-            self.last_frame_time = time.monotonic()
+    def _can_control(self):
+        # False - зритель сервера (engine.remote.RemoteSimulation) без права управления
+        return not hasattr(self.simulation, "has_control") or self.simulation.has_control()
 
     def gs_changer_scroll(self, value):
+        if not self._can_control():
+            return
         self.fps_limit = max(1, self.fps_limit + value)
         self.update_interval = 1 / self.fps_limit
-        self.last_frame_time = time.monotonic()
+        self.simulation.set_interval(self.update_interval)
         self.game_speed_scroll_changer.set_text(f"{self.fps_limit} fps")
 
     def gs_btn_up_on_release(self):
+        if not self._can_control():
+            return
         self.fps_limit += 1
         self.update_interval = 1 / self.fps_limit
+        self.simulation.set_interval(self.update_interval)
         self.game_speed_scroll_changer.set_text(f"{self.fps_limit} fps")
 
     def gs_btn_down_on_release(self):
+        if not self._can_control():
+            return
         self.fps_limit = max(1, self.fps_limit - 1)
         self.update_interval = 1 / self.fps_limit
+        self.simulation.set_interval(self.update_interval)
         self.game_speed_scroll_changer.set_text(f"{self.fps_limit} fps")
 
+    def hs_btn_on_release(self):
+        if not self._can_control():
+            return
+        self.hyper_speed = not self.hyper_speed
+        self.update_hs_btn_text()
+
+    def hs_btn_scroll(self, value):
+        if not self._can_control():
+            return
+        self.hyper_speed_power = min(30, max(1, self.hyper_speed_power + value))
+        limit = self.simulation.get_hyper_speed_limit()
+        if limit is not None:
+            self.hyper_speed_power = min(limit, self.hyper_speed_power)
+        self.update_hs_btn_text()
+
+    def update_hs_btn_text(self):
+        if self._can_control():
+            self.simulation.set_hyper_speed(self.hyper_speed_power if self.hyper_speed else None)
+
+        # Движки без advance ограничены меньшей степенью - кнопка показывает действующую
+        limit = self.simulation.get_hyper_speed_limit()
+        if self.hyper_speed and limit is not None and self.hyper_speed_power > limit:
+            self.hyper_speed_button.set_text(f"x2^{limit} (макс.)")
+        elif self.hyper_speed:
+            self.hyper_speed_button.set_text(f"x2^{self.hyper_speed_power}")
+        else:
+            self.hyper_speed_button.set_text("x1")
+
     def clear_btn_on_release(self):
-        self.sim_field.clear_sim_field()
+        self.simulation.clear()
 
     def add_brush_button(self, i):
         on_release = lambda: self.set_brush(i)
@@ -479,49 +795,125 @@ class GameScreen(Screen):
         self.sim_field.brush = self.brushes[i]["data"]
         self.current_brush_index = i
 
+    def slot_btn_scroll(self, value):
+        self.save_slot = min(9, max(0, self.save_slot + value))
+        self.slot_button.set_text(f"Слот {self.save_slot}" if self.save_slot else "Автосохр.")
+
+    def _slot_path(self, extension, slot=None):
+        slot = self.save_slot if slot is None else slot
+        return os.path.join(self.save_dir, f"slot{slot}{extension}" if slot else f"autosave{extension}")
+
     def save_game(self):
+        self._save(self._slot_path(".gol"))
+
+    def _save(self, path, rule=None):
+        # Снимок берётся сразу, а пишется в фоне (engine.autosave.Saver)
+        os.makedirs(self.save_dir, exist_ok=True)
+        generation, cells = self.simulation.snapshot()
+        saver.save(path, cells, rule=rule, generation=generation)
+
+    def autosave_btn_on_release(self):
+        self.autosave_enabled = not self.autosave_enabled
+        self._autosave_generation = self.simulation.get_generation()
+        self._autosave_time = time.monotonic()
+        self.autosave_button.set_text("Автосохр.: вкл" if self.autosave_enabled else "Автосохр.: выкл")
+
+    def _autosave(self):
+        generation = self.simulation.get_generation()
+        if generation == self._autosave_generation:
+            return
+        generations_due = (self.autosave_generations is not None and
+                           generation - self._autosave_generation >= self.autosave_generations)
+        time_due = (self.autosave_seconds is not None and
+                    time.monotonic() - self._autosave_time >= self.autosave_seconds)
+        if generations_due or time_due:
+            self._autosave_generation = generation
+            self._autosave_time = time.monotonic()
+            self._save(self._slot_path(".gol", slot=0))
+
+    def _draw_saves(self, display: pygame.Surface):
+        result = saver.last_result
+        if self._saves_shown:
+            line = "запись: " + ", ".join(os.path.basename(path) for path in self._saves_shown)
+        elif result is not None and result.error is not None:
+            line = f"ошибка записи {os.path.basename(result.path)}: {result.error}"
+        else:
+            return
+
+        font = pygame.font.SysFont("couriernew", 16)
+        text = font.render(line, True, (255, 255, 255), (0, 0, 0))
+        x, y = self.sim_field.get_pos()
+        display.blit(text, (x + 5, y + self.sim_field.get_size()[1] - text.get_height() - 5))
+
+    def load_game(self):
+        path = self._slot_path(".gol")
+        if self.save_slot == 1 and not os.path.exists(path) and os.path.exists("save1.txt"):
+            # Сохранение старого формата
+            path = "save1.txt"
+        # Файл ещё пишется - загружается то, что сохранено последним
+        saver.wait()
+
         try:
-            with open("save1.txt", mode="w") as file:
-                file.write(str(self.sim_field.get_positions_of_alive_cells()))
+            self.simulation.set_positions_of_alive_cells(read_positions(path))
         except FileNotFoundError:
-            with open("save1.txt", mode="x") as file:
-                file.write(str(self.sim_field.get_positions_of_alive_cells()))
+            self.simulation.set_positions_of_alive_cells(set())
 
-    def load_game(self):
+    def export_rle(self):
+        self._save(self._slot_path(".rle"), rule=self.simulation.rule)
+
+    def import_rle(self):
+        saver.wait()
         try:
-            with open("save1.txt") as file:
-                string = file.readline()
-                al_cells = set()
-
-                if string != "set()":
-                    num = False
-                    num_value = ''
-                    pos = []
-                    for l in string:
-                        if l == "(":
-                            num = True
-
-                        elif l == ",":
-                            if num:
-                                pos.append(int(num_value))
-                                num_value = ''
-
-                        elif l == ")":
-                            pos.append(int(num_value))
-                            al_cells.add(tuple(pos))
-                            pos = []
-                            num_value = ''
-                            num = False
-
-                        elif l == " ":
-                            pass
-
-                        elif num:
-                            num_value += l
-
-                self.sim_field.set_positions_of_alive_cells(al_cells)
+            self.simulation.set_positions_of_alive_cells(read_positions(self._slot_path(".rle")))
         except FileNotFoundError:
-            self.sim_field.set_positions_of_alive_cells(set())
+            pass
+
+    def history_btn_on_release(self):
+        self.history_enabled = not self.history_enabled
+        self.simulation.set_history_enabled(self.history_enabled)
+        self.history_button.set_text("Запись: вкл" if self.history_enabled else "Запись: выкл")
+
+    def step_back_btn_on_release(self):
+        self._seek(self.simulation.get_generation() - 1)
+
+    def step_forward_btn_on_release(self):
+        self._seek(self.simulation.get_generation() + 1)
+
+    def seek_btn_scroll(self, value):
+        generation = self.simulation.get_generation()
+        history_range = self.simulation.get_history_range() or (generation, generation)
+        # В цикле можно перейти к любому будущему поколению без пересчёта всех промежуточных
+        last = math.inf if self.simulation.get_cycle() is not None else history_range[1]
+        if self.seek_generation is None:
+            self.seek_generation = generation
+        self.seek_generation = min(last, max(history_range[0], self.seek_generation + value * self.seek_scroll_step))
+        self.seek_button.set_text(f"К {self.seek_generation}")
+
+    def seek_btn_on_release(self):
+        if self.seek_generation is not None:
+            self._seek(self.seek_generation)
+
+    def auto_pause_btn_on_release(self):
+        self.auto_pause = not self.auto_pause
+        self.simulation.set_auto_pause(self.auto_pause)
+        self.auto_pause_button.set_text("Автопауза: вкл" if self.auto_pause else "Автопауза: выкл")
+
+    def _update_cycle_btn_text(self):
+        cycle = self.simulation.get_cycle()
+        if cycle is None:
+            self.cycle_button.set_text("Цикл: нет")
+        elif cycle.period == 1:
+            self.cycle_button.set_text(f"Статика с {cycle.offset}")
+        else:
+            self.cycle_button.set_text(f"Период {cycle.period} с {cycle.offset}")
+
+    def _seek(self, generation):
+        # Перемотка останавливает игру, иначе воркер сразу уйдёт с выбранного поколения
+        if not self.game_stopped:
+            self.toggle.on_release()
+        self.seek_generation = None
+        self.simulation.seek(generation)
+        self.seek_button.set_text(f"Ген {self.simulation.get_generation()}")
 
     def back_btn_on_release(self):
         self._window.current_screen = self._window.main_menu
@@ -534,50 +926,89 @@ class SimulationField(Widget):
                             pygame.K_LEFT, pygame.K_a,
                             pygame.K_DOWN, pygame.K_s,
                             pygame.K_RIGHT, pygame.K_d)
-    offsets = ((-1, -1), (0, -1), (1, -1),
-               (-1, 0), (1, 0),
-               (-1, 1), (0, 1), (1, 1))
-
-    def __init__(self, scale: int, camera_pos: list, size_hint=1):
+    # Цвета состояний клеток: мёртвая, живая, затухающие умирающие (правила Generations)
+    # и область за краем ограниченного мира
+    palette = [(0, 0, 0), (255, 255, 255)] + [(max(40, 200 - 16 * i), 60, 60) for i in range(253)]
+    palette.insert(OUTSIDE, (40, 40, 40))
+    # При отдалении пиксель - блок клеток, яркость - доля живых (engine.pyramid.shade)
+    density_palette = [(i, i, i) for i in range(256)]
+
+    def __init__(self, simulation: Simulation, scale: int, camera_pos: list, size_hint=1):
         super().__init__(size_hint=size_hint)
 
+        # Мир и его расчёт - в engine.simulation, здесь только камера, отрисовка и кисть
+        self._simulation = simulation
         self._scale = scale
         self._camera_pos = camera_pos
 
         self.brush = ((0, 0),)
-        self.rule = [(2, 3), (3,)]
-        self._positions_of_alive_cells = set()
+        self._drawn_frame_number = 0
 
-    @time_counter
     def draw(self, display: pygame.Surface):
         pygame.draw.rect(display, 0, self._shape, 0)
 
-        for pos in self._positions_of_alive_cells:
-            x = pos[0] - self._camera_pos[0]
-            y = pos[1] - self._camera_pos[1]
-
-            half_width = self._width // 2
-            half_height = self._height // 2
-
-            cuts, out_of_bound = self._check_for_cuts((x, y), half_width, half_height)
-
-            if not out_of_bound:
-                self._draw_cell((x, y), half_width, half_height, cuts, display)
+        half_width = self._width // 2
+        half_height = self._height // 2
+
+        # Область, которую видит камера, растеризуется по пикселю на клетку
+        # и растягивается до масштаба одним вызовом. При отдалении (уровень level > 0)
+        # область считается в блоках 2 ** level клеток - по пикселю на блок
+        level = self.get_zoom_out_level()
+        block = 2 ** level
+        pixels = self._scale * block
+        camera_x = self._camera_pos[0] / block
+        camera_y = self._camera_pos[1] / block
+        rect = (math.floor(camera_x - half_width / pixels) - 1,
+                math.floor(camera_y - half_height / pixels) - 1,
+                math.ceil(camera_x + half_width / pixels) + 1,
+                math.ceil(camera_y + half_height / pixels) + 1,
+                level)
+
+        # Берётся последний готовый кадр воркера; если камера сдвинулась - по возможности новый
+        frame = self._simulation.get_frame(rect)
+        if frame is None:
+            return
+        self._drawn_frame_number = frame.number
+
+        x0, y0, x1, y1, level = frame.rect
+        region = frame.region
+        surface = pygame.surfarray.make_surface(region.T)
+        surface.set_palette(self.density_palette if level else self.palette)
+        if pixels != 1:
+            surface = pygame.transform.scale(surface, ((x1 - x0) * pixels, (y1 - y0) * pixels))
+
+        x = (x0 - camera_x) * pixels + half_width + self._pos[0]
+        y = (y0 - camera_y) * pixels + half_height + self._pos[1]
+
+        clip = display.get_clip()
+        display.set_clip(self._shape)
+        display.blit(surface, (int(x), int(y)))
+        display.set_clip(clip)
 
     def on_release(self):
         mouse_pos = pygame.mouse.get_pos()
         mouse_on_cell_pos = ((self._camera_pos[0] - (self._width / 2 - mouse_pos[0] + self._pos[0] - 1) / self._scale) // 1,
                              (self._camera_pos[1] - (self._height / 2 - mouse_pos[1] + self._pos[1] - 1) / self._scale) // 1)
 
-        for offset in self.brush:
-            cell_pos = (int(mouse_on_cell_pos[0] + offset[0]), int(mouse_on_cell_pos[1] + offset[1]))
-            if cell_pos in self._positions_of_alive_cells:
-                self._positions_of_alive_cells.discard(cell_pos)
-            else:
-                self._positions_of_alive_cells.add(cell_pos)
+        cells = [(int(mouse_on_cell_pos[0] + offset[0]), int(mouse_on_cell_pos[1] + offset[1]))
+                 for offset in self.brush]
+        self._simulation.toggle_cells(cells)
 
     def scroll(self, value):
-        self._scale = max(1, self._scale + value)
+        if self._scale > 1 or (self._scale == 1 and value > 0):
+            self._scale = max(1, self._scale + value)
+        else:
+            # Меньше пикселя на клетку: каждый шаг колеса вдвое меняет число клеток на пиксель
+            scale = max(2 ** -Simulation.max_zoom_out_level, self._scale * 2 ** value)
+            self._scale = 1 if scale >= 1 else scale
+
+        if self._scale >= 1:
+            self._simulation.drop_pyramid()
+
+    def get_zoom_out_level(self):
+        if self._scale >= 1:
+            return 0
+        return round(math.log2(1 / self._scale))
 
     def key_down(self, key_number):
         if key_number == pygame.K_UP or key_number == pygame.K_w:
@@ -592,95 +1023,8 @@ class SimulationField(Widget):
         elif key_number == pygame.K_RIGHT or key_number == pygame.K_d:
             self._camera_pos[0] += self._width / 20 / self._scale
 
-    def set_positions_of_alive_cells(self, positions: set):
-        self._positions_of_alive_cells = positions
-
-    def get_positions_of_alive_cells(self):
-        return self._positions_of_alive_cells
-
-    @time_counter
-    def calculate_next_gen(self):
-        # Получает статистику о живых клетках рядом
-        # 0 0 0 0 0 | 1 1 2 1 1
-        # 0 1 0 1 0 | 1 0 2 0 1
-        # 0 0 0 0 0 | 1 1 2 1 1
-        stat = self._get_stat()  # -> dict {pos: count}
-
-        new_positions = set()
-
-        for item in stat.items():
-            if item[1] in self.rule[1]:
-                new_positions.add(item[0])
-            elif item[1] in self.rule[0] and item[0] in self._positions_of_alive_cells:
-                new_positions.add(item[0])
-
-        self._positions_of_alive_cells = new_positions
-        print(len(self._positions_of_alive_cells))
-
-    def clear_sim_field(self):
-        self._positions_of_alive_cells = set()
-
-    def _check_for_cuts(self, pos: tuple, half_width: int, half_height: int):
-        cuts = set()
-
-        out_of_bound = False
-
-        if pos[0] * self._scale < -half_width - self._scale:
-            out_of_bound = True
-        elif pos[0] * self._scale < -half_width:
-            cuts.add(0)
-
-        elif pos[0] * self._scale >= half_width:
-            out_of_bound = True
-        elif pos[0] * self._scale >= half_width - self._scale:
-            cuts.add(1)
-
-        if pos[1] * self._scale < -half_height - self._scale:
-            out_of_bound = True
-        elif pos[1] * self._scale < -half_height:
-            cuts.add(2)
-
-        elif pos[1] * self._scale >= half_height:
-            out_of_bound = True
-        elif pos[1] * self._scale >= half_height - self._scale:
-            cuts.add(3)
-
-        return cuts, out_of_bound
-
-    def _draw_cell(self, pos: tuple, half_width: int, half_height: int, cuts: set, display: pygame.Surface):
-        x = pos[0] * self._scale + half_width
-        y = pos[1] * self._scale + half_height
-
-        cell_width = self._scale
-        cell_height = self._scale
-
-        if 0 in cuts:
-            cell_width = x + self._scale
-            x = 0
-        elif 1 in cuts:
-            cell_width = math.ceil(half_width * 2 - x)
-
-        if 2 in cuts:
-            cell_height = y + self._scale
-            y = 0
-        elif 3 in cuts:
-            cell_height = math.ceil(half_height * 2 - y)
-
-        shape = pygame.Rect(x + self._pos[0], y + self._pos[1], cell_width, cell_height)
-        pygame.draw.rect(display, (255, 255, 255), shape, 0)
-
-    def _get_stat(self):
-        stat = {}
-
-        for pos in self._positions_of_alive_cells:
-            for offset in self.offsets:
-                new_pos = (pos[0] + offset[0], pos[1] + offset[1])
-                if new_pos in stat:
-                    stat[new_pos] += 1
-                else:
-                    stat[new_pos] = 1
-
-        return stat
+    def has_new_frame(self):
+        return self._simulation.get_frame_number() != self._drawn_frame_number
 
 
 class MainMenu(Screen):
@@ -702,6 +1046,7 @@ class MainMenu(Screen):
 
     @staticmethod
     def _exit_btn_on_release():
+        saver.wait()
         pygame.quit()
         sys.exit()
 
@@ -709,15 +1054,58 @@ class MainMenu(Screen):
 class SettingsMenu(Screen):
     def __init__(self, window: Window):
         super().__init__(window)
-        _standard_rules = dict(name="Стандартные правила", data=[(2, 3), (3,)])
-        _high_life_rules = dict(name="Правила High Life", data=[(2, 3), (3,6)])
-        _life_34_rules = dict(name="Правила 34 Life", data=[(3, 4), (3, 4)])
-        self._rules = [_standard_rules, _high_life_rules, _life_34_rules]
+        # Строки правил разбирает engine.rules.parse_rule. Правила Generations и Larger than Life
+        # считает только движок NumPy, на него происходит переключение
+        _standard_rules = dict(name="Стандартные правила", data="B3/S23")
+        _high_life_rules = dict(name="Правила High Life", data="B36/S23")
+        _life_34_rules = dict(name="Правила 34 Life", data="B34/S34")
+        _brians_brain_rules = dict(name="Brian's Brain (B2/S/C3)", data="B2/S/C3")
+        _bosco_rules = dict(name="Bosco (Larger than Life)", data="R5,C0,M1,S34..58,B34..45,NM")
+        self._rules = [_standard_rules, _high_life_rules, _life_34_rules, _brians_brain_rules, _bosco_rules]
         self._current_rules_index = 0
 
         for i in range(len(self._rules)):
             self._add_rules_btn(i)
 
+        # Режим мира: data - None для бесконечного, иначе параметр torus у BoundedEngine
+        _infinite_world = dict(name="Мир: бесконечный", data=None)
+        _bounded_world = dict(name="Мир: ограниченный", data=False)
+        _torus_world = dict(name="Мир: тор", data=True)
+        self._world_modes = [_infinite_world, _bounded_world, _torus_world]
+        self._current_world_mode_index = 0
+        self._world_width = 256
+        self._world_height = 256
+        self._world_size_step = 16
+
+        self._world_button = Button(text=_infinite_world["name"], on_release=self._world_btn_on_release)
+        self.add_widget(self._world_button)
+
+        self._world_width_button = Button(text=f"Ширина: {self._world_width}", scroll=self._world_width_btn_scroll)
+        self.add_widget(self._world_width_button)
+
+        self._world_height_button = Button(text=f"Высота: {self._world_height}", scroll=self._world_height_btn_scroll)
+        self.add_widget(self._world_height_button)
+
+        _packed_engine = dict(name="Движок: упакованный", data=PackedEngine)
+        _sparse_engine = dict(name="Движок: множество", data=SparseEngine)
+        _tile_engine = dict(name="Движок: тайлы NumPy", data=TileEngine)
+        _hashlife_engine = dict(name="Движок: HashLife", data=HashLifeEngine)
+        _bitboard_engine = dict(name="Движок: битборд", data=BitboardEngine)
+        _parallel_engine = dict(name="Движок: параллельный", data=lambda: ParallelEngine(workers=self._workers))
+        _dense_engine = dict(name="Движок: NumPy (любые правила)", data=DenseEngine)
+        self._engines = [_packed_engine, _sparse_engine, _tile_engine, _hashlife_engine, _bitboard_engine,
+                         _parallel_engine, _dense_engine]
+        self._dense_engine_index = self._engines.index(_dense_engine)
+        self._current_engine_index = 0
+        self._engines_offset = len(self.get_widgets())
+
+        for i in range(len(self._engines)):
+            self._add_engine_btn(i)
+
+        self._workers = os.cpu_count() or 1
+        self._workers_button = Button(text=f"Процессов: {self._workers}", scroll=self._workers_btn_scroll)
+        self.add_widget(self._workers_button)
+
         self._back_button = Button(text="Назад", on_release=self._back_btn_on_release)
         self.add_widget(self._back_button)
 
@@ -732,56 +1120,147 @@ class SettingsMenu(Screen):
             self.rules_btn.set_color(color)
 
     def _set_rule(self, rule_number):
+        simulation = self._window.game_screen.simulation
+        try:
+            simulation.rule = self._rules[rule_number]["data"]
+        except ValueError:
+            # Текущий движок не умеет такие правила
+            self._set_engine(self._dense_engine_index)
+            simulation.rule = self._rules[rule_number]["data"]
+
         color = [x * 0.8 for x in self.get_widgets()[rule_number].get_color()]
         self.get_widgets()[rule_number].set_color(color)
 
         color = [x * 1.25 for x in self.get_widgets()[self._current_rules_index].get_color()]
         self.get_widgets()[self._current_rules_index].set_color(color)
 
-        self._window.game_screen.sim_field.rule = self._rules[rule_number]["data"]
         self._current_rules_index = rule_number
 
+    def _add_engine_btn(self, engine_number):
+        on_release = lambda: self._set_engine(engine_number)
+
+        self.engine_btn = Button(text=self._engines[engine_number]["name"], on_release=on_release)
+        self.add_widget(self.engine_btn)
+
+        if self._current_engine_index == engine_number:
+            color = [x * 0.8 for x in self.engine_btn.get_color()]
+            self.engine_btn.set_color(color)
+
+    def _set_engine(self, engine_number):
+        if engine_number == self._current_engine_index and self._current_world_mode_index == 0:
+            return
+
+        try:
+            self._window.game_screen.simulation.set_engine(self._engines[engine_number]["data"]())
+        except ValueError:
+            # Движок не поддерживает текущие правила
+            return
+        self._window.game_screen.update_hs_btn_text()
+
+        # Выбор движка возвращает бесконечный мир
+        self._current_world_mode_index = 0
+        self._world_button.set_text(self._world_modes[0]["name"])
+
+        offset = self._engines_offset
+
+        color = [x * 0.8 for x in self.get_widgets()[offset + engine_number].get_color()]
+        self.get_widgets()[offset + engine_number].set_color(color)
+
+        color = [x * 1.25 for x in self.get_widgets()[offset + self._current_engine_index].get_color()]
+        self.get_widgets()[offset + self._current_engine_index].set_color(color)
+
+        self._current_engine_index = engine_number
+
+    def _world_btn_on_release(self):
+        index = (self._current_world_mode_index + 1) % len(self._world_modes)
+        if self._apply_world_mode(index):
+            self._current_world_mode_index = index
+            self._world_button.set_text(self._world_modes[index]["name"])
+
+    def _world_width_btn_scroll(self, value):
+        self._world_width = max(self._world_size_step, self._world_width + value * self._world_size_step)
+        self._world_width_button.set_text(f"Ширина: {self._world_width}")
+        self._apply_world_mode(self._current_world_mode_index)
+
+    def _world_height_btn_scroll(self, value):
+        self._world_height = max(self._world_size_step, self._world_height + value * self._world_size_step)
+        self._world_height_button.set_text(f"Высота: {self._world_height}")
+        self._apply_world_mode(self._current_world_mode_index)
+
+    def _apply_world_mode(self, index):
+        # Клетки переносятся в новый мир; False - текущие правила ему не подходят
+        torus = self._world_modes[index]["data"]
+        if torus is None:
+            engine = self._engines[self._current_engine_index]["data"]()
+        else:
+            engine = BoundedEngine(width=self._world_width, height=self._world_height, torus=torus)
+
+        try:
+            self._window.game_screen.simulation.set_engine(engine)
+        except ValueError:
+            return False
+        self._window.game_screen.update_hs_btn_text()
+        return True
+
+    def _workers_btn_scroll(self, value):
+        self._workers = max(1, self._workers + value)
+        self._workers_button.set_text(f"Процессов: {self._workers}")
+
+        self._window.game_screen.simulation.set_workers(self._workers)
+
     def _back_btn_on_release(self):
         self._window.current_screen = self._window.main_menu
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Игра «Жизнь»")
+    parser.add_argument("--profile", choices=("generations", "frames"), default=None,
+                        help="снять профиль первых поколений или кадров")
+    parser.add_argument("--profile-window", type=int, default=profiler.window,
+                        help="число поколений или кадров в снимке профиля (и для F5/F6)")
+    parser.add_argument("--profile-dir", default=profiler.directory)
+    parser.add_argument("--autosave-generations", type=int, default=None,
+                        help="включить автосохранение каждые N поколений")
+    parser.add_argument("--autosave-seconds", type=float, default=None,
+                        help="включить автосохранение каждые N секунд")
+    parser.add_argument("--connect", default=None, metavar="ADDRESS",
+                        help="смотреть мир сервера python -m engine.server (host:port или путь Unix-сокета)")
+    parser.add_argument("--rate", type=float, default=None, help="обновлений от сервера в секунду")
+    args = parser.parse_args()
+    profiler.window = args.profile_window
+    profiler.directory = args.profile_dir
+    if args.profile is not None:
+        profiler.start(args.profile)
+
     pygame.init()
     clock = pygame.time.Clock()
 
     # ЛКМ - взаимодействие с объектами
     # Прокрутка колеса - изменение масштаба отображения | изменение скорости игры
     # WASD | стрелочки - управление камерой
+    # F3 - панель производительности | F4 - выгрузка замеров в metrics/
+    # F5 | F6 - профиль следующих поколений | кадров в profiles/
 
     window_width = 1000
     window_height = 600
 
-    window = Window(window_width, window_height)
+    simulation = None
+    if args.connect is not None:
+        simulation = RemoteSimulation(args.connect, rate=args.rate)
+
+    window = Window(window_width, window_height, simulation=simulation)
+    if args.autosave_generations is not None or args.autosave_seconds is not None:
+        window.game_screen.autosave_generations = args.autosave_generations
+        window.game_screen.autosave_seconds = args.autosave_seconds
+        window.game_screen.autosave_btn_on_release()
 
     event_handler = EventHandler(window)
 
     while True:
-        window.update()
-
         for event in pygame.event.get():
-            if event.type == pygame.KEYDOWN:
-                event_handler.key_down(event.dict["key"])
-
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                event_handler.mouse_button_down(event.dict["button"])
+            event_handler.handle(event)
 
-            elif event.type == pygame.MOUSEBUTTONUP:
-                event_handler.mouse_button_up(event.dict["button"])
-
-            elif event.type == pygame.MOUSEWHEEL:
-                event_handler.mouse_wheel(event.dict["y"])
-
-            elif event.type == pygame.WINDOWLEAVE:
-                event_handler.window_leave()
-
-            elif event.type == pygame.VIDEORESIZE:
-                event_handler.resize(event.dict["w"], event.dict["h"])
-
-            elif event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+        window.update()
+        if window.redraw_needed:
+            window.draw()
+        metrics.record("frame_ms", clock.tick(window.refresh_rate))
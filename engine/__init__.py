@@ -0,0 +1,8 @@
+from .packed import PackedEngine
+from .sparse import SparseEngine
+from .tiles import TileEngine
+from .hashlife import HashLifeEngine
+from .bitboard import BitboardEngine
+from .parallel import ParallelEngine
+from .dense import DenseEngine
+from .bounded import BoundedEngine
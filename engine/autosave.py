@@ -0,0 +1,67 @@
+import collections
+import threading
+import time
+
+from .saves import write_positions_atomic
+
+# Результат записи: путь, поколение снимка, время окончания и ошибка (None - успешно)
+SaveResult = collections.namedtuple("SaveResult", ("path", "generation", "time", "error"))
+
+
+class Saver:
+    # Запись сохранений в фоновом потоке. save() принимает неизменяемый снимок поля
+    # (CellSet, frozenset, копию массива) и сразу возвращается; сериализация, fsync
+    # и переименование идут в потоке записи. Ещё не начатая запись в тот же путь
+    # заменяется новой: на диск попадает только самый свежий снимок
+    def __init__(self):
+        self.last_result = None
+
+        self._condition = threading.Condition()
+        # {путь: (снимок, правило, поколение)} в порядке постановки
+        self._pending = collections.OrderedDict()
+        self._writing = None
+        self._thread = None
+
+    def save(self, path, cells, rule=None, generation=None):
+        with self._condition:
+            self._pending.pop(path, None)
+            self._pending[path] = (cells, rule, generation)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="Saver", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def get_in_flight(self):
+        # Пути ожидающих и идущей записей
+        with self._condition:
+            paths = list(self._pending)
+            if self._writing is not None:
+                paths.insert(0, self._writing)
+            return paths
+
+    def is_busy(self, path=None):
+        paths = self.get_in_flight()
+        return bool(paths) if path is None else path in paths
+
+    def wait(self, timeout=None):
+        # Дождаться окончания всех записей. False - не дождались за timeout секунд
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and self._writing is None, timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+                path, (cells, rule, generation) = self._pending.popitem(last=False)
+                self._writing = path
+
+            error = None
+            try:
+                write_positions_atomic(path, cells, rule)
+            except Exception as exception:
+                error = exception
+
+            with self._condition:
+                self.last_result = SaveResult(path, generation, time.time(), error)
+                self._writing = None
+                self._condition.notify_all()
@@ -0,0 +1,89 @@
+import argparse
+import json
+import sys
+import time
+
+from .bitboard import BitboardEngine
+from .dense import DenseEngine
+from .hashlife import HashLifeEngine
+from .packed import PackedEngine
+from .parallel import ParallelEngine
+from .rules import parse_rule
+from .saves import read_positions, write_positions
+from .sparse import SparseEngine
+from .tiles import TileEngine
+
+ENGINES = {"packed": PackedEngine, "sparse": SparseEngine, "tiles": TileEngine, "hashlife": HashLifeEngine,
+           "bitboard": BitboardEngine, "parallel": ParallelEngine, "dense": DenseEngine}
+# Те же наборы, что и в SettingsMenu._rules
+RULES = {"standard": "B3/S23", "highlife": "B36/S23", "34life": "B34/S34",
+         "brianbrain": "B2/S/C3", "bosco": "R5,C0,M1,S34..58,B34..45,NM"}
+
+
+def run(engine, generations=None, time_limit=None):
+    # Продвигает мир на generations поколений или до исчерпания time_limit секунд
+    start_time = time.monotonic()
+    start_population = engine.get_population()
+    done = 0
+
+    while generations is None or done < generations:
+        if time_limit is not None and time.monotonic() - start_time >= time_limit:
+            break
+
+        if hasattr(engine, "advance") and generations is not None:
+            # HashLife: оставшиеся поколения раскладываются на степени двойки
+            power = (generations - done).bit_length() - 1
+            engine.advance(power)
+            done += 2 ** power
+        else:
+            engine.calculate_next_gen()
+            done += 1
+
+    elapsed = time.monotonic() - start_time
+    return dict(generations=done,
+                start_population=start_population,
+                population=engine.get_population(),
+                seconds=elapsed,
+                gens_per_sec=done / elapsed if elapsed > 0 else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m engine.batch",
+                                     description="Расчёт поколений без окна pygame")
+    parser.add_argument("pattern", help="файл шаблона: .gol, .rle, .lif или save1.txt")
+    parser.add_argument("-n", "--generations", type=int, default=None)
+    parser.add_argument("-t", "--time-limit", type=float, default=None, help="секунды")
+    parser.add_argument("-e", "--engine", choices=sorted(ENGINES), default="bitboard")
+    parser.add_argument("-r", "--rule", default="standard",
+                        help=f"имя набора ({', '.join(sorted(RULES))}) или строка правила, например B36/S23")
+    parser.add_argument("-o", "--output", default=None, help="куда сохранить итоговое поле (формат по расширению)")
+    parser.add_argument("-s", "--stats", default=None, help="куда сохранить статистику (JSON)")
+    args = parser.parse_args(argv)
+
+    if args.generations is None and args.time_limit is None:
+        parser.error("нужно указать --generations и/или --time-limit")
+
+    try:
+        rule = parse_rule(RULES.get(args.rule, args.rule))
+        engine = ENGINES[args.engine](rule=rule)
+    except ValueError as error:
+        parser.error(str(error))
+    engine.set_positions_of_alive_cells(read_positions(args.pattern))
+
+    stats = run(engine, args.generations, args.time_limit)
+    stats.update(pattern=args.pattern, engine=args.engine, rule=args.rule)
+
+    if args.output is not None:
+        write_positions(args.output, engine.get_positions_of_alive_cells(), rule=engine.rule)
+    if args.stats is not None:
+        with open(args.stats, mode="w") as file:
+            json.dump(stats, file, indent=2)
+    if hasattr(engine, "close"):
+        engine.close()
+
+    json.dump(stats, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
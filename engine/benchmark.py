@@ -0,0 +1,123 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from . import patterns
+from .batch import ENGINES, run
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# (имя, шаблон или функция размера -> множество клеток, размеры, число поколений)
+CASES = (
+    ("glider", patterns.GLIDER, (1, 16), 200),
+    ("ship", patterns.SHIP, (1, 16), 200),
+    ("cross", patterns.CROSS, (1, 16), 200),
+    ("galaxy", patterns.GALAXY, (1, 16), 200),
+    ("r_pentomino", patterns.R_PENTOMINO, (1, 4), 500),
+    ("acorn", patterns.ACORN, (1, 4), 500),
+    ("gosper_glider_gun", patterns.GOSPER_GLIDER_GUN, (1, 4), 500),
+    ("random_soup", lambda size: patterns.random_soup(size, size, seed=size), (128, 512, 1024), 100),
+)
+QUICK_CASES = (
+    ("glider", patterns.GLIDER, (1,), 50),
+    ("r_pentomino", patterns.R_PENTOMINO, (1,), 100),
+    ("gosper_glider_gun", patterns.GOSPER_GLIDER_GUN, (1,), 100),
+    ("random_soup", lambda size: patterns.random_soup(size, size, seed=size), (128,), 20),
+)
+# Расстояние между копиями шаблона при размере > 1
+SPACING = 100
+
+
+def _make_cells(pattern, size):
+    if callable(pattern):
+        return pattern(size)
+    return patterns.tile(pattern, size, SPACING)
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # На macOS ru_maxrss в байтах, на Linux - в килобайтах
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _run_case(engine_name, cells, generations, time_limit, queue):
+    engine = ENGINES[engine_name]()
+    engine.set_positions_of_alive_cells(cells)
+    stats = run(engine, generations, time_limit)
+    if hasattr(engine, "close"):
+        engine.close()
+
+    mean_population = (stats["start_population"] + stats["population"]) / 2
+    seconds_per_gen = stats["seconds"] / stats["generations"] if stats["generations"] else None
+    stats["ns_per_cell"] = (seconds_per_gen * 1e9 / mean_population
+                            if seconds_per_gen is not None and mean_population else None)
+    stats["peak_rss_kb"] = _peak_rss_kb()
+    queue.put(stats)
+
+
+def run_case(engine_name, cells, generations, time_limit=None):
+    # Каждый случай считается в отдельном процессе, чтобы пиковый RSS не копился между ними
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run_case, args=(engine_name, cells, generations, time_limit, queue))
+    process.start()
+    stats = queue.get()
+    process.join()
+    return stats
+
+
+def _git_commit():
+    # Коммит репозитория с движками, из какого бы каталога ни запускали бенчмарк
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m engine.benchmark",
+                                     description="Бенчмарк движков на наборе стандартных шаблонов")
+    parser.add_argument("-e", "--engines", nargs="+", choices=sorted(ENGINES), default=sorted(ENGINES))
+    parser.add_argument("-p", "--patterns", nargs="+", default=None, help="имена шаблонов из набора")
+    parser.add_argument("-t", "--time-limit", type=float, default=30, help="секунды на один случай")
+    parser.add_argument("-q", "--quick", action="store_true", help="короткий набор")
+    parser.add_argument("-o", "--output", default=None, help="файл JSON с результатами")
+    args = parser.parse_args(argv)
+
+    cases = QUICK_CASES if args.quick else CASES
+    if args.patterns is not None:
+        cases = [case for case in cases if case[0] in args.patterns]
+
+    results = []
+    for name, pattern, sizes, generations in cases:
+        for size in sizes:
+            cells = _make_cells(pattern, size)
+            for engine_name in args.engines:
+                stats = run_case(engine_name, cells, generations, args.time_limit)
+                stats.update(pattern=name, size=size, engine=engine_name)
+                results.append(stats)
+                print(f"{name:>18} {size:>5} {engine_name:>9} "
+                      f"{stats['gens_per_sec'] or 0:>12.1f} gen/s "
+                      f"{stats['ns_per_cell'] or 0:>10.1f} ns/cell "
+                      f"{stats['peak_rss_kb'] or 0:>8} KB")
+
+    report = dict(commit=_git_commit(), python=platform.python_version(), platform=platform.platform(),
+                  time=time.strftime("%Y-%m-%dT%H:%M:%S"), results=results)
+    if args.output is not None:
+        with open(args.output, mode="w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
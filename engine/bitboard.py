@@ -0,0 +1,212 @@
+import numpy as np
+
+from .rules import STANDARD_RULE, as_rule, make_table
+from .spatial import cell_array
+
+ONE = np.uint64(1)
+WORD_TAIL = np.uint64(63)
+
+
+def next_rows(rows, above, below, birth_counts, survival_counts):
+    # Следующее поколение для полосы упакованных строк. above и below - строки,
+    # граничащие с полосой сверху и снизу (None - пустая строка)
+    up = np.empty_like(rows)
+    up[1:] = rows[:-1]
+    up[0] = 0 if above is None else above
+    down = np.empty_like(rows)
+    down[:-1] = rows[1:]
+    down[-1] = 0 if below is None else below
+
+    # Побитовое сложение 8 соседей: сначала по 3 клетки в строках сверху и снизу
+    # и по 2 в средней, затем сложение получившихся двухбитных чисел
+    up_sum, up_carry = _full_adder(up, _shift_west(up), _shift_east(up))
+    down_sum, down_carry = _full_adder(down, _shift_west(down), _shift_east(down))
+    west = _shift_west(rows)
+    east = _shift_east(rows)
+    mid_sum = west ^ east
+    mid_carry = west & east
+
+    bit0, carry0 = _full_adder(up_sum, down_sum, mid_sum)
+    twos_sum, twos_carry = _full_adder(up_carry, down_carry, mid_carry)
+    bit1 = twos_sum ^ carry0
+    carry1 = twos_sum & carry0
+    bit2 = twos_carry ^ carry1
+    bit3 = twos_carry & carry1
+    bits = (bit0, bit1, bit2, bit3)
+
+    birth = _count_mask(bits, birth_counts)
+    survival = _count_mask(bits, survival_counts)
+
+    return (~rows & birth) | (rows & survival)
+
+
+def _full_adder(a, b, c):
+    half = a ^ b
+    return half ^ c, (a & b) | (half & c)
+
+
+def _shift_west(rows):
+    # В бите i оказывается клетка x - 1
+    shifted = rows << ONE
+    shifted[:, 1:] |= rows[:, :-1] >> WORD_TAIL
+    return shifted
+
+
+def _shift_east(rows):
+    # В бите i оказывается клетка x + 1
+    shifted = rows >> ONE
+    shifted[:, :-1] |= rows[:, 1:] << WORD_TAIL
+    return shifted
+
+
+def _count_mask(bits, counts):
+    # Маска клеток, у которых число соседей входит в counts
+    mask = np.zeros_like(bits[0])
+    for count in counts:
+        match = ~mask ^ mask
+        for i, bit in enumerate(bits):
+            match &= bit if count >> i & 1 else ~bit
+        mask |= match
+    return mask
+
+
+class BitboardEngine:
+    # Каждая строка мира упакована в слова uint64: бит i слова j - клетка
+    # с x = self._x + j * 64 + i. Поле окружено пустой рамкой (строка сверху
+    # и снизу, слово слева и справа), в которую могут родиться новые клетки
+    def __init__(self, rule=STANDARD_RULE, grow_rows=16, grow_words=1):
+        self.grow_rows = grow_rows
+        self.grow_words = grow_words
+
+        self._rows = np.zeros((3, 3), dtype=np.uint64)
+        self._x = -64
+        self._y = -1
+
+        self.rule = rule
+
+    @property
+    def rule(self):
+        return self._rule
+
+    @rule.setter
+    def rule(self, rule):
+        rule = as_rule(rule)
+        self.set_table(make_table(rule))
+        self._rule = rule
+
+    def set_table(self, table):
+        # table[alive * 9 + count] - таблица переходов, как в engine.rules.make_table
+        self._table = list(table)
+        self._birth_counts = [count for count in range(9) if self._table[count]]
+        self._survival_counts = [count for count in range(9) if self._table[9 + count]]
+
+    def set_positions_of_alive_cells(self, positions):
+        cells = cell_array(positions)
+        if not len(cells):
+            self.clear()
+            return
+
+        min_x, min_y = cells.min(axis=0)
+        max_x, max_y = cells.max(axis=0)
+
+        self._x = int(min_x) - 64
+        self._y = int(min_y) - 1
+        words = (int(max_x) - self._x) // 64 + 2
+        height = int(max_y) - self._y + 2
+
+        bits = np.zeros((height, words * 64), dtype=np.uint8)
+        bits[cells[:, 1] - self._y, cells[:, 0] - self._x] = 1
+        self._rows = self._pack(bits)
+
+    def get_positions_of_alive_cells(self):
+        ys, xs = np.nonzero(self._unpack(self._rows))
+        xs = xs + self._x
+        ys = ys + self._y
+        return set(zip(xs.tolist(), ys.tolist()))
+
+    def get_cell_array(self):
+        ys, xs = np.nonzero(self._unpack(self._rows))
+        return np.stack((xs + self._x, ys + self._y), axis=1).astype(np.int64)
+
+    def get_cells_in_rect(self, x0, y0, x1, y1):
+        height, words = self._rows.shape
+        row0 = max(0, y0 - self._y)
+        row1 = min(height, y1 - self._y)
+        word0 = max(0, (x0 - self._x) // 64)
+        word1 = min(words, (x1 - self._x - 1) // 64 + 1)
+        if row0 >= row1 or word0 >= word1:
+            return []
+
+        ys, xs = np.nonzero(self._unpack(self._rows[row0:row1, word0:word1]))
+        xs = xs + self._x + word0 * 64
+        ys = ys + self._y + row0
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    def get_region(self, x0, y0, x1, y1):
+        region = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        height, words = self._rows.shape
+        row0 = max(0, y0 - self._y)
+        row1 = min(height, y1 - self._y)
+        word0 = max(0, (x0 - self._x) // 64)
+        word1 = min(words, (x1 - self._x - 1) // 64 + 1)
+        if row0 >= row1 or word0 >= word1:
+            return region
+
+        bits = self._unpack(self._rows[row0:row1, word0:word1])
+        left = self._x + word0 * 64
+        col0 = max(0, x0 - left)
+        col1 = min(bits.shape[1], x1 - left)
+        if col0 < col1:
+            top = self._y + row0
+            region[top - y0:top - y0 + bits.shape[0], left + col0 - x0:left + col1 - x0] = bits[:, col0:col1]
+        return region
+
+    def get_population(self):
+        return int(self._unpack(self._rows).sum())
+
+    def toggle_cells(self, cells):
+        for x, y in cells:
+            self._include(x, y)
+            word, bit = divmod(x - self._x, 64)
+            self._rows[y - self._y, word] ^= ONE << np.uint64(bit)
+        self._ensure_margins()
+
+    def clear(self):
+        self._rows = np.zeros((3, 3), dtype=np.uint64)
+        self._x = -64
+        self._y = -1
+
+    def calculate_next_gen(self):
+        self._rows = next_rows(self._rows, None, None, self._birth_counts, self._survival_counts)
+        self._ensure_margins()
+
+    def _include(self, x, y):
+        height, words = self._rows.shape
+        top = max(0, self._y + 1 - y)
+        bottom = max(0, y - (self._y + height - 2))
+        left = max(0, (self._x + 64 - x + 63) // 64)
+        right = max(0, (x - (self._x + (words - 1) * 64)) // 64 + 1)
+        self._grow(top, bottom, left, right)
+
+    def _ensure_margins(self):
+        rows = self._rows
+        top = self.grow_rows if rows[0].any() else 0
+        bottom = self.grow_rows if rows[-1].any() else 0
+        left = self.grow_words if rows[:, 0].any() else 0
+        right = self.grow_words if rows[:, -1].any() else 0
+        self._grow(top, bottom, left, right)
+
+    def _grow(self, top, bottom, left, right):
+        if top or bottom or left or right:
+            self._rows = np.pad(self._rows, ((top, bottom), (left, right)))
+            self._y -= top
+            self._x -= left * 64
+
+    @staticmethod
+    def _pack(bits):
+        packed = np.packbits(bits, axis=1, bitorder="little")
+        return np.ascontiguousarray(packed).view("<u8").astype(np.uint64)
+
+    @staticmethod
+    def _unpack(rows):
+        return np.unpackbits(rows.astype("<u8").view(np.uint8), axis=1, bitorder="little")
@@ -0,0 +1,126 @@
+import numpy as np
+
+from .rules import STANDARD_RULE, as_rule, make_table
+from .spatial import cell_array
+
+# Значение get_region для клеток за пределами ограниченного мира
+OUTSIDE = 255
+
+
+class BoundedEngine:
+    # Мир фиксированного размера width x height с клетками 0 <= x < width, 0 <= y < height.
+    # torus=False - за краем всегда мёртвые клетки, torus=True - края склеены.
+    # Поле лежит в двух заранее выделенных буферах (height + 2) x (width + 2) с рамкой
+    # в одну клетку, которые меняются местами каждое поколение; шаг ничего не выделяет
+    def __init__(self, rule=STANDARD_RULE, width=256, height=256, torus=False):
+        self.width = width
+        self.height = height
+        self.torus = torus
+
+        self._buffers = [np.zeros((height + 2, width + 2), dtype=np.uint8) for _ in range(2)]
+        self._current = 0
+        self._counts = np.zeros((height, width), dtype=np.uint8)
+        # np.take работает с индексами intp: буфер нужного типа, чтобы не было копии
+        self._index = np.zeros((height, width), dtype=np.intp)
+
+        self.rule = rule
+
+    @property
+    def rule(self):
+        return self._rule
+
+    @rule.setter
+    def rule(self, rule):
+        rule = as_rule(rule)
+        self._table = np.array(make_table(rule), dtype=np.uint8)
+        self._rule = rule
+
+    def fit_cells(self, cells):
+        # Клетки вне мира: на торе переносятся через край, в ограниченном мире отбрасываются
+        cells = cell_array(cells)
+        if self.torus:
+            return cells % (self.width, self.height)
+        inside = ((cells[:, 0] >= 0) & (cells[:, 0] < self.width) &
+                  (cells[:, 1] >= 0) & (cells[:, 1] < self.height))
+        return cells[inside]
+
+    def set_positions_of_alive_cells(self, positions):
+        self.clear()
+        cells = self.fit_cells(positions)
+        self._grid()[cells[:, 1], cells[:, 0]] = 1
+
+    def get_positions_of_alive_cells(self):
+        cells = self.get_cell_array()
+        return set(zip(cells[:, 0].tolist(), cells[:, 1].tolist()))
+
+    def get_cell_array(self):
+        ys, xs = np.nonzero(self._grid())
+        return np.stack((xs, ys), axis=1).astype(np.int64)
+
+    def get_cells_in_rect(self, x0, y0, x1, y1):
+        left, top = max(0, x0), max(0, y0)
+        right, bottom = min(self.width, x1), min(self.height, y1)
+        if left >= right or top >= bottom:
+            return []
+        ys, xs = np.nonzero(self._grid()[top:bottom, left:right])
+        return list(zip((xs + left).tolist(), (ys + top).tolist()))
+
+    def get_region(self, x0, y0, x1, y1):
+        if self.torus:
+            # Тор рисуется периодически повторённым
+            ys = np.arange(y0, y1) % self.height
+            xs = np.arange(x0, x1) % self.width
+            return self._grid()[np.ix_(ys, xs)]
+
+        region = np.full((y1 - y0, x1 - x0), OUTSIDE, dtype=np.uint8)
+        left, top = max(0, x0), max(0, y0)
+        right, bottom = min(self.width, x1), min(self.height, y1)
+        if left < right and top < bottom:
+            region[top - y0:bottom - y0, left - x0:right - x0] = self._grid()[top:bottom, left:right]
+        return region
+
+    def get_population(self):
+        return int(np.count_nonzero(self._grid()))
+
+    def toggle_cells(self, cells):
+        grid = self._grid()
+        for x, y in self.fit_cells(cells).tolist():
+            grid[y, x] ^= 1
+
+    def clear(self):
+        for buffer in self._buffers:
+            buffer[:] = 0
+
+    def calculate_next_gen(self):
+        cells = self._buffers[self._current]
+        new = self._buffers[1 - self._current]
+
+        if self.torus:
+            # Рамка - копия противоположных краёв; углы копируются вместе со столбцами
+            cells[0, 1:-1] = cells[-2, 1:-1]
+            cells[-1, 1:-1] = cells[1, 1:-1]
+            cells[:, 0] = cells[:, -2]
+            cells[:, -1] = cells[:, 1]
+
+        counts = self._counts
+        np.add(cells[:-2, :-2], cells[:-2, 1:-1], out=counts)
+        np.add(counts, cells[:-2, 2:], out=counts)
+        np.add(counts, cells[1:-1, :-2], out=counts)
+        np.add(counts, cells[1:-1, 2:], out=counts)
+        np.add(counts, cells[2:, :-2], out=counts)
+        np.add(counts, cells[2:, 1:-1], out=counts)
+        np.add(counts, cells[2:, 2:], out=counts)
+
+        index = self._index
+        np.multiply(cells[1:-1, 1:-1], 9, out=index)
+        np.add(index, counts, out=index)
+        # Результат сначала в непрерывный буфер counts (запись в срез буферизуется), потом
+        # в середину нового буфера. Рамка нового буфера не трогается: в ограниченном мире
+        # она всегда пустая, на торе перезаписывается перед следующим шагом
+        np.take(self._table, index, out=counts, mode="clip")
+        np.copyto(new[1:-1, 1:-1], counts)
+
+        self._current = 1 - self._current
+
+    def _grid(self):
+        return self._buffers[self._current][1:-1, 1:-1]
@@ -0,0 +1,104 @@
+import collections.abc
+
+import numpy as np
+
+from .spatial import pack_cells, unpack_cells
+
+
+def unique_keys(keys):
+    # Отсортированные уникальные ключи. Сортировка с отбором соседних повторов: np.unique
+    # в новых версиях numpy на больших массивах uint64 в разы медленнее
+    keys = np.sort(keys)
+    if len(keys):
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    return keys
+
+
+def as_keys(cells):
+    # Клетки (множество кортежей, массив (N, 2) или CellSet) -> отсортированные уникальные ключи
+    if isinstance(cells, CellSet):
+        return cells.get_keys()
+    return unique_keys(pack_cells(cells))
+
+
+def contains_keys(keys, wanted):
+    # Для каждого ключа wanted - есть ли он в отсортированном массиве keys
+    if not len(keys):
+        return np.zeros(len(wanted), dtype=bool)
+    index = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+    return keys[index] == wanted
+
+
+class CellSet(collections.abc.Set):
+    # Неизменяемое множество клеток - отсортированный массив упакованных ключей uint64
+    # (engine.spatial.pack_cells): 8 байт на клетку вместо сотни с лишним у множества кортежей.
+    # Снаружи ведёт себя как frozenset кортежей (x, y), массовые операции векторные
+    def __init__(self, cells=()):
+        self._keys = as_keys(cells)
+
+    @classmethod
+    def from_keys(cls, keys):
+        # keys должны быть отсортированы и уникальны
+        cell_set = cls.__new__(cls)
+        cell_set._keys = keys
+        return cell_set
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        return cls(list(iterable))
+
+    def __contains__(self, cell):
+        return bool(contains_keys(self._keys, pack_cells(np.array([cell])))[0])
+
+    def __iter__(self):
+        for x, y in self.get_cell_array().tolist():
+            yield x, y
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __eq__(self, other):
+        if isinstance(other, CellSet):
+            return np.array_equal(self._keys, other._keys)
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def __or__(self, other):
+        return self.union(other)
+
+    def __sub__(self, other):
+        return self.difference(other)
+
+    def __xor__(self, other):
+        return self.symmetric_difference(other)
+
+    def __and__(self, other):
+        return self.intersection(other)
+
+    def __repr__(self):
+        return f"CellSet({len(self)} клеток)"
+
+    def get_keys(self):
+        return self._keys
+
+    def get_cell_array(self):
+        return unpack_cells(self._keys)
+
+    def union(self, cells):
+        return CellSet.from_keys(unique_keys(np.concatenate((self._keys, as_keys(cells)))))
+
+    def difference(self, cells):
+        return CellSet.from_keys(np.setdiff1d(self._keys, as_keys(cells), assume_unique=True))
+
+    def symmetric_difference(self, cells):
+        return CellSet.from_keys(np.setxor1d(self._keys, as_keys(cells), assume_unique=True))
+
+    def intersection(self, cells):
+        return CellSet.from_keys(np.intersect1d(self._keys, as_keys(cells), assume_unique=True))
+
+    def in_rect(self, x0, y0, x1, y1):
+        # Клетки [x0, x1) x [y0, y1) массивом (N, 2): столбцы x0 .. x1 - 1 - непрерывный отрезок ключей
+        start, end = np.searchsorted(self._keys, pack_cells(np.array([[x0, y0], [x1, y0]])))
+        cells = unpack_cells(self._keys[start:end])
+        return cells[(cells[:, 1] >= y0) & (cells[:, 1] < y1)]
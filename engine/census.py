@@ -0,0 +1,190 @@
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+from . import patterns
+from .cellstore import CellSet, as_keys
+from .cycles import mix
+from .packed import PackedEngine
+from .rules import STANDARD_RULE, as_rule, is_life_like, parse_rule
+from .saves import read_positions
+from .spatial import pack_cells, unpack_cells
+
+# Восемь поворотов и отражений: (поменять x и y, знак x, знак y)
+SYMMETRIES = tuple((swap, sx, sy) for swap in (False, True) for sx in (1, -1) for sy in (1, -1))
+
+# Словари известных объектов по правилам, строятся при первой переписи
+_dictionaries = {}
+
+
+def label_components(cells, spacing=1):
+    # Связные компоненты живых клеток: соседи - клетки на расстоянии не больше spacing
+    # по каждой оси (1 - восьмисвязность). Объединение-поиск векторно: рёбра находятся
+    # бинарным поиском по отсортированным ключам, корни подвешиваются к меньшему
+    # и пути сжимаются, пока рёбра не окажутся внутри компонент.
+    # -> (ключи, labels): labels[i] - номер компоненты клетки ключа i, от 0 до count - 1
+    keys = as_keys(cells)
+    parent = np.arange(len(keys))
+    if not len(keys):
+        return keys, parent
+
+    # Половины окрестности хватает: второй конец ребра видит первый обратным сдвигом
+    firsts, seconds = [], []
+    for dx in range(0, spacing + 1):
+        for dy in range(-spacing, spacing + 1):
+            if dx == 0 and dy <= 0:
+                continue
+            wanted = keys + np.uint64(((dx << 32) + dy) % 2 ** 64)
+            index = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+            found = keys[index] == wanted
+            firsts.append(np.flatnonzero(found))
+            seconds.append(index[found])
+    firsts = np.concatenate(firsts) if firsts else np.zeros(0, dtype=np.int64)
+    seconds = np.concatenate(seconds) if seconds else np.zeros(0, dtype=np.int64)
+
+    while len(firsts):
+        roots = parent[firsts], parent[seconds]
+        apart = roots[0] != roots[1]
+        if not apart.any():
+            break
+        # Рёбра внутри одной компоненты там и останутся
+        firsts, seconds = firsts[apart], seconds[apart]
+        low, high = np.minimum(*roots)[apart], np.maximum(*roots)[apart]
+        np.minimum.at(parent, high, low)
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+
+    is_root = parent == np.arange(len(keys))
+    labels = (np.cumsum(is_root) - 1)[parent]
+    return keys, labels
+
+
+def canonical_codes(cells, labels, count):
+    # Код каждой компоненты, одинаковый для всех её положений, поворотов и отражений:
+    # наименьший по восьми симметриям хеш клеток, сдвинутых к началу координат
+    # (сумма перемешанных ключей, как в engine.cycles.cells_hash)
+    order = np.argsort(labels, kind="stable")
+    cells, labels = cells[order], labels[order]
+    starts = np.searchsorted(labels, np.arange(count))
+
+    codes = None
+    for swap, sx, sy in SYMMETRIES:
+        xs, ys = cells[:, 0] * sx, cells[:, 1] * sy
+        if swap:
+            xs, ys = ys, xs
+        xs = xs - np.minimum.reduceat(xs, starts)[labels]
+        ys = ys - np.minimum.reduceat(ys, starts)[labels]
+        hashes = np.add.reduceat(mix(pack_cells(np.stack((xs, ys), axis=1))), starts, dtype=np.uint64)
+        codes = hashes if codes is None else np.minimum(codes, hashes)
+    return codes
+
+
+def pattern_code(cells):
+    cells = unpack_cells(as_keys(cells))
+    return int(canonical_codes(cells, np.zeros(len(cells), dtype=np.int64), 1)[0])
+
+
+def pattern_dictionary(rule=STANDARD_RULE):
+    # {код: название} объектов patterns.CENSUS_OBJECTS во всех фазах. Объект попадает
+    # в словарь, только если под правилом rule он за свой период возвращается к себе
+    rule = as_rule(rule)
+    dictionary = _dictionaries.get(rule)
+    if dictionary is not None:
+        return dictionary
+
+    dictionary = {}
+    if is_life_like(rule):
+        engine = PackedEngine(rule)
+        for name, cells, period in patterns.CENSUS_OBJECTS:
+            engine.set_positions_of_alive_cells(cells)
+            codes = []
+            for _ in range(period):
+                codes.append(pattern_code(engine.get_positions_of_alive_cells()))
+                engine.calculate_next_gen()
+            if pattern_code(engine.get_positions_of_alive_cells()) == codes[0]:
+                for code in codes:
+                    dictionary.setdefault(code, name)
+    _dictionaries[rule] = dictionary
+    return dictionary
+
+
+def census(cells, rule=STANDARD_RULE, spacing=2):
+    # Перепись объектов поля: список словарей name (None - неизвестный объект), code,
+    # population (клеток в объекте) и count (сколько таких), самые частые первыми.
+    # Клетки группируются с расстоянием spacing: у мигалок маяка, частей пульсара и фаз
+    # кораблей бывают зазоры в клетку. Неопознанные группы делятся на восьмисвязные
+    # компоненты - так рядом стоящие блоки не сливаются в один неизвестный объект
+    dictionary = pattern_dictionary(rule)
+    keys, labels = label_components(cells, spacing)
+    codes, sizes = _component_codes(keys, labels)
+    if spacing > 1 and len(codes):
+        known = np.isin(codes, np.fromiter(dictionary, dtype=np.uint64, count=len(dictionary)))
+        codes, sizes = codes[known], sizes[known]
+        rest = keys[~known[labels]]
+        rest_codes, rest_sizes = _component_codes(*label_components(CellSet.from_keys(rest)))
+        codes, sizes = np.concatenate((codes, rest_codes)), np.concatenate((sizes, rest_sizes))
+    if not len(codes):
+        return []
+
+    # Группировка одинаковых кодов сортировкой (np.unique медленен на больших uint64)
+    order = np.argsort(codes, kind="stable")
+    codes, sizes = codes[order], sizes[order]
+    starts = np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))
+    counts = np.diff(np.append(starts, len(codes)))
+
+    objects = [dict(name=dictionary.get(code), code=f"{code:016x}", population=population, count=number)
+               for code, population, number in zip(codes[starts].tolist(), sizes[starts].tolist(), counts.tolist())]
+    objects.sort(key=lambda item: (-item["count"], item["population"], item["code"]))
+    return objects
+
+
+def _component_codes(keys, labels):
+    # -> (код, число клеток) каждой компоненты
+    if not len(keys):
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+    count = int(labels.max()) + 1
+    return canonical_codes(unpack_cells(keys), labels, count), np.bincount(labels, minlength=count)
+
+
+def write_census(path, objects):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(("name", "code", "population", "count"))
+        writer.writerows((item["name"] or "", item["code"], item["population"], item["count"]) for item in objects)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m engine.census",
+                                     description="Перепись объектов поля")
+    parser.add_argument("pattern", help="файл шаблона: .gol, .rle, .lif или save1.txt")
+    parser.add_argument("-n", "--generations", type=int, default=0, help="сколько поколений посчитать до переписи")
+    parser.add_argument("-r", "--rule", default="B3/S23")
+    parser.add_argument("-s", "--spacing", type=int, default=2,
+                        help="клетки на таком расстоянии по каждой оси - один объект, если он известен")
+    parser.add_argument("-o", "--output", default=None, help="CSV: название, код, клеток в объекте, количество")
+    args = parser.parse_args(argv)
+
+    try:
+        rule = parse_rule(args.rule)
+        engine = PackedEngine(rule)
+    except ValueError as error:
+        parser.error(str(error))
+    engine.set_positions_of_alive_cells(read_positions(args.pattern))
+    for _ in range(args.generations):
+        engine.calculate_next_gen()
+
+    objects = census(engine.get_positions_of_alive_cells(), rule, args.spacing)
+    if args.output is not None:
+        write_census(args.output, objects)
+    for item in objects:
+        print(f"{item['count']:>8} {item['name'] or '?':<16} {item['population']:>5} {item['code']}")
+    print(f"объектов: {sum(item['count'] for item in objects)}, видов: {len(objects)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
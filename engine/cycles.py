@@ -0,0 +1,77 @@
+import collections
+
+import numpy as np
+
+from .spatial import pack_cells
+
+# Цикл мира: состояние поколения offset повторяется каждые period поколений
+Cycle = collections.namedtuple("Cycle", ("offset", "period"))
+
+
+def mix(keys):
+    # Финализатор splitmix64: близкие ключи дают независимые 64-битные значения
+    z = keys + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def cells_hash(cells):
+    # Сумма перемешанных ключей клеток по модулю 2 ** 64. Не зависит от порядка клеток,
+    # поэтому хеш следующего поколения = хеш + cells_hash(рождения) - cells_hash(смерти)
+    return int(mix(pack_cells(cells)).sum(dtype=np.uint64))
+
+
+class CycleDetector:
+    # Хранит хеши последних capacity поколений и находит первый повтор состояния.
+    # Натюрморт - цикл с периодом 1
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.cycle = None
+        self._hash = None
+        self._seen = collections.OrderedDict()
+
+    def has_hash(self):
+        return self._hash is not None
+
+    def is_empty(self):
+        return not self._seen
+
+    def reset(self):
+        self.cycle = None
+        self._hash = None
+        self._seen.clear()
+
+    def record(self, generation, cells):
+        # Полный пересчёт хеша по всем клеткам поколения
+        self._hash = cells_hash(cells)
+        return self._check(generation, self._hash)
+
+    def apply(self, generation, births, deaths):
+        # Инкрементальное обновление по рождениям и смертям за одно поколение
+        self._hash = (self._hash + cells_hash(births) - cells_hash(deaths)) % 2 ** 64
+        return self._check(generation, self._hash)
+
+    def record_state(self, generation, state):
+        # Готовый ключ состояния от движка (HashLifeEngine.get_state_key): равные ключи -
+        # равные поколения, поэтому хеш клеток не нужен
+        self._hash = None
+        return self._check(generation, state)
+
+    def equivalent_generation(self, generation):
+        # Поколение внутри первого оборота цикла с тем же состоянием, что и generation
+        offset, period = self.cycle
+        if generation < offset:
+            return generation
+        return offset + (generation - offset) % period
+
+    def _check(self, generation, key):
+        previous = self._seen.get(key)
+        if previous is not None and self.cycle is None:
+            self.cycle = Cycle(previous, generation - previous)
+
+        self._seen[key] = generation
+        self._seen.move_to_end(key)
+        if len(self._seen) > self.capacity:
+            self._seen.popitem(last=False)
+        return self.cycle
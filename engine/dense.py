@@ -0,0 +1,174 @@
+import numpy as np
+
+from .rules import STANDARD_RULE, as_rule, compile_rule
+from .spatial import cell_array
+
+
+class DenseEngine:
+    # Мир - плотный массив состояний grid[y, x] (0 - мёртвая, 1 - живая,
+    # 2 .. states - 1 - умирающие клетки правил Generations) с началом в (_x, _y).
+    # Поддерживает любые правила engine.rules, в том числе Larger than Life.
+    # Вокруг клеток держится пустая рамка шире радиуса, в которую могут родиться новые
+    def __init__(self, rule=STANDARD_RULE, grow=32):
+        self.grow = grow
+        self._grid = np.zeros((0, 0), dtype=np.uint8)
+        self._x = 0
+        self._y = 0
+        self.rule = rule
+
+    @property
+    def rule(self):
+        return self._rule
+
+    @rule.setter
+    def rule(self, rule):
+        rule = as_rule(rule)
+        self._birth, self._survive = compile_rule(rule)
+        self._rule = rule
+        if len(self._grid):
+            # Умирающие клетки, которых нет в новом правиле, исчезают
+            self._grid[self._grid >= rule.states] = 0
+            self._ensure_margins()
+
+    def set_positions_of_alive_cells(self, positions):
+        cells = cell_array(positions)
+        if not len(cells):
+            self.clear()
+            return
+
+        margin = self._rule.radius + self.grow
+        min_x, min_y = cells.min(axis=0)
+        max_x, max_y = cells.max(axis=0)
+        self._x = int(min_x) - margin
+        self._y = int(min_y) - margin
+        self._grid = np.zeros((int(max_y - min_y) + 1 + 2 * margin, int(max_x - min_x) + 1 + 2 * margin),
+                              dtype=np.uint8)
+        self._grid[cells[:, 1] - self._y, cells[:, 0] - self._x] = 1
+
+    def get_positions_of_alive_cells(self):
+        cells = self.get_cell_array()
+        return set(zip(cells[:, 0].tolist(), cells[:, 1].tolist()))
+
+    def get_cell_array(self):
+        ys, xs = np.nonzero(self._grid == 1)
+        return np.stack((xs + self._x, ys + self._y), axis=1).astype(np.int64)
+
+    def get_cells_in_rect(self, x0, y0, x1, y1):
+        region = self.get_region(x0, y0, x1, y1)
+        ys, xs = np.nonzero(region == 1)
+        return list(zip((xs + x0).tolist(), (ys + y0).tolist()))
+
+    def get_region(self, x0, y0, x1, y1):
+        # В отличие от остальных движков в области есть и умирающие клетки (состояния от 2)
+        region = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        height, width = self._grid.shape
+        left = max(x0, self._x)
+        top = max(y0, self._y)
+        right = min(x1, self._x + width)
+        bottom = min(y1, self._y + height)
+        if left < right and top < bottom:
+            region[top - y0:bottom - y0, left - x0:right - x0] = self._grid[top - self._y:bottom - self._y,
+                                                                            left - self._x:right - self._x]
+        return region
+
+    def get_population(self):
+        return int(np.count_nonzero(self._grid == 1))
+
+    def toggle_cells(self, cells):
+        cells = cell_array(cells)
+        if not len(cells):
+            return
+        self._include(cells)
+        for x, y in cells.tolist():
+            self._grid[y - self._y, x - self._x] = 0 if self._grid[y - self._y, x - self._x] else 1
+
+    def clear(self):
+        self._grid = np.zeros((0, 0), dtype=np.uint8)
+        self._x = 0
+        self._y = 0
+
+    def calculate_next_gen(self):
+        if not self._grid.size:
+            return
+
+        grid = self._grid
+        alive = grid == 1
+        counts = self._count_neighbours(alive)
+
+        born = (grid == 0) & self._birth[counts]
+        survived = alive & self._survive[counts]
+
+        new = np.zeros_like(grid)
+        if self._rule.states > 2:
+            # Generations: живая клетка без выживания начинает умирать,
+            # умирающая проходит оставшиеся состояния до 0
+            dying = grid >= 2
+            new[dying] = (grid[dying] + 1) % self._rule.states
+            new[alive & ~survived] = 2
+        new[born | survived] = 1
+
+        self._grid = new
+        self._ensure_margins()
+
+    def _count_neighbours(self, alive):
+        radius = self._rule.radius
+        padded = np.pad(alive.astype(np.uint8 if radius == 1 else np.int32), radius)
+        if radius == 1:
+            counts = (padded[:-2, :-2] + padded[:-2, 1:-1] + padded[:-2, 2:] +
+                      padded[1:-1, :-2] + padded[1:-1, 2:] +
+                      padded[2:, :-2] + padded[2:, 1:-1] + padded[2:, 2:])
+            return counts + alive if self._rule.middle else counts
+
+        # Таблица сумм (summed-area table): сумма по квадрату (2R + 1) x (2R + 1) -
+        # четыре обращения к таблице, стоимость не зависит от радиуса
+        size = 2 * radius + 1
+        table = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1), dtype=np.int32)
+        np.cumsum(padded, axis=0, out=table[1:, 1:])
+        np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+
+        counts = table[size:, size:] - table[:-size, size:] - table[size:, :-size] + table[:-size, :-size]
+        return counts if self._rule.middle else counts - alive
+
+    def _include(self, cells):
+        # Расширяет массив так, чтобы вокруг cells осталась пустая рамка
+        margin = self._rule.radius + self.grow
+        min_x, min_y = cells.min(axis=0)
+        max_x, max_y = cells.max(axis=0)
+        if not self._grid.size:
+            self._x = int(min_x) - margin
+            self._y = int(min_y) - margin
+            self._grid = np.zeros((int(max_y - min_y) + 1 + 2 * margin, int(max_x - min_x) + 1 + 2 * margin),
+                                  dtype=np.uint8)
+            return
+
+        height, width = self._grid.shape
+        top = max(0, self._y + self._rule.radius - int(min_y))
+        bottom = max(0, int(max_y) - (self._y + height - 1 - self._rule.radius))
+        left = max(0, self._x + self._rule.radius - int(min_x))
+        right = max(0, int(max_x) - (self._x + width - 1 - self._rule.radius))
+        self._grow(*(side and side + self.grow for side in (top, bottom, left, right)))
+
+    def _ensure_margins(self):
+        # Живые клетки не должны подходить к краю ближе радиуса:
+        # иначе их потомки окажутся за пределами массива
+        occupied = self._grid != 0
+        rows = np.flatnonzero(occupied.any(axis=1))
+        if not len(rows):
+            self.clear()
+            return
+        columns = np.flatnonzero(occupied.any(axis=0))
+
+        radius = self._rule.radius
+        grow = self.grow + radius
+        height, width = self._grid.shape
+        top = grow if rows[0] < radius else 0
+        bottom = grow if rows[-1] >= height - radius else 0
+        left = grow if columns[0] < radius else 0
+        right = grow if columns[-1] >= width - radius else 0
+        self._grow(top, bottom, left, right)
+
+    def _grow(self, top, bottom, left, right):
+        if top or bottom or left or right:
+            self._grid = np.pad(self._grid, ((top, bottom), (left, right)))
+            self._y -= top
+            self._x -= left
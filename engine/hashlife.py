@@ -0,0 +1,347 @@
+import numpy as np
+
+from .rules import STANDARD_RULE, as_rule, make_table
+from .spatial import cell_array, cell_set, rasterize
+
+
+class Node:
+    # Канонический узел квадродерева: одинаковые поддеревья - один и тот же объект,
+    # поэтому сравнение и хеширование идут по id
+    __slots__ = ("level", "nw", "ne", "sw", "se", "population")
+
+    def __init__(self, level, nw, ne, sw, se, population):
+        self.level = level
+        self.nw = nw
+        self.ne = ne
+        self.sw = sw
+        self.se = se
+        self.population = population
+
+
+class HashLifeEngine:
+    def __init__(self, rule=STANDARD_RULE, max_nodes=2_000_000):
+        # После превышения max_nodes узлов в кеше выполняется сборка мусора:
+        # кеши сбрасываются, и заново канонизируется только текущий корень
+        self.max_nodes = max_nodes
+        self.generation = 0
+
+        self._dead = Node(0, None, None, None, None, 0)
+        self._alive = Node(0, None, None, None, None, 1)
+        self._join_cache = {}
+        self._result_cache = {}
+        self._empty_cache = [self._dead]
+
+        self._root = self._empty(3)
+        # Координаты левого верхнего угла корня
+        self._x = -4
+        self._y = -4
+
+        self.rule = rule
+
+    @property
+    def rule(self):
+        return self._rule
+
+    @rule.setter
+    def rule(self, rule):
+        rule = as_rule(rule)
+        self._table = make_table(rule)
+        self._rule = rule
+        self._result_cache = {}
+
+    def set_positions_of_alive_cells(self, positions):
+        positions = list(cell_set(positions))
+        if not positions:
+            self.clear()
+            return
+
+        min_x = min(pos[0] for pos in positions)
+        min_y = min(pos[1] for pos in positions)
+        max_x = max(pos[0] for pos in positions)
+        max_y = max(pos[1] for pos in positions)
+
+        level = 3
+        while 1 << level <= max(max_x - min_x, max_y - min_y):
+            level += 1
+
+        # Корень вдвое больше, зато его угол кратен половине размера: тогда узлы
+        # ложатся в блоки get_density целиком, и их не приходится разбирать до клеток
+        self._x = min_x >> level << level
+        self._y = min_y >> level << level
+        level += 1
+        self._root = self._build(positions, level, self._x, self._y)
+
+    def get_positions_of_alive_cells(self):
+        positions = set()
+        self._collect_cells(self._root, self._x, self._y, positions)
+        return positions
+
+    def get_cell_array(self):
+        return cell_array(self.get_positions_of_alive_cells())
+
+    def get_cells_in_rect(self, x0, y0, x1, y1):
+        positions = []
+        self._collect_cells_in_rect(self._root, self._x, self._y, (x0, y0, x1, y1), positions)
+        return positions
+
+    def get_region(self, x0, y0, x1, y1):
+        return rasterize(self.get_cells_in_rect(x0, y0, x1, y1), x0, y0, x1, y1)
+
+    def get_population(self):
+        return self._root.population
+
+    def get_density(self, level, x0, y0, x1, y1):
+        # Счётчики блоков 2^level x 2^level с номерами [x0, x1) x [y0, y1), как
+        # DensityPyramid.get_region, но по населению узлов: клетки не перебираются
+        region = np.zeros((y1 - y0, x1 - x0), dtype=np.int64)
+        rect = (x0 << level, y0 << level, x1 << level, y1 << level)
+        self._collect_density(self._root, self._x, self._y, level, rect, region)
+        return region
+
+    def get_state_key(self):
+        # Ключ поколения для поиска циклов за O(уровня корня): наименьший узел-четверть,
+        # в котором лежат все живые клетки, и его угол. Узлы канонические, поэтому
+        # равные ключи - равные поколения
+        node, x, y = self._root, self._x, self._y
+        if not node.population:
+            return None
+        while node.level:
+            half = 1 << (node.level - 1)
+            for child, dx, dy in ((node.nw, 0, 0), (node.ne, half, 0), (node.sw, 0, half), (node.se, half, half)):
+                if child.population == node.population:
+                    node, x, y = child, x + dx, y + dy
+                    break
+            else:
+                break
+        return node, x, y
+
+    def toggle_cells(self, cells):
+        for x, y in cells:
+            while not (self._x <= x < self._x + (1 << self._root.level) and
+                       self._y <= y < self._y + (1 << self._root.level)):
+                self._grow()
+            alive = self._get_cell(self._root, x - self._x, y - self._y)
+            self._root = self._set_cell(self._root, x - self._x, y - self._y, not alive)
+
+    def clear(self):
+        self._root = self._empty(3)
+        self._x = -4
+        self._y = -4
+
+    def calculate_next_gen(self):
+        self.advance(0)
+
+    def advance(self, power):
+        # Продвигает мир на 2 ** power поколений за один вызов
+        while self._root.level < power + 2 or not self._is_padded(self._root):
+            self._grow()
+        self._grow()
+
+        quarter = 1 << (self._root.level - 2)
+        self._root = self._successor(self._root, power)
+        self._x += quarter
+        self._y += quarter
+        self.generation += 1 << power
+
+        if len(self._join_cache) > self.max_nodes:
+            self.collect_garbage()
+
+    def collect_garbage(self):
+        old_root = self._root
+        self._join_cache = {}
+        self._result_cache = {}
+        self._empty_cache = [self._dead]
+        self._root = self._rebuild(old_root, {})
+
+    def get_cache_size(self):
+        return len(self._join_cache)
+
+    def _join(self, nw, ne, sw, se):
+        key = (nw, ne, sw, se)
+        node = self._join_cache.get(key)
+        if node is None:
+            node = Node(nw.level + 1, nw, ne, sw, se,
+                        nw.population + ne.population + sw.population + se.population)
+            self._join_cache[key] = node
+        return node
+
+    def _empty(self, level):
+        while len(self._empty_cache) <= level:
+            e = self._empty_cache[-1]
+            self._empty_cache.append(self._join(e, e, e, e))
+        return self._empty_cache[level]
+
+    def _grow(self):
+        # Увеличивает корень на уровень, оставляя старый корень в центре
+        node = self._root
+        e = self._empty(node.level - 1)
+        self._root = self._join(self._join(e, e, e, node.nw), self._join(e, e, node.ne, e),
+                                self._join(e, node.sw, e, e), self._join(node.se, e, e, e))
+        half = 1 << (node.level - 1)
+        self._x -= half
+        self._y -= half
+
+    @staticmethod
+    def _is_padded(node):
+        # Все живые клетки лежат в центральной четверти узла
+        return (node.nw.se.se.population + node.ne.sw.sw.population +
+                node.sw.ne.ne.population + node.se.nw.nw.population) == node.population
+
+    def _successor(self, node, power):
+        # Центр узла уровня k (размер 2 ** (k - 1)) через 2 ** power поколений,
+        # где power <= k - 2
+        if node.population == 0:
+            return node.nw
+
+        power = min(power, node.level - 2)
+        key = (node, power)
+        result = self._result_cache.get(key)
+        if result is not None:
+            return result
+
+        if node.level == 2:
+            result = self._life_4x4(node)
+        else:
+            nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+            join = self._join
+            successor = self._successor
+
+            c1 = successor(nw, power)
+            c2 = successor(join(nw.ne, ne.nw, nw.se, ne.sw), power)
+            c3 = successor(ne, power)
+            c4 = successor(join(nw.sw, nw.se, sw.nw, sw.ne), power)
+            c5 = successor(join(nw.se, ne.sw, sw.ne, se.nw), power)
+            c6 = successor(join(ne.sw, ne.se, se.nw, se.ne), power)
+            c7 = successor(sw, power)
+            c8 = successor(join(sw.ne, se.nw, sw.se, se.sw), power)
+            c9 = successor(se, power)
+
+            if power < node.level - 2:
+                result = join(join(c1.se, c2.sw, c4.ne, c5.nw), join(c2.se, c3.sw, c5.ne, c6.nw),
+                              join(c4.se, c5.sw, c7.ne, c8.nw), join(c5.se, c6.sw, c8.ne, c9.nw))
+            else:
+                result = join(successor(join(c1, c2, c4, c5), power),
+                              successor(join(c2, c3, c5, c6), power),
+                              successor(join(c4, c5, c7, c8), power),
+                              successor(join(c5, c6, c8, c9), power))
+
+        self._result_cache[key] = result
+        return result
+
+    def _life_4x4(self, node):
+        # Базовый случай: узел 4x4 -> центр 2x2 через одно поколение
+        cells = [[0] * 4 for _ in range(4)]
+        for qy, qx, quad in ((0, 0, node.nw), (0, 2, node.ne), (2, 0, node.sw), (2, 2, node.se)):
+            cells[qy][qx] = quad.nw.population
+            cells[qy][qx + 1] = quad.ne.population
+            cells[qy + 1][qx] = quad.sw.population
+            cells[qy + 1][qx + 1] = quad.se.population
+
+        new_cells = []
+        for y in (1, 2):
+            for x in (1, 2):
+                count = (cells[y - 1][x - 1] + cells[y - 1][x] + cells[y - 1][x + 1] +
+                         cells[y][x - 1] + cells[y][x + 1] +
+                         cells[y + 1][x - 1] + cells[y + 1][x] + cells[y + 1][x + 1])
+                new_cells.append(self._alive if self._table[cells[y][x] * 9 + count] else self._dead)
+
+        return self._join(*new_cells)
+
+    def _build(self, positions, level, x, y):
+        if not positions:
+            return self._empty(level)
+        if level == 0:
+            return self._alive
+
+        half = 1 << (level - 1)
+        quads = ([], [], [], [])
+        for pos in positions:
+            quads[(pos[1] >= y + half) * 2 + (pos[0] >= x + half)].append(pos)
+
+        return self._join(self._build(quads[0], level - 1, x, y),
+                          self._build(quads[1], level - 1, x + half, y),
+                          self._build(quads[2], level - 1, x, y + half),
+                          self._build(quads[3], level - 1, x + half, y + half))
+
+    def _collect_cells(self, node, x, y, positions):
+        if node.population == 0:
+            return
+        if node.level == 0:
+            positions.add((x, y))
+            return
+
+        half = 1 << (node.level - 1)
+        self._collect_cells(node.nw, x, y, positions)
+        self._collect_cells(node.ne, x + half, y, positions)
+        self._collect_cells(node.sw, x, y + half, positions)
+        self._collect_cells(node.se, x + half, y + half, positions)
+
+    def _collect_cells_in_rect(self, node, x, y, rect, positions):
+        size = 1 << node.level
+        if node.population == 0 or x >= rect[2] or y >= rect[3] or x + size <= rect[0] or y + size <= rect[1]:
+            return
+        if node.level == 0:
+            positions.append((x, y))
+            return
+
+        half = size >> 1
+        self._collect_cells_in_rect(node.nw, x, y, rect, positions)
+        self._collect_cells_in_rect(node.ne, x + half, y, rect, positions)
+        self._collect_cells_in_rect(node.sw, x, y + half, rect, positions)
+        self._collect_cells_in_rect(node.se, x + half, y + half, rect, positions)
+
+    def _collect_density(self, node, x, y, level, rect, region):
+        size = 1 << node.level
+        if node.population == 0 or x >= rect[2] or y >= rect[3] or x + size <= rect[0] or y + size <= rect[1]:
+            return
+        bx, by = x >> level, y >> level
+        if bx == (x + size - 1) >> level and by == (y + size - 1) >> level:
+            region[by - (rect[1] >> level), bx - (rect[0] >> level)] += node.population
+            return
+
+        half = size >> 1
+        self._collect_density(node.nw, x, y, level, rect, region)
+        self._collect_density(node.ne, x + half, y, level, rect, region)
+        self._collect_density(node.sw, x, y + half, level, rect, region)
+        self._collect_density(node.se, x + half, y + half, level, rect, region)
+
+    def _get_cell(self, node, x, y):
+        while node.level > 0:
+            if node.population == 0:
+                return False
+            half = 1 << (node.level - 1)
+            if y < half:
+                node = node.nw if x < half else node.ne
+            else:
+                node = node.sw if x < half else node.se
+            x %= half
+            y %= half
+        return node.population == 1
+
+    def _set_cell(self, node, x, y, alive):
+        if node.level == 0:
+            return self._alive if alive else self._dead
+
+        half = 1 << (node.level - 1)
+        nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+        if y < half:
+            if x < half:
+                nw = self._set_cell(nw, x, y, alive)
+            else:
+                ne = self._set_cell(ne, x - half, y, alive)
+        else:
+            if x < half:
+                sw = self._set_cell(sw, x, y - half, alive)
+            else:
+                se = self._set_cell(se, x - half, y - half, alive)
+        return self._join(nw, ne, sw, se)
+
+    def _rebuild(self, node, memo):
+        if node.level == 0:
+            return node
+        result = memo.get(id(node))
+        if result is None:
+            result = self._join(self._rebuild(node.nw, memo), self._rebuild(node.ne, memo),
+                                self._rebuild(node.sw, memo), self._rebuild(node.se, memo))
+            memo[id(node)] = result
+        return result
@@ -0,0 +1,136 @@
+import bisect
+
+import numpy as np
+
+from .spatial import pack_cells, unpack_cells
+
+
+class History:
+    # История поколений: полные ключевые кадры через каждые keyframe_interval записей
+    # и между ними рождения/смерти. Клетки хранятся упакованными ключами (engine.spatial.pack_cells).
+    # При превышении memory_budget байт удаляются самые старые сегменты.
+    # Дельты берутся у движка (record_changes), а полное сравнение состояний (record) нужно
+    # только для ключевых кадров, движков без get_last_changes и после правок мира
+    def __init__(self, keyframe_interval=64, memory_budget=256 * 2 ** 20):
+        self.keyframe_interval = keyframe_interval
+        self.memory_budget = memory_budget
+
+        # Сегмент: dict(generations=[...], keyframe=ключи, deltas=[(births, deaths), ...], size=байты)
+        # deltas[i] переводит состояние generations[i] в generations[i + 1]
+        self._segments = []
+        # Ключи последней записи; None, если она сделана по дельтам и состояние не собрано
+        self._last = None
+        # False, если мир менялся не шагом: дельта движка не описывает переход от последней записи
+        self._chained = False
+        self._size = 0
+
+    def get_range(self):
+        if not self._segments:
+            return None
+        return self._segments[0]["generations"][0], self._segments[-1]["generations"][-1]
+
+    def get_size(self):
+        return self._size
+
+    def record(self, generation, cells):
+        keys = np.unique(pack_cells(cells))
+
+        # Запись в прошлое (после перемотки назад) отменяет старое будущее
+        if self._segments and generation <= self._segments[-1]["generations"][-1]:
+            self.truncate(generation - 1)
+
+        segment = self._segments[-1] if self._segments else None
+        if (segment is None or len(segment["generations"]) >= self.keyframe_interval or
+                self._last is None):
+            segment = dict(generations=[generation], keyframe=keys, deltas=[], size=keys.nbytes)
+            self._segments.append(segment)
+            self._size += keys.nbytes
+        else:
+            births = np.setdiff1d(keys, self._last, assume_unique=True)
+            deaths = np.setdiff1d(self._last, keys, assume_unique=True)
+            segment["generations"].append(generation)
+            segment["deltas"].append((births, deaths))
+            segment["size"] += births.nbytes + deaths.nbytes
+            self._size += births.nbytes + deaths.nbytes
+
+        self._last = keys
+        self._chained = True
+        self._trim()
+
+    def record_changes(self, generation, births, deaths):
+        # Запись поколения по рождениям и смертям за один шаг от последней записи.
+        # -> False, если так записать нельзя и нужен record
+        if not self._chained or not self._segments:
+            return False
+        segment = self._segments[-1]
+        if (generation != segment["generations"][-1] + 1 or
+                len(segment["generations"]) >= self.keyframe_interval):
+            return False
+
+        births = np.unique(pack_cells(births))
+        deaths = np.unique(pack_cells(deaths))
+        segment["generations"].append(generation)
+        segment["deltas"].append((births, deaths))
+        segment["size"] += births.nbytes + deaths.nbytes
+        self._size += births.nbytes + deaths.nbytes
+        self._last = None
+        self._trim()
+        return True
+
+    def mark_edited(self):
+        # Мир изменён не шагом: следующая запись - полная
+        self._chained = False
+
+    def seek(self, generation):
+        # -> (поколение, клетки) для последней записи не позже generation или None.
+        # Стоимость: один ключевой кадр и не больше keyframe_interval - 1 дельт
+        found = self._find(generation)
+        if found is None:
+            return None
+        segment_index, index = found
+        segment = self._segments[segment_index]
+        return segment["generations"][index], unpack_cells(self._state(segment, index))
+
+    def truncate(self, generation):
+        # Удаляет записи новее generation
+        while self._segments and self._segments[-1]["generations"][0] > generation:
+            self._size -= self._segments.pop()["size"]
+        if not self._segments:
+            self._last = None
+            self._chained = False
+            return
+
+        segment = self._segments[-1]
+        index = bisect.bisect_right(segment["generations"], generation) - 1
+        for births, deaths in segment["deltas"][index:]:
+            segment["size"] -= births.nbytes + deaths.nbytes
+            self._size -= births.nbytes + deaths.nbytes
+        del segment["generations"][index + 1:]
+        del segment["deltas"][index:]
+        self._last = self._state(segment, index)
+        self._chained = False
+
+    def clear(self):
+        self._segments = []
+        self._last = None
+        self._chained = False
+        self._size = 0
+
+    def _trim(self):
+        while self._size > self.memory_budget and len(self._segments) > 1:
+            self._size -= self._segments.pop(0)["size"]
+
+    def _find(self, generation):
+        starts = [segment["generations"][0] for segment in self._segments]
+        segment_index = bisect.bisect_right(starts, generation) - 1
+        if segment_index < 0:
+            return None
+        index = bisect.bisect_right(self._segments[segment_index]["generations"], generation) - 1
+        return segment_index, index
+
+    @staticmethod
+    def _state(segment, index):
+        state = segment["keyframe"]
+        for births, deaths in segment["deltas"][:index]:
+            state = np.union1d(np.setdiff1d(state, deaths, assume_unique=True), births)
+        return state
@@ -0,0 +1,124 @@
+import csv
+import functools
+import json
+import time
+
+import numpy as np
+
+
+class Series:
+    # Кольцевой буфер последних size замеров: значение и момент записи (time.perf_counter)
+    def __init__(self, size=1024):
+        self._times = np.zeros(size)
+        self._values = np.zeros(size)
+        self._count = 0
+
+    def add(self, value, moment=None):
+        i = self._count % len(self._values)
+        self._times[i] = time.perf_counter() if moment is None else moment
+        self._values[i] = value
+        self._count += 1
+
+    def get_values(self):
+        return self._ordered(self._values)
+
+    def get_times(self):
+        return self._ordered(self._times)
+
+    def get_last(self):
+        if not self._count:
+            return None
+        return float(self._values[(self._count - 1) % len(self._values)])
+
+    def percentile(self, q):
+        values = self.get_values()
+        if not len(values):
+            return None
+        return float(np.percentile(values, q))
+
+    def histogram(self, bins=10):
+        # -> (число замеров в корзине, границы корзин), как у np.histogram
+        return np.histogram(self.get_values(), bins=bins)
+
+    def rate(self, window=1.0):
+        # Сумма значений за последние window секунд в пересчёте на секунду
+        values = self.get_values()
+        recent = self.get_times() >= time.perf_counter() - window
+        return float(values[recent].sum()) / window
+
+    def _ordered(self, array):
+        # От старых замеров к новым
+        size = len(array)
+        if self._count <= size:
+            return array[:self._count].copy()
+        i = self._count % size
+        return np.concatenate((array[i:], array[:i]))
+
+
+class Metrics:
+    # Именованные ряды замеров (Series). Пока enabled выключен, ничего не записывается
+    # и не измеряется: замер стоит одной проверки флага
+    def __init__(self, size=1024):
+        self.enabled = False
+        self.size = size
+        self._series = {}
+
+    def record(self, name, value):
+        if not self.enabled:
+            return
+        series = self._series.get(name)
+        if series is None:
+            series = self._series[name] = Series(self.size)
+        series.add(value)
+
+    def timed(self, name):
+        # Декоратор: время вызова в миллисекундах пишется в ряд name
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                t = time.perf_counter()
+                result = func(*args, **kwargs)
+                self.record(name, (time.perf_counter() - t) * 1000)
+                return result
+            return wrapper
+        return decorator
+
+    def get_series(self, name):
+        return self._series.get(name)
+
+    def get_names(self):
+        return sorted(self._series)
+
+    def percentile(self, name, q):
+        series = self._series.get(name)
+        return None if series is None else series.percentile(q)
+
+    def rate(self, name, window=1.0):
+        series = self._series.get(name)
+        return 0.0 if series is None else series.rate(window)
+
+    def clear(self):
+        self._series = {}
+
+    def export(self, path):
+        # Все хранящиеся замеры по времени: .csv - строки time,name,value,
+        # .jsonl - по объекту {"time", "name", "value"} на строку
+        rows = []
+        for name, series in self._series.items():
+            rows.extend(zip(series.get_times().tolist(), [name] * len(series.get_values()),
+                            series.get_values().tolist()))
+        rows.sort(key=lambda row: row[0])
+
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(("time", "name", "value"))
+                writer.writerows(rows)
+        elif path.endswith(".jsonl"):
+            with open(path, "w") as file:
+                for moment, name, value in rows:
+                    file.write(json.dumps(dict(time=moment, name=name, value=value)) + "\n")
+        else:
+            raise ValueError(f"{path!r}: поддерживаются только .csv и .jsonl")
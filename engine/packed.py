@@ -0,0 +1,100 @@
+import numpy as np
+
+from .cellstore import CellSet, as_keys, contains_keys, unique_keys
+from .rules import STANDARD_RULE, as_rule, make_table
+from .spatial import rasterize
+
+
+def _key_offsets(offsets):
+    # Сдвиг клетки на (dx, dy) - прибавление (dx << 32) + dy к упакованному ключу
+    # по модулю 2 ** 64 (переполнение uint64 в массивах просто заворачивается)
+    return np.array([((dx << 32) + dy) % 2 ** 64 for dx, dy in offsets], dtype=np.uint64)
+
+
+class PackedEngine:
+    # Мир - CellSet, отсортированный массив упакованных ключей: 8 байт на живую клетку.
+    # Шаг векторный: кандидаты - изменившиеся в прошлом поколении клетки (или все живые,
+    # если их меньше) с соседями, число соседей - восемь бинарных поисков по живым
+    neighbour_offsets = _key_offsets(((-1, -1), (0, -1), (1, -1),
+                                      (-1, 0), (1, 0),
+                                      (-1, 1), (0, 1), (1, 1)))
+    area_offsets = _key_offsets(((dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)))
+
+    def __init__(self, rule=STANDARD_RULE):
+        self._cells = CellSet()
+        # Рождения и смерти последнего поколения, None - мир менялся не шагом
+        self._changes = None
+        # Ключи клеток, изменившихся после прошлого шага. None - пересчитать всё
+        self._dirty = None
+        self.rule = rule
+
+    @property
+    def rule(self):
+        return self._rule
+
+    @rule.setter
+    def rule(self, rule):
+        rule = as_rule(rule)
+        self._table = np.array(make_table(rule), dtype=np.uint8)
+        self._rule = rule
+        self._dirty = None
+
+    def set_positions_of_alive_cells(self, positions):
+        self._cells = CellSet(positions)
+        self._changes = None
+        self._dirty = None
+
+    def get_positions_of_alive_cells(self):
+        # Множество неизменяемое: шаг заменяет его новым
+        return self._cells
+
+    def get_cell_array(self):
+        return self._cells.get_cell_array()
+
+    def get_last_changes(self):
+        return self._changes
+
+    def get_population(self):
+        return len(self._cells)
+
+    def get_cells_in_rect(self, x0, y0, x1, y1):
+        cells = self._cells.in_rect(x0, y0, x1, y1)
+        return list(zip(cells[:, 0].tolist(), cells[:, 1].tolist()))
+
+    def get_region(self, x0, y0, x1, y1):
+        return rasterize(self._cells.in_rect(x0, y0, x1, y1), x0, y0, x1, y1)
+
+    def toggle_cells(self, cells):
+        keys = as_keys(cells)
+        self._cells = self._cells.symmetric_difference(CellSet.from_keys(keys))
+        self._changes = None
+        if self._dirty is not None:
+            self._dirty = unique_keys(np.concatenate((self._dirty, keys)))
+
+    def clear(self):
+        self._cells = CellSet()
+        self._changes = None
+        self._dirty = None
+
+    def calculate_next_gen(self):
+        keys = self._cells.get_keys()
+        # Измениться может только клетка рядом с изменившейся, а родиться - только
+        # рядом с живой: подходит меньший из двух наборов
+        seeds = keys if self._dirty is None or len(self._dirty) > len(keys) else self._dirty
+        candidates = unique_keys((seeds[:, None] + self.area_offsets).ravel())
+
+        counts = np.zeros(len(candidates), dtype=np.uint8)
+        for offset in self.neighbour_offsets:
+            counts += contains_keys(keys, candidates + offset)
+        alive = contains_keys(keys, candidates)
+        new = self._table[alive * 9 + counts].astype(bool)
+
+        births = candidates[new & ~alive]
+        deaths = candidates[alive & ~new]
+        # Ключи остаются отсортированными: смерти вырезаются, рождения вставляются на свои места
+        keys = np.delete(keys, np.searchsorted(keys, deaths))
+        keys = np.insert(keys, np.searchsorted(keys, births), births)
+
+        self._cells = CellSet.from_keys(keys)
+        self._changes = (CellSet.from_keys(births), CellSet.from_keys(deaths))
+        self._dirty = unique_keys(np.concatenate((births, deaths)))
@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .bitboard import BitboardEngine, next_rows
+from .rules import STANDARD_RULE
+
+# Процессы пула не форкаются от окна: fork многопоточного процесса (pygame, воркер,
+# автосохранение, перепись) может унаследовать чужую захваченную блокировку и зависнуть
+_context = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+# Буферы, к которым уже подключён процесс-воркер: {имя: SharedMemory}
+_attached = {}
+
+
+def _attach(names):
+    for name in list(_attached):
+        if name not in names:
+            _attached.pop(name).close()
+    for name in names:
+        if name not in _attached:
+            _attached[name] = shared_memory.SharedMemory(name=name)
+    return [_attached[name] for name in names]
+
+
+def _step_band(names, shape, source, start, end, birth_counts, survival_counts):
+    # Воркер читает свою полосу и по одной граничной строке соседних полос
+    # из буфера source и пишет результат в ту же полосу другого буфера
+    buffers = [np.ndarray(shape, dtype=np.uint64, buffer=shm.buf) for shm in _attach(names)]
+    rows = buffers[source]
+    above = rows[start - 1] if start > 0 else None
+    below = rows[end] if end < shape[0] else None
+    buffers[1 - source][start:end] = next_rows(rows[start:end], above, below, birth_counts, survival_counts)
+
+
+def _release(shared):
+    for shm in shared:
+        shm.close()
+        shm.unlink()
+
+
+class ParallelEngine(BitboardEngine):
+    # Битборд, который делится на горизонтальные полосы и считается пулом процессов.
+    # Поле лежит в двух буферах multiprocessing.shared_memory, которые меняются местами
+    # каждое поколение; между процессами передаются только граничные строки полос
+    def __init__(self, rule=STANDARD_RULE, workers=None, min_band_rows=64):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_band_rows = min_band_rows
+
+        self._pool = None
+        self._pool_finalizer = None
+        self._shared = []
+        self._buffers = []
+        self._buffers_finalizer = None
+        self._source = 0
+
+        super().__init__(rule=rule, grow_rows=64)
+
+    def create_pool(self, workers=None):
+        # Запуск процессов занимает заметное время, поэтому пул можно создать заранее,
+        # не держа lock воркера, и передать в set_workers
+        return _context.Pool(workers or self.workers)
+
+    def start(self):
+        # Одному процессу пул не нужен: поле считается на месте
+        if self._pool is None and self.workers > 1:
+            self._adopt(self.create_pool())
+
+    def set_workers(self, workers, pool=None):
+        self.close()
+        self.workers = max(1, workers)
+        if pool is not None:
+            self._adopt(pool)
+
+    def close(self):
+        if self._buffers:
+            # Поле копируется из разделяемой памяти, чтобы пережить её освобождение
+            self._rows = self._rows.copy()
+            self._free_buffers()
+        if self._pool_finalizer is not None:
+            self._pool_finalizer()
+        self._pool = None
+        self._pool_finalizer = None
+
+    def calculate_next_gen(self):
+        height = self._rows.shape[0]
+        bands = min(self.workers, height // self.min_band_rows)
+        if bands < 2:
+            super().calculate_next_gen()
+            return
+
+        self._share()
+
+        bounds = [height * i // bands for i in range(bands + 1)]
+        names = [shm.name for shm in self._shared]
+        tasks = [(names, self._rows.shape, self._source, bounds[i], bounds[i + 1],
+                  self._birth_counts, self._survival_counts) for i in range(bands)]
+        self._pool.starmap(_step_band, tasks)
+
+        self._source = 1 - self._source
+        self._rows = self._buffers[self._source]
+        self._ensure_margins()
+
+    def _share(self):
+        # Переносит поле в разделяемую память, если оно было пересоздано
+        # (рост границ, загрузка, очистка)
+        if self._buffers and self._rows is self._buffers[self._source]:
+            return
+
+        rows = self._rows
+        if not self._buffers or self._buffers[0].shape != rows.shape:
+            self._free_buffers()
+            self._shared = [shared_memory.SharedMemory(create=True, size=max(1, rows.nbytes)) for _ in range(2)]
+            self._buffers = [np.ndarray(rows.shape, dtype=np.uint64, buffer=shm.buf) for shm in self._shared]
+            self._buffers_finalizer = weakref.finalize(self, _release, self._shared)
+
+        # Пул, не запущенный заранее (start), создаётся после буферов
+        self.start()
+
+        self._source = 0
+        self._buffers[0][:] = rows
+        self._rows = self._buffers[0]
+
+    def _adopt(self, pool):
+        self._pool = pool
+        self._pool_finalizer = weakref.finalize(self, pool.terminate)
+
+    def _free_buffers(self):
+        self._buffers = []
+        self._shared = []
+        if self._buffers_finalizer is not None:
+            self._buffers_finalizer()
+            self._buffers_finalizer = None
@@ -0,0 +1,59 @@
+import random
+
+# Кисти GameScreen
+DOT = ((0, 0),)
+GLIDER = ((0, -1), (1, 0), (-1, 1), (0, 1), (1, 1))
+SHIP = ((3, 2), (-1, -1), (2, -1), (1, 2), (2, 2), (3, 1), (3, 0), (0, 2), (-1, 1))
+CROSS = ((4, 0), (3, -1), (-3, 0), (1, -3), (2, 2), (-2, -1), (-1, 4), (-1, -1), (-1, -2), (4, 2),
+         (-3, 2), (2, -2), (2, 4), (2, -1), (0, 4), (-1, -3), (-1, 3), (4, -1), (3, 2), (-1, 2),
+         (4, 1), (-3, -1), (0, -3), (-3, 1), (2, -3), (1, 4), (2, 3), (-2, 2))
+GALAXY = ((4, 0), (3, 4), (4, -3), (4, 3), (3, 1), (-3, -3), (3, -1), (-3, 0), (0, -4), (-3, 3),
+          (1, -3), (2, -4), (1, 3), (-4, -2), (-4, -1), (-4, 4), (-4, 1), (-1, 4), (-2, 4), (3, -3),
+          (4, -4), (4, 2), (3, 0), (3, 3), (-3, -4), (1, -4), (0, 4), (-4, -3), (-4, 0), (-1, -3),
+          (-4, 3), (-2, 3), (-1, 3), (4, -1), (3, 2), (3, -4), (4, 1), (4, 4), (-3, -2), (0, -3),
+          (-3, -1), (-3, 4), (-3, 1), (2, -3), (0, 3), (1, 4), (-4, -4), (-1, -4))
+
+# Долгоживущие шаблоны для бенчмарков
+R_PENTOMINO = ((1, 0), (2, 0), (0, 1), (1, 1), (1, 2))
+ACORN = ((1, 0), (3, 1), (0, 2), (1, 2), (4, 2), (5, 2), (6, 2))
+GOSPER_GLIDER_GUN = ((24, 0), (22, 1), (24, 1), (12, 2), (13, 2), (20, 2), (21, 2), (34, 2), (35, 2),
+                     (11, 3), (15, 3), (20, 3), (21, 3), (34, 3), (35, 3), (0, 4), (1, 4), (10, 4),
+                     (16, 4), (20, 4), (21, 4), (0, 5), (1, 5), (10, 5), (14, 5), (16, 5), (17, 5),
+                     (22, 5), (24, 5), (10, 6), (16, 6), (24, 6), (11, 7), (15, 7), (12, 8), (13, 8))
+
+
+# Объекты переписи (engine.census): название, клетки, период. Кораблям и глайдеру подходят
+# и их смещённые фазы - код объекта не зависит от положения
+BLOCK = ((0, 0), (1, 0), (0, 1), (1, 1))
+BEEHIVE = ((1, 0), (2, 0), (0, 1), (3, 1), (1, 2), (2, 2))
+LOAF = ((1, 0), (2, 0), (0, 1), (3, 1), (1, 2), (3, 2), (2, 3))
+BOAT = ((0, 0), (1, 0), (0, 1), (2, 1), (1, 2))
+SHIP_STILL = ((0, 0), (1, 0), (0, 1), (2, 1), (1, 2), (2, 2))
+TUB = ((1, 0), (0, 1), (2, 1), (1, 2))
+POND = ((1, 0), (2, 0), (0, 1), (3, 1), (0, 2), (3, 2), (1, 3), (2, 3))
+BARGE = ((1, 0), (0, 1), (2, 1), (1, 2), (3, 2), (2, 3))
+LONG_BOAT = ((0, 0), (1, 0), (0, 1), (2, 1), (1, 2), (3, 2), (2, 3))
+BLINKER = ((0, 0), (1, 0), (2, 0))
+TOAD = ((1, 0), (2, 0), (3, 0), (0, 1), (1, 1), (2, 1))
+BEACON = ((0, 0), (1, 0), (0, 1), (1, 1), (2, 2), (3, 2), (2, 3), (3, 3))
+PULSAR = tuple((x, y) for a in (0, 5, 7, 12) for b in (2, 3, 4, 8, 9, 10) for x, y in ((a, b), (b, a)))
+PENTADECATHLON = ((2, 0), (7, 0), (0, 1), (1, 1), (3, 1), (4, 1), (5, 1), (6, 1), (8, 1), (9, 1), (2, 2), (7, 2))
+MWSS = ((3, 0), (1, 1), (5, 1), (0, 2), (0, 3), (5, 3), (0, 4), (1, 4), (2, 4), (3, 4), (4, 4))
+HWSS = ((3, 0), (4, 0), (1, 1), (6, 1), (0, 2), (0, 3), (6, 3), (0, 4), (1, 4), (2, 4), (3, 4), (4, 4), (5, 4))
+
+CENSUS_OBJECTS = (("блок", BLOCK, 1), ("улей", BEEHIVE, 1), ("каравай", LOAF, 1), ("лодка", BOAT, 1),
+                  ("корабль", SHIP_STILL, 1), ("кадка", TUB, 1), ("пруд", POND, 1), ("баржа", BARGE, 1),
+                  ("длинная лодка", LONG_BOAT, 1), ("мигалка", BLINKER, 2), ("жаба", TOAD, 2),
+                  ("маяк", BEACON, 2), ("пульсар", PULSAR, 3), ("пентадекатлон", PENTADECATHLON, 15),
+                  ("глайдер", GLIDER, 4), ("лёгкий корабль", SHIP, 4), ("средний корабль", MWSS, 4),
+                  ("тяжёлый корабль", HWSS, 4))
+
+
+def random_soup(width, height, density=0.5, seed=0):
+    rnd = random.Random(seed)
+    return {(x, y) for y in range(height) for x in range(width) if rnd.random() < density}
+
+
+def tile(pattern, copies, spacing):
+    # copies x copies копий шаблона с шагом spacing клеток
+    return {(x + i * spacing, y + j * spacing) for i in range(copies) for j in range(copies) for x, y in pattern}
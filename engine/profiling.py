@@ -0,0 +1,107 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+
+class Profiler:
+    # Снимок профиля по запросу: следующие window вызовов, обёрнутых в captured(kind),
+    # выполняются под cProfile, а tracemalloc следит за выделениями памяти за это время.
+    # cProfile видит только свой поток, поэтому окно одного вида снимается в одном потоке
+    # (поколения - в воркере, кадры - в потоке интерфейса)
+    def __init__(self, directory="profiles", window=100, top=30):
+        self.directory = directory
+        self.window = window
+        self.top = top
+        self.last_path = None
+
+        self._lock = threading.Lock()
+        self._kind = None
+        self._size = self._left = 0
+        self._profile = None
+        self._tags = None
+        self._start_time = None
+        self._started_tracing = False
+
+    def start(self, kind, window=None):
+        # False - уже идёт другой снимок. captured читает поля без lock, поэтому
+        # вид снимка публикуется последним, когда профиль и счётчики уже готовы
+        with self._lock:
+            if self._kind is not None:
+                return False
+            self._size = self._left = self.window if window is None else window
+            self._profile = cProfile.Profile()
+            self._tags = None
+            self._kind = kind
+        return True
+
+    def get_kind(self):
+        return self._kind
+
+    def get_left(self):
+        return self._left
+
+    def captured(self, kind, describe):
+        # Декоратор. describe(*args) -> словарь меток снимка (поколение, население);
+        # вызывается с аргументами первого вызова в окне, до него
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if self._kind != kind:
+                    return func(*args, **kwargs)
+
+                if self._tags is None:
+                    self._tags = describe(*args)
+                    self._start_time = time.perf_counter()
+                    self._started_tracing = not tracemalloc.is_tracing()
+                    if self._started_tracing:
+                        tracemalloc.start()
+                    tracemalloc.reset_peak()
+
+                self._profile.enable()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._profile.disable()
+                    self._left -= 1
+                    if self._left <= 0:
+                        self._finish()
+            return wrapper
+        return decorator
+
+    def _finish(self):
+        elapsed = time.perf_counter() - self._start_time
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)))
+        peak = tracemalloc.get_traced_memory()[1]
+        if self._started_tracing:
+            tracemalloc.stop()
+
+        os.makedirs(self.directory, exist_ok=True)
+        tags = "-".join(f"{key}{value}" for key, value in self._tags.items())
+        path = os.path.join(self.directory, f"{self._kind}-{tags}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+        # .prof - сырая статистика для pstats/snakeviz, .txt - готовый отчёт
+        self._profile.dump_stats(path + ".prof")
+        report = io.StringIO()
+        report.write(f"{self._kind}: {self._size} вызовов за {elapsed:.3f} с\n")
+        for key, value in self._tags.items():
+            report.write(f"{key}: {value}\n")
+        report.write(f"пик памяти: {peak / 2 ** 20:.1f} МиБ\n\n")
+        pstats.Stats(self._profile, stream=report).sort_stats("cumulative").print_stats(self.top)
+        report.write("Места выделения памяти, живой на конец окна:\n")
+        for statistic in snapshot.statistics("lineno")[:self.top]:
+            report.write(f"{statistic}\n")
+        with open(path + ".txt", "w", encoding="utf-8") as file:
+            file.write(report.getvalue())
+
+        self.last_path = path
+        with self._lock:
+            self._kind = None
+            self._profile = None
+            self._tags = None
@@ -0,0 +1,129 @@
+import numpy as np
+
+from .spatial import cell_array
+
+
+class DensityPyramid:
+    # Уровень k (1 .. levels) - число живых клеток в блоках 2^k x 2^k.
+    # Уровень хранится как отсортированный массив ключей непустых блоков в порядке
+    # Z-кривой (morton_keys) и массив их счётчиков: разреженный мир не занимает
+    # памяти за пустоту, а обновление и выборка области векторизуются.
+    # Четыре блока уровня k, составляющие блок уровня k + 1, в этом порядке идут подряд,
+    # поэтому уровни строятся друг из друга без сортировки
+    def __init__(self, levels=16):
+        self.levels = levels
+        self._keys = [np.zeros(0, dtype=np.uint64) for _ in range(levels + 1)]
+        self._counts = [np.zeros(0, dtype=np.int64) for _ in range(levels + 1)]
+
+    def rebuild(self, cells):
+        for level, keys, counts in self._levels(cell_array(cells), 1):
+            self._keys[level] = keys
+            self._counts[level] = counts
+
+    def update(self, births, deaths):
+        # Инкрементальное обновление по рождениям и смертям одного поколения
+        for cells, sign in ((births, 1), (deaths, -1)):
+            for level, keys, counts in self._levels(cell_array(cells), sign):
+                self._apply(level, keys, counts)
+
+    def get_region(self, level, x0, y0, x1, y1):
+        # Счётчики блоков [x0, x1) x [y0, y1) уровня level: region[by - y0, bx - x0]
+        region = np.zeros((y1 - y0, x1 - x0), dtype=np.int64)
+        keys = self._keys[level]
+        counts = self._counts[level]
+        if not len(keys):
+            return region
+
+        # Ключи блоков области лежат между ключами её углов
+        first, last = morton_keys(np.array([[x0, y0], [x1 - 1, y1 - 1]]), level)
+        start = np.searchsorted(keys, first)
+        end = np.searchsorted(keys, last, side="right")
+        if end - start <= region.size:
+            blocks = morton_cells(keys[start:end], level)
+            inside = ((blocks[:, 0] >= x0) & (blocks[:, 0] < x1) &
+                      (blocks[:, 1] >= y0) & (blocks[:, 1] < y1))
+            region[blocks[inside, 1] - y0, blocks[inside, 0] - x0] = counts[start:end][inside]
+        else:
+            # Отрезок длиннее области: ищется каждый пиксель, O(пикселей * log блоков)
+            ys, xs = np.mgrid[y0:y1, x0:x1]
+            wanted = morton_keys(np.stack((xs.ravel(), ys.ravel()), axis=1), level)
+            index = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+            found = keys[index] == wanted
+            region.ravel()[found] = counts[index[found]]
+        return region
+
+    def _levels(self, cells, sign):
+        # Одна сортировка клеток, дальше каждый уровень - сдвиг ключей предыдущего
+        # на два бита и сложение счётчиков подряд идущих равных ключей
+        keys = np.sort(morton_keys(cells, 0))
+        counts = np.full(len(keys), sign, dtype=np.int64)
+        for level in range(1, self.levels + 1):
+            keys = keys >> np.uint64(2)
+            if len(keys):
+                starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+                keys = keys[starts]
+                counts = np.add.reduceat(counts, starts)
+            yield level, keys, counts
+
+    def _apply(self, level, keys, weights):
+        if not len(keys):
+            return
+        level_keys = self._keys[level]
+        counts = self._counts[level]
+
+        index = np.searchsorted(level_keys, keys)
+        found = index < len(level_keys)
+        found[found] = level_keys[index[found]] == keys[found]
+        counts[index[found]] += weights[found]
+
+        if not found.all():
+            new = ~found
+            level_keys = np.insert(level_keys, index[new], keys[new])
+            counts = np.insert(counts, index[new], weights[new])
+        if weights[0] < 0:
+            # Опустевшие блоки удаляются, чтобы массивы не росли от ушедших клеток
+            alive = counts != 0
+            if not alive.all():
+                level_keys = level_keys[alive]
+                counts = counts[alive]
+        self._keys[level] = level_keys
+        self._counts[level] = counts
+
+
+def morton_keys(blocks, level):
+    # Блок уровня level -> ключ Z-кривой: биты x (со сдвигом 2 ** 31 для клеток) в нечётных
+    # разрядах, биты y в чётных. Ключ блока уровня k + 1 - ключ любого его подблока >> 2
+    blocks = np.asarray(blocks, dtype=np.int64) + 2 ** (31 - level)
+    return _spread(blocks[:, 0]) << np.uint64(1) | _spread(blocks[:, 1])
+
+
+def morton_cells(keys, level):
+    xs = _compact(keys >> np.uint64(1)).astype(np.int64) - 2 ** (31 - level)
+    ys = _compact(keys).astype(np.int64) - 2 ** (31 - level)
+    return np.stack((xs, ys), axis=1)
+
+
+def _spread(values):
+    # 32 бита -> чётные разряды 64 бит
+    values = values.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in _MASKS:
+        values = (values | values << np.uint64(shift)) & np.uint64(mask)
+    return values
+
+
+def _compact(keys):
+    values = keys & np.uint64(_MASKS[-1][1])
+    for (shift, _), (_, mask) in zip(_MASKS[::-1], _MASKS[-2::-1] + [(0, 0xFFFFFFFF)]):
+        values = (values | values >> np.uint64(shift)) & np.uint64(mask)
+    return values
+
+
+_MASKS = [(16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+          (2, 0x3333333333333333), (1, 0x5555555555555555)]
+
+
+def shade(counts, level):
+    # Счётчики блоков -> яркость 0..255: пустой блок чёрный, любой непустой
+    # не темнее 64, дальше по доле живых клеток
+    density = counts / float(4 ** level)
+    return np.where(counts > 0, 64 + np.minimum(191, np.ceil(191 * density)), 0).astype(np.uint8)
@@ -0,0 +1,195 @@
+import json
+import socket
+import threading
+
+import numpy as np
+
+from .cellstore import CellSet
+from .rules import as_rule, format_rule, parse_rule
+from .server import COUNT, DELTA, IMAGE, KEYFRAME, RECT, STATE, connect, decode_keys, read_message
+from .simulation import Simulation
+from .spatial import rasterize, unpack_cells
+from .worker import Frame
+
+
+class RemoteSimulation:
+    # Мир на сервере engine.server вместо Simulation для GameScreen: кадры строятся
+    # из клеток видимой области, которые сервер присылает разницами. Правки мира уходят
+    # на сервер командами (выполняются, только если он разрешил управление);
+    # история, перемотка, движки и загрузка поля зрителю недоступны
+    max_zoom_out_level = Simulation.max_zoom_out_level
+
+    def __init__(self, address, rate=None):
+        self.closed = False
+
+        self._connection = connect(address)
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # Состояние сервера: идёт ли мир, правило, разрешено ли управление
+        # и последняя ошибка наших сообщений (None - последнее выполнено)
+        self._state = dict(running=False, rule="B3/S23", control=False, error=None)
+        self._generation = 0
+        # Последние присланные данные: область, ключи живых клеток в ней или карта плотностей
+        self._rect = None
+        self._keys = np.zeros(0, dtype=np.uint64)
+        self._image = None
+        self._frame = None
+        self._frame_number = 0
+        self._viewport = None
+
+        if rate is not None:
+            self._send(rate=rate)
+        threading.Thread(target=self._run, name="RemoteSimulation", daemon=True).start()
+
+    @property
+    def rule(self):
+        return parse_rule(self._state["rule"])
+
+    @rule.setter
+    def rule(self, rule):
+        self._command("set_rule", format_rule(as_rule(rule)))
+
+    def get_frame(self, rect):
+        if rect != self._viewport:
+            self._viewport = rect
+            self._send(viewport=list(rect))
+
+        with self._lock:
+            if self._rect is None:
+                return None
+            if self._frame is None or self._frame.number != self._frame_number:
+                x0, y0, x1, y1, level = self._rect
+                region = self._image if level else rasterize(unpack_cells(self._keys), x0, y0, x1, y1)
+                self._frame = Frame(self._frame_number, self._generation, self._rect, region)
+            return self._frame
+
+    def get_frame_number(self):
+        return self._frame_number
+
+    def get_generation(self):
+        return self._generation
+
+    def is_running(self):
+        return self._state["running"]
+
+    def has_control(self):
+        return self._state["control"]
+
+    def get_error(self):
+        return self._state.get("error")
+
+    def snapshot(self):
+        # Зрителю известны только клетки его области
+        with self._lock:
+            return self._generation, CellSet.from_keys(self._keys)
+
+    def get_positions_of_alive_cells(self):
+        return self.snapshot()[1]
+
+    def describe(self):
+        return dict(gen=self._generation, pop=len(self._keys))
+
+    def set_running(self, running: bool):
+        # Кнопка не ждёт ответа сервера, иначе GameScreen вернул бы её обратно
+        if self.has_control():
+            self._state["running"] = running
+        self._command("set_running", running)
+
+    def set_interval(self, interval: float):
+        self._command("set_interval", interval)
+
+    def set_hyper_speed(self, power):
+        self._command("set_hyper_speed", power)
+
+    def get_hyper_speed_limit(self):
+        return None
+
+    def toggle_cells(self, cells):
+        self._command("toggle_cells", [list(cell) for cell in cells])
+
+    def clear(self):
+        self._command("clear")
+
+    def drop_pyramid(self):
+        pass
+
+    def set_positions_of_alive_cells(self, positions):
+        pass
+
+    def set_engine(self, engine):
+        pass
+
+    def get_engine(self):
+        return None
+
+    def set_workers(self, workers: int):
+        pass
+
+    def set_history_enabled(self, enabled: bool):
+        pass
+
+    def get_history_range(self):
+        return None
+
+    def seek(self, generation: int):
+        pass
+
+    def get_cycle(self):
+        return None
+
+    def set_auto_pause(self, auto_pause: bool):
+        pass
+
+    def close(self):
+        self.closed = True
+        # Поток чтения держит свой файл сокета: без shutdown соединение не закроется
+        try:
+            self._connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._connection.close()
+
+    def _command(self, name, *args):
+        self._send(command=name, args=list(args))
+
+    def _send(self, **message):
+        if self.closed:
+            return
+        try:
+            with self._send_lock:
+                self._connection.sendall(json.dumps(message).encode() + b"\n")
+        except OSError:
+            self.closed = True
+
+    def _run(self):
+        file = self._connection.makefile("rb")
+        while True:
+            try:
+                message = read_message(file)
+            except (OSError, ValueError):
+                message = None
+            if message is None:
+                break
+            kind, generation, data = message
+
+            with self._lock:
+                if kind == STATE:
+                    self._state = json.loads(data)
+                elif kind in (KEYFRAME, DELTA, IMAGE):
+                    rect = RECT.unpack_from(data)
+                    data = data[RECT.size:]
+                    if kind == KEYFRAME:
+                        self._keys = decode_keys(data)
+                        self._image = None
+                    elif kind == DELTA:
+                        split = COUNT.size + 8 * COUNT.unpack_from(data)[0]
+                        births, deaths = decode_keys(data[COUNT.size:split]), decode_keys(data[split:])
+                        # Ключи остаются отсортированными, как и у сервера
+                        self._keys = np.setdiff1d(self._keys, deaths, assume_unique=True)
+                        self._keys = np.union1d(self._keys, births)
+                    else:
+                        self._image = np.frombuffer(data, dtype=np.uint8).reshape(rect[3] - rect[1], rect[2] - rect[0])
+                    self._rect = rect
+                self._generation = generation
+                self._frame_number += 1
+        self.closed = True
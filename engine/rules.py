@@ -0,0 +1,155 @@
+import collections
+import re
+
+import numpy as np
+
+# survive/birth - числа соседей для выживания и рождения;
+# states - число состояний (больше 2 - правила Generations: умирающая клетка
+# проходит состояния 2 .. states - 1 и не считается соседом);
+# radius - радиус окрестности Мура (больше 1 - Larger than Life);
+# middle - считается ли сама клетка в своей окрестности
+Rule = collections.namedtuple("Rule", ("survive", "birth", "states", "radius", "middle"), defaults=(2, 1, False))
+
+STANDARD_RULE = Rule((2, 3), (3,))
+
+_life_like_pattern = re.compile(r"B(\d*)/S(\d*)(?:/C?(\d+))?")
+_life_like_sb_pattern = re.compile(r"S(\d*)/B(\d*)(?:/C?(\d+))?")
+_golly_pattern = re.compile(r"(\d*)/(\d*)(?:/(\d+))?")
+_range_pattern = re.compile(r"(\d+)(?:(?:\.\.|-)(\d+))?")
+
+
+def as_rule(rule):
+    # Строка правила, Rule или старый кортеж (выживание, рождение) -> Rule
+    if isinstance(rule, str):
+        return parse_rule(rule)
+    if isinstance(rule, Rule):
+        return rule
+    return Rule(*(tuple(part) if i < 2 else part for i, part in enumerate(rule)))
+
+
+def is_life_like(rule):
+    rule = as_rule(rule)
+    return rule.states == 2 and rule.radius == 1 and not rule.middle
+
+
+def parse_rule(string):
+    # B36/S23, S23/B36, 23/36 (S/B), B2/S/C3, 23/3/8 (S/B/C Golly)
+    # и Larger than Life: R5,C0,M1,S34..58,B34..45,NM
+    text = string.strip().upper().replace(" ", "")
+    if text.startswith("R"):
+        return _parse_larger_than_life(string, text)
+
+    for pattern, birth_group in ((_life_like_pattern, 1), (_life_like_sb_pattern, 2), (_golly_pattern, 2)):
+        match = pattern.fullmatch(text)
+        if match is not None:
+            break
+    else:
+        raise ValueError(f"не удалось разобрать правило {string!r}")
+
+    birth = match.group(birth_group)
+    survive = match.group(3 - birth_group)
+    states = int(match.group(3)) if match.group(3) else 2
+    if "9" in birth + survive:
+        raise ValueError(f"{string!r}: у клетки не больше 8 соседей")
+    return _checked(string, Rule(tuple(sorted({int(c) for c in survive})), tuple(sorted({int(c) for c in birth})),
+                                 max(2, states)))
+
+
+def _parse_larger_than_life(string, text):
+    # Поля разделены запятыми; запятые внутри S/B продолжают список диапазонов
+    fields = {}
+    name = None
+    for token in text.split(","):
+        if token[:1].isalpha():
+            name, token = token[0], token[1:]
+            fields[name] = [token] if token else []
+        elif name is not None and token:
+            fields[name].append(token)
+        else:
+            raise ValueError(f"не удалось разобрать правило {string!r}")
+
+    try:
+        radius = int(fields["R"][0])
+        states = int(fields.get("C", ["0"])[0])
+        middle = fields.get("M", ["0"])[0] == "1"
+        neighbourhood = fields.get("N", ["M"])[0]
+        survive = _parse_ranges(fields.get("S", []))
+        birth = _parse_ranges(fields.get("B", []))
+    except (KeyError, IndexError, ValueError):
+        raise ValueError(f"не удалось разобрать правило {string!r}") from None
+
+    if neighbourhood != "M":
+        raise ValueError(f"{string!r}: поддерживается только окрестность Мура (NM)")
+    return _checked(string, Rule(survive, birth, max(2, states), radius, middle))
+
+
+def _parse_ranges(tokens):
+    counts = set()
+    for token in tokens:
+        match = _range_pattern.fullmatch(token)
+        if match is None:
+            raise ValueError(token)
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else start
+        counts.update(range(start, end + 1))
+    return tuple(sorted(counts))
+
+
+def _checked(string, rule):
+    # Состояние 255 занято под область за краем ограниченного мира (engine.bounded.OUTSIDE)
+    if rule.radius < 1 or not 2 <= rule.states <= 255:
+        raise ValueError(f"{string!r}: радиус от 1, состояний от 2 до 255")
+    if 0 in rule.birth:
+        # Мир бесконечен: при B0 пустое пространство ожило бы целиком
+        raise ValueError(f"{string!r}: правила с B0 не поддерживаются")
+    if max(rule.birth + rule.survive, default=0) > get_max_count(rule):
+        raise ValueError(f"{string!r}: число соседей больше размера окрестности")
+    return rule
+
+
+def format_rule(rule):
+    rule = as_rule(rule)
+    if rule.radius == 1 and not rule.middle:
+        text = "B" + "".join(map(str, rule.birth)) + "/S" + "".join(map(str, rule.survive))
+        return text if rule.states == 2 else f"{text}/C{rule.states}"
+    return (f"R{rule.radius},C{rule.states if rule.states > 2 else 0},M{int(rule.middle)},"
+            f"S{_format_ranges(rule.survive)},B{_format_ranges(rule.birth)},NM")
+
+
+def _format_ranges(counts):
+    runs = []
+    for count in counts:
+        if runs and runs[-1][1] == count - 1:
+            runs[-1][1] = count
+        else:
+            runs.append([count, count])
+    return ",".join(str(start) if start == end else f"{start}..{end}" for start, end in runs)
+
+
+def get_max_count(rule):
+    rule = as_rule(rule)
+    return (2 * rule.radius + 1) ** 2 - (0 if rule.middle else 1)
+
+
+def make_table(rule):
+    # Таблица для движков правил вида B/S с радиусом 1:
+    # table[alive * 9 + count] -> 1, если клетка будет жива в следующем поколении
+    rule = as_rule(rule)
+    if not is_life_like(rule):
+        raise ValueError(f"правило {format_rule(rule)} не сводится к B/S с радиусом 1")
+    table = [0] * 18
+    for count in rule.birth:
+        table[count] = 1
+    for count in rule.survive:
+        table[9 + count] = 1
+    return table
+
+
+def compile_rule(rule):
+    # -> (birth, survive): маски numpy bool по числу соседей 0 .. get_max_count(rule)
+    rule = as_rule(rule)
+    birth = np.zeros(get_max_count(rule) + 1, dtype=bool)
+    survive = np.zeros(get_max_count(rule) + 1, dtype=bool)
+    birth[list(rule.birth)] = True
+    survive[list(rule.survive)] = True
+    return birth, survive
@@ -0,0 +1,294 @@
+import os
+import re
+import struct
+
+import numpy as np
+
+from .rules import format_rule
+from .spatial import cell_array
+
+# Двоичный формат .gol: заголовок HEADER и данные с 32-го байта.
+# encoding 0 - массив int32 (count, 2) координат относительно (origin_x, origin_y);
+# encoding 1 - count записей CHUNK_DTYPE: корзина 64x64 и её битовая карта;
+# encoding 2 - клетки по строкам относительно (origin_x, origin_y), на клетку пара
+# чисел LEB128: сколько строк пропущено и сколько клеток пропущено в строке
+# (для первой клетки строки - её x). Соседние клетки занимают по два байта
+MAGIC = b"GOLB"
+VERSION = 1
+HEADER = struct.Struct("<4sBBxxQqq")
+COORDINATES = 0
+CHUNKS = 1
+VARINTS = 2
+CHUNK_SIZE = 64
+CHUNK_DTYPE = np.dtype([("cx", "<i4"), ("cy", "<i4"), ("bits", "u1", (CHUNK_SIZE * CHUNK_SIZE // 8,))])
+
+_cell_pattern = re.compile(r"\((-?\d+),\s*(-?\d+)\)")
+_rle_run_pattern = re.compile(r"(\d*)([^\d\s])")
+
+
+def read_positions(path):
+    # Формат определяется по расширению: .gol, .rle, .lif/.life, остальное - старый save1.txt
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".gol":
+        return read_binary(path)
+    if extension == ".rle":
+        return read_rle(path)
+    if extension in (".lif", ".life"):
+        return read_life106(path)
+    return read_text(path)
+
+
+def write_positions(path, positions, rule=None):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".gol":
+        write_binary(path, positions)
+    elif extension == ".rle":
+        write_rle(path, positions, rule)
+    elif extension in (".lif", ".life"):
+        write_life106(path, positions)
+    else:
+        write_text(path, positions)
+
+
+def write_positions_atomic(path, positions, rule=None):
+    # Запись во временный файл рядом, fsync и переименование поверх path: при сбое
+    # на диске остаётся либо старое сохранение, либо новое целиком
+    root, extension = os.path.splitext(path)
+    temporary = f"{root}.tmp{extension}"
+    try:
+        write_positions(temporary, positions, rule)
+        with open(temporary, "rb") as file:
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+    # Переименование тоже должно дойти до диска
+    if hasattr(os, "O_DIRECTORY"):
+        descriptor = os.open(os.path.dirname(path) or ".", os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+
+def read_text(path):
+    # Формат save1.txt: str(set) с кортежами координат, например {(0, 1), (2, 3)}
+    with open(path) as file:
+        string = file.read()
+    return {(int(x), int(y)) for x, y in _cell_pattern.findall(string)}
+
+
+def write_text(path, positions):
+    with open(path, mode="w") as file:
+        file.write(str(set(positions)))
+
+
+def read_binary(path):
+    # Данные не читаются целиком, а отображаются в память и декодируются numpy
+    with open(path, "rb") as file:
+        magic, version, encoding, count, origin_x, origin_y = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: не файл сохранения GameOfLife")
+    if count == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    if encoding == COORDINATES:
+        data = np.memmap(path, dtype="<i4", mode="r", offset=32, shape=(count, 2))
+        cells = data.astype(np.int64)
+    elif encoding == CHUNKS:
+        data = np.memmap(path, dtype=CHUNK_DTYPE, mode="r", offset=32, shape=(count,))
+        bits = np.unpackbits(data["bits"], axis=1, bitorder="little").reshape(count, CHUNK_SIZE, CHUNK_SIZE)
+        chunk, ys, xs = np.nonzero(bits)
+        cells = np.stack((xs + data["cx"][chunk].astype(np.int64) * CHUNK_SIZE,
+                          ys + data["cy"][chunk].astype(np.int64) * CHUNK_SIZE), axis=1)
+    elif encoding == VARINTS:
+        data = np.memmap(path, dtype=np.uint8, mode="r", offset=32)
+        cells = _decode_rows(_decode_varints(data, 2 * count).reshape(count, 2))
+    else:
+        raise ValueError(f"{path}: неизвестная кодировка {encoding}")
+
+    cells[:, 0] += origin_x
+    cells[:, 1] += origin_y
+    return cells
+
+
+def write_binary(path, positions):
+    # Выбирается самая компактная из кодировок
+    cells = cell_array(positions)
+    if not len(cells):
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, VARINTS, 0, 0, 0))
+        return
+
+    # Ключ корзины упаковывается в одно uint64, чтобы np.unique работал по одномерному массиву
+    keys = cells // CHUNK_SIZE
+    packed_keys, chunk = np.unique((keys[:, 0].astype(np.uint64) << np.uint64(32)) |
+                                   keys[:, 1].astype(np.uint32), return_inverse=True)
+    chunk = chunk.reshape(-1)
+    unique_keys = np.stack(((packed_keys >> np.uint64(32)).astype(np.uint32).view(np.int32),
+                            packed_keys.astype(np.uint32).view(np.int32)), axis=1)
+
+    # Сортировка по строкам, чтобы файл читался последовательно
+    origin = cells.min(axis=0)
+    rows = _encode_rows(cells[np.lexsort((cells[:, 0], cells[:, 1]))] - origin)
+    varints = _encode_varints(rows.reshape(-1))
+
+    if len(unique_keys) * CHUNK_DTYPE.itemsize < len(varints):
+        bits = np.zeros((len(unique_keys), CHUNK_SIZE, CHUNK_SIZE), dtype=np.uint8)
+        local = cells % CHUNK_SIZE
+        bits[chunk, local[:, 1], local[:, 0]] = 1
+
+        records = np.zeros(len(unique_keys), dtype=CHUNK_DTYPE)
+        records["cx"] = unique_keys[:, 0]
+        records["cy"] = unique_keys[:, 1]
+        records["bits"] = np.packbits(bits.reshape(len(unique_keys), -1), axis=1, bitorder="little")
+        header = HEADER.pack(MAGIC, VERSION, CHUNKS, len(records), 0, 0)
+        data = records.tobytes()
+    else:
+        header = HEADER.pack(MAGIC, VERSION, VARINTS, len(cells), int(origin[0]), int(origin[1]))
+        data = varints.tobytes()
+
+    with open(path, "wb") as file:
+        file.write(header)
+        file.write(data)
+
+
+def _encode_rows(cells):
+    # Клетки (неотрицательные, по строкам) -> пары (пропуск строк, пропуск в строке)
+    xs, ys = cells[:, 0], cells[:, 1]
+    skipped_rows = np.diff(ys, prepend=0)
+    new_row = skipped_rows > 0
+    new_row[0] = True
+    skipped_cells = np.where(new_row, xs, xs - np.roll(xs, 1) - 1)
+    return np.stack((skipped_rows, skipped_cells), axis=1).astype(np.uint64)
+
+
+def _decode_rows(rows):
+    skipped_rows, skipped_cells = rows[:, 0].astype(np.int64), rows[:, 1].astype(np.int64)
+    new_row = skipped_rows > 0
+    new_row[0] = True
+    # x - сумма шагов (пропуск + 1) от начала своей строки
+    steps = np.cumsum(skipped_cells + 1)
+    row_start = np.maximum.accumulate(np.where(new_row, np.arange(len(rows)), 0))
+    xs = steps - (steps[row_start] - skipped_cells[row_start])
+    return np.stack((xs, np.cumsum(skipped_rows)), axis=1)
+
+
+def _encode_varints(values):
+    # LEB128: по 7 бит на байт, старший бит байта - за ним идёт продолжение
+    lengths = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        lengths += rest > 0
+        rest >>= np.uint64(7)
+
+    owner = np.repeat(np.arange(len(values)), lengths)
+    position = np.arange(len(owner)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    data = ((values[owner] >> (np.uint64(7) * position.astype(np.uint64))) & np.uint64(0x7F)).astype(np.uint8)
+    data[position < lengths[owner] - 1] |= 0x80
+    return data
+
+
+def _decode_varints(data, count):
+    ends = np.flatnonzero(data < 0x80)[:count]
+    if len(ends) < count:
+        raise ValueError("сохранение обрезано")
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    used = np.asarray(data[:ends[-1] + 1])
+    owner = np.repeat(np.arange(count), ends - starts + 1)
+    position = (np.arange(len(used)) - starts[owner]).astype(np.uint64)
+    # Семибитные части не пересекаются, поэтому сумма равна их объединению
+    return np.add.reduceat((used & 0x7F).astype(np.uint64) << (np.uint64(7) * position), starts)
+
+
+def read_rle(path):
+    cells = []
+    x = y = 0
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#") or line.startswith("x"):
+                continue
+            for count, tag in _rle_run_pattern.findall(line):
+                count = int(count) if count else 1
+                if tag == "!":
+                    return cells
+                if tag == "$":
+                    x = 0
+                    y += count
+                elif tag in "b.":
+                    x += count
+                else:
+                    cells.extend((x + i, y) for i in range(count))
+                    x += count
+    return cells
+
+
+def write_rle(path, positions, rule=None):
+    cells = cell_array(positions)
+    if len(cells):
+        min_x, min_y = cells.min(axis=0)
+        max_x, max_y = cells.max(axis=0)
+    else:
+        min_x = min_y = 0
+        max_x = max_y = -1
+
+    rows = {}
+    for x, y in cells.tolist():
+        rows.setdefault(y, []).append(x)
+
+    # Серии "b" (мёртвые), "o" (живые), "$" (перевод строки)
+    tokens = []
+    previous_y = min_y
+    for y in sorted(rows):
+        if y != previous_y:
+            tokens.append(("$", y - previous_y))
+        previous_y = y
+        x = min_x
+        for cell_x in sorted(rows[y]):
+            if cell_x > x:
+                tokens.append(("b", cell_x - x))
+            if tokens and tokens[-1][0] == "o" and cell_x == x:
+                tokens[-1] = ("o", tokens[-1][1] + 1)
+            else:
+                tokens.append(("o", 1))
+            x = cell_x + 1
+
+    header = f"x = {max_x - min_x + 1}, y = {max_y - min_y + 1}"
+    if rule is not None:
+        header += f", rule = {format_rule(rule)}"
+
+    lines = [header]
+    line = ""
+    for tag, count in tokens + [("!", 1)]:
+        token = (str(count) if count > 1 else "") + tag
+        if len(line) + len(token) > 70:
+            lines.append(line)
+            line = ""
+        line += token
+    lines.append(line)
+
+    with open(path, mode="w") as file:
+        file.write("\n".join(lines) + "\n")
+
+
+def read_life106(path):
+    cells = []
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                x, y = line.split()
+                cells.append((int(x), int(y)))
+    return cells
+
+
+def write_life106(path, positions):
+    with open(path, mode="w") as file:
+        file.write("#Life 1.06\n")
+        for x, y in cell_array(positions).tolist():
+            file.write(f"{x} {y}\n")
+
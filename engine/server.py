@@ -0,0 +1,371 @@
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from .batch import ENGINES, RULES
+from .rules import format_rule, parse_rule
+from .saves import read_positions
+from .simulation import Simulation
+from .spatial import pack_cells
+
+# Сообщение сервера: заголовок HEADER (вид, поколение, длина данных) и данные, сжатые zlib.
+# Область - RECT (x0, y0, x1, y1, level). Ключи клеток (engine.spatial.pack_cells)
+# передаются отсортированными разностями соседних: так они сжимаются в разы лучше
+HEADER = struct.Struct("<BqI")
+RECT = struct.Struct("<5q")
+COUNT = struct.Struct("<Q")
+STATE = 0     # JSON: running, rule, control, error (последняя ошибка команды зрителя или None)
+KEYFRAME = 1  # RECT и ключи всех живых клеток области
+DELTA = 2     # RECT, число рождений COUNT, ключи рождений, ключи смертей
+IMAGE = 3     # RECT и карта плотностей uint8 (y1 - y0, x1 - x0) отдалённого вида
+
+# Команды зрителей, которые сервер выполняет, если ему разрешено управление
+COMMANDS = ("set_running", "set_interval", "set_hyper_speed", "toggle_cells", "clear", "set_rule")
+
+
+def parse_address(address):
+    # "host:port" или ":port" - TCP, иначе путь Unix-сокета
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit():
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return socket.AF_UNIX, address
+
+
+def connect(address):
+    family, target = parse_address(address)
+    connection = socket.socket(family, socket.SOCK_STREAM)
+    connection.connect(target)
+    if family == socket.AF_INET:
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return connection
+
+
+def encode_keys(keys):
+    return np.diff(keys, prepend=np.uint64(0)).astype("<u8").tobytes()
+
+
+def decode_keys(data):
+    # Сумма разностей по модулю 2 ** 64 восстанавливает ключи
+    return np.cumsum(np.frombuffer(data, dtype="<u8").astype(np.uint64), dtype=np.uint64)
+
+
+def pack_message(kind, generation, payload, level=1):
+    data = zlib.compress(payload, level)
+    return HEADER.pack(kind, generation, len(data)) + data
+
+
+def read_message(file):
+    # -> (вид, поколение, данные) или None, если соединение закрыто
+    header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    kind, generation, size = HEADER.unpack(header)
+    data = file.read(size)
+    if len(data) < size:
+        return None
+    return kind, generation, zlib.decompress(data)
+
+
+class SimulationServer:
+    # Раздаёт мир Simulation зрителям по локальному TCP или Unix-сокету. Зритель присылает
+    # строки JSON: {"viewport": [x0, y0, x1, y1, level]}, {"rate": обновлений в секунду},
+    # {"command": имя из COMMANDS, "args": [...]}. В ответ получает ключевой кадр своей
+    # области, а затем только рождения и смерти в ней - не чаще rate раз в секунду
+    # и не больше max_bandwidth байт в секунду; промежуточные поколения сливаются в одну
+    # разницу. При отдалении (level > 0) вместо клеток приходит карта плотностей.
+    # Ошибочное сообщение не рвёт соединение: текст ошибки приходит зрителю в STATE
+
+    # Наибольшая сторона области зрителя, в клетках или точках карты плотностей
+    max_viewport = 4096
+
+    def __init__(self, simulation, address, max_rate=30, max_bandwidth=None, allow_control=False, compression=1):
+        self.simulation = simulation
+        self.address = address
+        self.max_rate = max_rate
+        self.max_bandwidth = max_bandwidth
+        self.allow_control = allow_control
+        self.compression = compression
+
+        self._socket = None
+        self._closed = False
+        self._viewers = []
+        self._lock = threading.Lock()
+        # Снимок мира общий для всех зрителей и берётся не чаще раза в 1 / (2 * max_rate) с
+        self._snapshot = None
+        self._snapshot_time = 0
+
+    def start(self):
+        family, target = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(target):
+            os.remove(target)
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(target)
+        self._socket.listen()
+        threading.Thread(target=self._accept, name="SimulationServer", daemon=True).start()
+
+    def close(self):
+        self._closed = True
+        if self._socket is not None:
+            self._socket.close()
+            family, target = parse_address(self.address)
+            if family == socket.AF_UNIX and os.path.exists(target):
+                os.remove(target)
+        for viewer in self.get_viewers():
+            viewer.close()
+
+    def get_viewers(self):
+        with self._lock:
+            return list(self._viewers)
+
+    def snapshot(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is None or now - self._snapshot_time >= 0.5 / self.max_rate:
+                self._snapshot = self.simulation.snapshot()
+                self._snapshot_time = now
+            return self._snapshot
+
+    def get_state(self):
+        return dict(running=self.simulation.is_running(), rule=format_rule(self.simulation.rule),
+                    control=self.allow_control)
+
+    def clamp_viewport(self, viewport):
+        # Область зрителя в допустимых пределах: иначе отдалённый вид огромной
+        # области занял бы всю память сервера
+        x0, y0, x1, y1, level = (int(value) for value in viewport)
+        level = max(0, min(self.simulation.max_zoom_out_level, level))
+        x0 = max(-2 ** 31, min(2 ** 31, x0))
+        y0 = max(-2 ** 31, min(2 ** 31, y0))
+        x1 = x0 + max(0, min(self.max_viewport, x1 - x0))
+        y1 = y0 + max(0, min(self.max_viewport, y1 - y0))
+        return x0, y0, x1, y1, level
+
+    def run_command(self, name, args):
+        # Аргументы приводятся к нужным типам здесь: ошибка должна случиться
+        # в потоке зрителя, а не позже в воркере симуляции
+        if not self.allow_control:
+            raise ValueError("сервер не разрешает управление")
+        if name not in COMMANDS:
+            raise ValueError(f"неизвестная команда {name!r}")
+        if name == "set_rule":
+            self.simulation.rule = parse_rule(str(args[0]))
+        elif name == "toggle_cells":
+            self.simulation.toggle_cells([(int(x), int(y)) for x, y in args[0]])
+        elif name == "set_running":
+            self.simulation.set_running(bool(args[0]))
+        elif name == "set_interval":
+            interval = float(args[0])
+            if not 0 <= interval < float("inf"):
+                raise ValueError(f"интервал {interval} вне допустимых значений")
+            self.simulation.set_interval(interval)
+        elif name == "set_hyper_speed":
+            self.simulation.set_hyper_speed(None if args[0] is None else max(1, min(30, int(args[0]))))
+        else:
+            self.simulation.clear()
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                connection, _ = self._socket.accept()
+            except OSError:
+                break
+            if connection.family == socket.AF_INET:
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            viewer = Viewer(self, connection)
+            with self._lock:
+                self._viewers.append(viewer)
+            viewer.start()
+
+    def _remove(self, viewer):
+        with self._lock:
+            if viewer in self._viewers:
+                self._viewers.remove(viewer)
+
+
+class Viewer:
+    # Соединение одного зрителя: поток чтения команд и поток отправки обновлений.
+    # Медленный зритель задерживает только свой поток отправки
+    def __init__(self, server, connection):
+        self.rate = server.max_rate
+        self.viewport = None
+        self.sent_bytes = 0
+        # Текст последней ошибки сообщения зрителя, None - последнее сообщение выполнено
+        self.error = None
+
+        self._server = server
+        self._connection = connection
+        self._closed = False
+        self._wake = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._read, name="Viewer.read", daemon=True).start()
+        threading.Thread(target=self._send, name="Viewer.send", daemon=True).start()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        try:
+            self._connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._connection.close()
+        self._server._remove(self)
+
+    def _read(self):
+        try:
+            for line in self._connection.makefile("rb"):
+                try:
+                    self._handle(json.loads(line))
+                    self.error = None
+                except Exception as error:
+                    self._report(error)
+        except OSError:
+            pass
+        self.close()
+
+    def _handle(self, message):
+        if not isinstance(message, dict):
+            raise ValueError("сообщение должно быть объектом JSON")
+        if "viewport" in message:
+            self.viewport = self._server.clamp_viewport(message["viewport"])
+            self._wake.set()
+        if "rate" in message:
+            rate = float(message["rate"])
+            if rate != rate:
+                raise ValueError("rate не число")
+            self.rate = max(1, min(self._server.max_rate, rate))
+        if "command" in message:
+            self._server.run_command(message["command"], message.get("args", ()))
+
+    def _report(self, error):
+        # Ошибка уходит зрителю в ближайшем STATE
+        self.error = f"{type(error).__name__}: {error}"
+        self._wake.set()
+
+    def _send(self):
+        server = self._server
+        sent_state = sent_rect = sent_keys = sent_generation = None
+        next_time = time.monotonic()
+
+        while not self._closed:
+            # Новая область не ждёт очередного срока, остальное - не чаще rate раз в секунду
+            self._wake.wait(max(0.0, next_time - time.monotonic()))
+            self._wake.clear()
+            now = time.monotonic()
+            if now < next_time and self.viewport == sent_rect:
+                continue
+            next_time = now + 1 / self.rate
+
+            try:
+                messages, sent = self._render_updates(self.viewport, sent_rect, sent_keys, sent_generation)
+                sent_rect, sent_keys, sent_generation = sent
+            except Exception as error:
+                # Область не удалось построить: зритель узнает об этом, а не потеряет соединение.
+                # Попытка повторится в следующий срок
+                self._report(error)
+                messages = []
+
+            state = dict(server.get_state(), error=self.error)
+            if state != sent_state:
+                sent_state = state
+                messages.insert(0, pack_message(STATE, server.simulation.get_generation(),
+                                                json.dumps(state).encode(), server.compression))
+
+            if messages:
+                data = b"".join(messages)
+                try:
+                    self._connection.sendall(data)
+                except OSError:
+                    break
+                self.sent_bytes += len(data)
+                if server.max_bandwidth is not None:
+                    next_time = max(next_time, now + len(data) / server.max_bandwidth)
+        self.close()
+
+    def _render_updates(self, rect, sent_rect, sent_keys, sent_generation):
+        # Сообщения KEYFRAME, DELTA или IMAGE для области rect после отправленной sent_rect.
+        # -> (сообщения, (область, ключи, поколение) после их отправки)
+        server = self._server
+        messages = []
+        if rect is None:
+            return messages, (sent_rect, sent_keys, sent_generation)
+
+        if not rect[4]:
+            generation, cells = server.snapshot()
+            keys = pack_cells(cells.in_rect(*rect[:4]))
+            header = RECT.pack(*rect)
+            if rect != sent_rect:
+                messages.append(pack_message(KEYFRAME, generation, header + encode_keys(keys), server.compression))
+            else:
+                births = np.setdiff1d(keys, sent_keys, assume_unique=True)
+                deaths = np.setdiff1d(sent_keys, keys, assume_unique=True)
+                if len(births) + len(deaths) >= len(keys):
+                    messages.append(pack_message(KEYFRAME, generation, header + encode_keys(keys),
+                                                 server.compression))
+                elif len(births) or len(deaths) or generation != sent_generation:
+                    payload = header + COUNT.pack(len(births)) + encode_keys(births) + encode_keys(deaths)
+                    messages.append(pack_message(DELTA, generation, payload, server.compression))
+            return messages, (rect, keys, generation)
+
+        generation = server.simulation.get_generation()
+        if rect != sent_rect or generation != sent_generation:
+            generation, region = server.simulation.render(rect)
+            payload = RECT.pack(*rect) + np.ascontiguousarray(region, dtype=np.uint8).tobytes()
+            messages.append(pack_message(IMAGE, generation, payload, server.compression))
+        return messages, (rect, None, generation)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m engine.server",
+                                     description="Мир без окна, раздаваемый зрителям (GameOfLife.py --connect)")
+    parser.add_argument("pattern", nargs="?", default=None, help="файл шаблона: .gol, .rle, .lif или save1.txt")
+    parser.add_argument("-l", "--listen", default="127.0.0.1:7777", help="host:port или путь Unix-сокета")
+    parser.add_argument("-e", "--engine", choices=sorted(ENGINES), default="packed")
+    parser.add_argument("-r", "--rule", default="standard",
+                        help=f"имя набора ({', '.join(sorted(RULES))}) или строка правила, например B36/S23")
+    parser.add_argument("-i", "--interval", type=float, default=0.05, help="секунд между поколениями")
+    parser.add_argument("--max-rate", type=float, default=30, help="обновлений зрителю в секунду")
+    parser.add_argument("--max-bandwidth", type=float, default=None, help="байт зрителю в секунду")
+    parser.add_argument("--control", action="store_true", help="зрители могут управлять миром")
+    parser.add_argument("--paused", action="store_true", help="не запускать мир сразу")
+    args = parser.parse_args(argv)
+
+    try:
+        engine = ENGINES[args.engine](rule=parse_rule(RULES.get(args.rule, args.rule)))
+    except ValueError as error:
+        parser.error(str(error))
+    simulation = Simulation(engine)
+    if args.pattern is not None:
+        simulation.set_positions_of_alive_cells(read_positions(args.pattern))
+    simulation.set_interval(args.interval)
+    simulation.set_running(not args.paused)
+
+    server = SimulationServer(simulation, args.listen, args.max_rate, args.max_bandwidth, args.control)
+    server.start()
+    print(f"сервер на {args.listen}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(5)
+            viewers = server.get_viewers()
+            print(f"поколение {simulation.get_generation()}, зрителей {len(viewers)}, "
+                  f"отправлено {sum(viewer.sent_bytes for viewer in viewers) / 2 ** 20:.1f} МиБ", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+from .cellstore import CellSet
+from .cycles import CycleDetector
+from .history import History
+from .packed import PackedEngine
+from .pyramid import DensityPyramid, shade
+from .worker import SimulationWorker
+
+
+class Simulation:
+    # Мир вместе с фоновым воркером: движок, история, поиск циклов и пирамида плотностей.
+    # Без pygame - интерфейс только берёт готовые кадры (get_frame) и передаёт правки.
+    # Поколения считаются в фоновом потоке; любой доступ к движку - под lock воркера
+
+    # Наибольшее отдаление: 2 ** max_zoom_out_level клеток на пиксель
+    max_zoom_out_level = 16
+    # Движки без advance считают гиперскорость по поколению, поэтому шаг для них
+    # не больше 2 ** max_plain_hyper_speed_power поколений: иначе воркер надолго держит lock
+    max_plain_hyper_speed_power = 6
+
+    def __init__(self, engine=None, metrics=None, profiler=None):
+        self._engine = engine if engine is not None else PackedEngine()
+        self._hyper_speed_power = None
+        self._history = None
+        # Поиск повторов состояния; пока цикл не найден, хеш каждого поколения
+        # обновляется по рождениям и смертям или берётся ключ состояния движка.
+        # Движки без того и другого хешируют все клетки на каждом шаге
+        self._cycles = CycleDetector()
+        self._auto_pause = False
+        # Пирамида плотностей для отдалённого вида; строится при первом отдалении
+        # и дальше обновляется по рождениям и смертям. stale - её нужно перестроить
+        self._pyramid = None
+        self._pyramid_stale = True
+
+        # Замеры (engine.metrics) и снимки профиля (engine.profiling) шагов, если заданы
+        self._metrics = metrics
+        step = self._step
+        if metrics is not None:
+            step = metrics.timed("step_ms")(step)
+        if profiler is not None:
+            step = profiler.captured("generations", self._describe)(step)
+
+        self._worker = SimulationWorker(step, self._render)
+
+    @property
+    def rule(self):
+        return self._engine.rule
+
+    @rule.setter
+    def rule(self, rule):
+        with self._worker.lock:
+            self._engine.rule = rule
+            self._cycles.reset()
+
+    def set_engine(self, engine):
+        engine.rule = self._engine.rule
+        if hasattr(engine, "start"):
+            # Процессы ParallelEngine запускаются до lock, пока воркер продолжает считать
+            engine.start()
+        with self._worker.lock:
+            engine.set_positions_of_alive_cells(self._engine.get_cell_array())
+            if hasattr(self._engine, "close"):
+                self._engine.close()
+            self._engine = engine
+            # Границы нового мира могли обрезать клетки: найденный цикл уже неверен
+            self._world_changed()
+        self._worker.invalidate()
+
+    def get_engine(self):
+        return self._engine
+
+    def set_workers(self, workers: int):
+        # Число процессов ParallelEngine. Новый пул запускается вне lock, а старый
+        # закрывается под lock: иначе воркер может быть внутри шага, пока пул
+        # и общая память уже освобождены
+        engine = self._engine
+        if not hasattr(engine, "set_workers"):
+            return
+        pool = engine.create_pool(workers) if workers > 1 else None
+        with self._worker.lock:
+            if engine is self._engine:
+                engine.set_workers(workers, pool)
+                pool = None
+        if pool is not None:
+            pool.terminate()
+
+    def get_frame(self, rect):
+        # Последний готовый кадр воркера. Если нужна другая область (x0, y0, x1, y1, level),
+        # кадр строится заново, но только когда воркер не занят поколением - иначе
+        # отдаётся старый. None - кадров ещё не было
+        self._worker.set_viewport(rect)
+        frame = self._worker.get_frame()
+        if frame is None or frame.rect != rect:
+            if self._worker.lock.acquire(blocking=False):
+                try:
+                    self._worker.publish(rect)
+                finally:
+                    self._worker.lock.release()
+                frame = self._worker.get_frame()
+        return frame
+
+    def render(self, rect):
+        # Область (x0, y0, x1, y1, level) помимо кадра воркера - для зрителей engine.server.
+        # -> (поколение, битовая карта или карта плотностей)
+        with self._worker.lock:
+            return self._worker.generation, self._render(*rect)
+
+    def get_frame_number(self):
+        return self._worker.get_frame_number()
+
+    def drop_pyramid(self):
+        # Пирамида нужна только при отдалении, иначе она лишь замедляет шаги
+        self._pyramid = None
+
+    def toggle_cells(self, cells):
+        if hasattr(self._engine, "fit_cells"):
+            # Ограниченный мир: клетки переносятся через край тора или обрезаются границей
+            cells = [tuple(cell) for cell in self._engine.fit_cells(cells).tolist()]
+        self._worker.submit(lambda: self._toggle_cells(cells))
+
+    def set_positions_of_alive_cells(self, positions: set):
+        with self._worker.lock:
+            self._engine.set_positions_of_alive_cells(positions)
+            self._world_changed()
+        self._worker.invalidate()
+
+    def get_positions_of_alive_cells(self):
+        return self.snapshot()[1]
+
+    def snapshot(self):
+        # (поколение, клетки) одного момента. Клетки - неизменяемый CellSet: он ведёт себя
+        # как множество кортежей, занимает 8 байт на клетку, и с ним можно работать
+        # в другом потоке, пока мир живёт дальше. Множество PackedEngine и так неизменяемо -
+        # снимок тогда ничего не копирует
+        with self._worker.lock:
+            cells = self._engine.get_positions_of_alive_cells()
+            if not isinstance(cells, CellSet):
+                cells = CellSet(self._engine.get_cell_array())
+            return self._worker.generation, cells
+
+    def set_running(self, running: bool):
+        self._worker.set_running(running)
+
+    def is_running(self):
+        return self._worker.is_running()
+
+    def set_interval(self, interval: float):
+        self._worker.set_interval(interval)
+
+    def set_hyper_speed(self, power):
+        # power - степень двойки поколений за шаг, None - обычная скорость
+        with self._worker.lock:
+            if power != self._hyper_speed_power:
+                # Период, найденный с прежним шагом, может быть кратным настоящему
+                self._cycles.reset()
+            self._hyper_speed_power = power
+
+    def get_hyper_speed_limit(self):
+        # Наибольшая степень гиперскорости для текущего движка, None - без ограничения
+        return None if hasattr(self._engine, "advance") else self.max_plain_hyper_speed_power
+
+    def set_history_enabled(self, enabled: bool):
+        with self._worker.lock:
+            if not enabled:
+                self._history = None
+            elif self._history is None:
+                self._history = History()
+                self._history.record(self._worker.generation, self._engine.get_cell_array())
+
+    def get_history_range(self):
+        with self._worker.lock:
+            if self._history is None:
+                return None
+            return self._history.get_range()
+
+    def get_generation(self):
+        return self._worker.generation
+
+    def seek(self, generation: int):
+        # Восстанавливает последнее записанное поколение не позже generation.
+        # Поколения после записанных в найденном цикле досчитываются по остатку от периода
+        with self._worker.lock:
+            history_range = self._history.get_range() if self._history is not None else None
+            if (self._cycles.cycle is not None and generation >= self._worker.generation and
+                    (history_range is None or generation > history_range[1])):
+                self._skip(generation - self._worker.generation)
+                self._worker.generation = generation
+                self._pyramid_stale = True
+            elif history_range is not None:
+                found = self._history.seek(max(0, generation))
+                if found is None:
+                    return
+                self._worker.generation, cells = found
+                self._engine.set_positions_of_alive_cells(cells)
+                self._world_changed()
+        self._worker.invalidate()
+
+    def get_cycle(self):
+        return self._cycles.cycle
+
+    def set_auto_pause(self, auto_pause: bool):
+        self._auto_pause = auto_pause
+
+    def describe(self):
+        with self._worker.lock:
+            return self._describe()
+
+    def calculate_next_gen(self):
+        self._engine.calculate_next_gen()
+
+    def advance(self, power: int):
+        # HashLife умеет делать 2 ** power поколений за один вызов, остальные движки - по одному
+        if hasattr(self._engine, "advance"):
+            self._engine.advance(power)
+        else:
+            for _ in range(2 ** power):
+                self._engine.calculate_next_gen()
+
+    def clear(self):
+        with self._worker.lock:
+            self._engine.clear()
+            self._world_changed()
+        self._worker.invalidate()
+
+    def _toggle_cells(self, cells):
+        self._engine.toggle_cells(cells)
+        self._world_changed()
+
+    def _step(self):
+        power = self._hyper_speed_power
+        limit = self.get_hyper_speed_limit()
+        if power is not None and limit is not None:
+            power = min(power, limit)
+        generations = 1 if power is None else 2 ** power
+        generation = self._worker.generation + generations
+
+        if self._cycles.is_empty() and self._engine.rule.states == 2:
+            # Поколение после загрузки или правки тоже начало цикла: без него
+            # мигалка, загруженная в поколении 0, нашлась бы со сдвигом 1.
+            # Записывается здесь, а не при каждой правке: полный хеш - один на серию правок
+            self._remember_state(self._worker.generation)
+
+        # Рождения и смерти за шаг, если поколение посчитано ровно одним calculate_next_gen
+        changes = None
+        if self._cycles.cycle is not None:
+            self._skip(generations)
+        elif power is None:
+            self.calculate_next_gen()
+            if hasattr(self._engine, "get_last_changes"):
+                changes = self._engine.get_last_changes()
+            self._detect_cycle(generation)
+        else:
+            self.advance(power)
+            self._detect_cycle(generation)
+
+        if self._history is not None:
+            if changes is None or not self._history.record_changes(generation, *changes):
+                self._history.record(generation, self._engine.get_cell_array())
+
+        if self._metrics is not None and self._metrics.enabled:
+            self._record_metrics(generations)
+
+        pyramid = self._pyramid
+        if pyramid is not None and not self._pyramid_stale:
+            # Обновление по рождениям и смертям возможно, только если прошло ровно одно поколение
+            changes = None
+            if generations == 1 and hasattr(self._engine, "get_last_changes"):
+                changes = self._engine.get_last_changes()
+            if changes is not None:
+                pyramid.update(*changes)
+            else:
+                self._pyramid_stale = True
+        return generations
+
+    def _describe(self):
+        # Метки снимка профиля. Вызывается под lock
+        return dict(gen=self._worker.generation, pop=self._engine.get_population())
+
+    def _record_metrics(self, generations):
+        self._metrics.record("generations", generations)
+        self._metrics.record("population", self._engine.get_population())
+        if generations == 1 and hasattr(self._engine, "get_last_changes"):
+            changes = self._engine.get_last_changes()
+            if changes is not None:
+                self._metrics.record("births", len(changes[0]))
+                self._metrics.record("deaths", len(changes[1]))
+
+    def _detect_cycle(self, generation):
+        # В правилах Generations состояние не сводится к живым клеткам
+        if self._engine.rule.states > 2:
+            return
+
+        changes = None
+        if self._hyper_speed_power is None and hasattr(self._engine, "get_last_changes"):
+            changes = self._engine.get_last_changes()
+
+        if changes is not None and self._cycles.has_hash():
+            cycle = self._cycles.apply(generation, *changes)
+        else:
+            cycle = self._remember_state(generation)
+
+        if cycle is not None and self._auto_pause:
+            self._worker.set_running(False)
+
+    def _remember_state(self, generation):
+        # Запоминает поколение. Для движков с рождениями и смертями это затравка,
+        # дальше хеш обновляется по ним; остальные хешируют все клетки каждый раз. Вызывается под lock
+        if hasattr(self._engine, "get_state_key"):
+            return self._cycles.record_state(generation, self._engine.get_state_key())
+        return self._cycles.record(generation, self._engine.get_cell_array())
+
+    def _skip(self, generations):
+        # Мир в цикле: вместо generations поколений достаточно досчитать остаток
+        # от деления на период. Натюрморт не пересчитывается вовсе. Вызывается под lock
+        remainder = generations % self._cycles.cycle.period
+        if hasattr(self._engine, "advance"):
+            # HashLife досчитывает остаток прыжками по двоичным разрядам
+            power = 0
+            while remainder:
+                if remainder & 1:
+                    self._engine.advance(power)
+                remainder >>= 1
+                power += 1
+        else:
+            for _ in range(remainder):
+                self._engine.calculate_next_gen()
+
+    def _world_changed(self):
+        # Мир изменён не шагом симуляции. Вызывается под lock
+        self._cycles.reset()
+        self._pyramid_stale = True
+        if self._history is not None:
+            self._history.mark_edited()
+
+    def _render(self, x0, y0, x1, y1, level=0):
+        if not level:
+            return self._engine.get_region(x0, y0, x1, y1)
+
+        # Кадр отдалённого вида стоит O(пикселей), сколько бы ни было клеток
+        if hasattr(self._engine, "get_density"):
+            # HashLife считает блоки по населению узлов квадродерева, пирамида не нужна
+            return shade(self._engine.get_density(level, x0, y0, x1, y1), level)
+        pyramid = self._pyramid
+        if pyramid is None:
+            pyramid = self._pyramid = DensityPyramid(levels=self.max_zoom_out_level)
+            self._pyramid_stale = True
+        if self._pyramid_stale:
+            pyramid.rebuild(self._engine.get_cell_array())
+            self._pyramid_stale = False
+        return shade(pyramid.get_region(level, x0, y0, x1, y1), level)
@@ -0,0 +1,170 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from .bitboard import next_rows
+from .cycles import mix
+from .rules import STANDARD_RULE, make_table
+
+
+def random_seeds(count, size=16, density=0.5, rng=None):
+    # count случайных затравок size x size: массив (count, size, size) из 0 и 1
+    rng = np.random.default_rng() if rng is None else rng
+    return (rng.random((count, size, size)) < density).astype(np.uint8)
+
+
+def run_soups(seeds, rule=STANDARD_RULE, box=256, max_generations=10000, max_period=60, compact_ratio=0.25):
+    # Независимые миры box x box (за краем всегда мёртвые клетки) с затравками seeds (K, s, s)
+    # в центре, упакованные по строкам, как в engine.bitboard: массив (K, box, box / 64).
+    # Мир останавливается, как только его состояние повторило одно из max_period предыдущих.
+    # -> словарь массивов длины K: population - итоговое население, lifespan - поколение,
+    # с которого мир повторяется (max_generations, если не успел), period - период (0 - не успел)
+    if box % 64:
+        raise ValueError("размер мира должен быть кратен 64")
+    table = make_table(rule)
+    birth_counts = [count for count in range(9) if table[count]]
+    survival_counts = [count for count in range(9) if table[9 + count]]
+
+    seeds = np.asarray(seeds, dtype=np.uint8)
+    count, size = len(seeds), seeds.shape[1]
+    words = box // 64
+    population = np.zeros(count, dtype=np.int64)
+    lifespan = np.full(count, max_generations, dtype=np.int64)
+    period = np.zeros(count, dtype=np.int64)
+    if not count:
+        return dict(population=population, lifespan=lifespan, period=period)
+
+    bits = np.zeros((count, box, box), dtype=np.uint8)
+    start = (box - size) // 2
+    bits[:, start:start + seeds.shape[1], start:start + seeds.shape[2]] = seeds
+    board = np.ascontiguousarray(np.packbits(bits, axis=2, bitorder="little")).view("<u8").astype(np.uint64)
+    del bits
+
+    # Хеш поля - сумма по словам mix(слово ^ соль места) - mix(соль места) по модулю 2 ** 64:
+    # пустые слова в него не входят, поэтому его можно считать только по занятой области
+    salt = np.random.default_rng(0x5EED).integers(0, 2 ** 63, size=(box, words), dtype=np.uint64)
+    empty = mix(salt)
+    # history[:, g % max_period] - хеш поколения g; index - номера миров в стопке;
+    # закончившиеся миры считаются дальше, пока их не наберётся compact_ratio от стопки
+    history = np.zeros((count, max_period), dtype=np.uint64)
+    history[:, 0] = _hash(board, salt, empty)
+    index = np.arange(count)
+    finished = np.zeros(count, dtype=bool)
+
+    for generation in range(1, max_generations + 1):
+        # Считается только общая для всей стопки занятая область с запасом в строку и слово
+        # (за ним рождений быть не может). Под областью - пустая строка: она отделяет мир
+        # от следующего, и шаг всей стопки - один вызов next_rows
+        rows = np.flatnonzero(board.any(axis=(0, 2)))
+        if len(rows):
+            columns = np.flatnonzero(board.any(axis=(0, 1)))
+            top, bottom = max(0, rows[0] - 1), min(box, rows[-1] + 2)
+            left, right = max(0, columns[0] - 1), min(words, columns[-1] + 2)
+
+            window = np.zeros((len(board), bottom - top + 1, right - left), dtype=np.uint64)
+            window[:, :-1] = board[:, top:bottom, left:right]
+            window = next_rows(window.reshape(-1, right - left), None, None,
+                               birth_counts, survival_counts).reshape(window.shape)
+            board[:, top:bottom, left:right] = window[:, :-1]
+            hashes = _hash(board[:, top:bottom, left:right], salt[top:bottom, left:right],
+                           empty[top:bottom, left:right])
+        else:
+            hashes = np.zeros(len(board), dtype=np.uint64)
+
+        match = history[:, :min(generation, max_period)] == hashes[:, None]
+        done = match.any(axis=1) & ~finished
+        if done.any():
+            slots = match[done].argmax(axis=1)
+            periods = (generation - slots) % max_period
+            periods[periods == 0] = max_period
+            period[index[done]] = periods
+            lifespan[index[done]] = generation - periods
+            population[index[done]] = _population(board[done])
+            finished |= done
+            if finished.all():
+                break
+        history[:, generation % max_period] = hashes
+
+        if finished.sum() >= compact_ratio * len(finished):
+            alive = ~finished
+            board = board[alive]
+            history = history[alive]
+            index = index[alive]
+            finished = finished[alive]
+
+    unfinished = ~finished
+    population[index[unfinished]] = _population(board[unfinished])
+    return dict(population=population, lifespan=lifespan, period=period)
+
+
+def _hash(board, salt, empty):
+    # Слова перемешиваются: в простой сумме слов с множителями старшие биты слов почти
+    # не влияют на результат, и разные поля совпадали бы слишком часто
+    return (mix(board ^ salt) - empty).sum(axis=(1, 2), dtype=np.uint64)
+
+
+def _population(board):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(board).sum(axis=(1, 2), dtype=np.int64)
+    bits = np.unpackbits(board.astype("<u8").view(np.uint8), axis=2)
+    return bits.sum(axis=(1, 2), dtype=np.int64)
+
+
+def _run_chunk(task):
+    # Стопка затравок в процессе пула. У каждой стопки свой генератор от (seed, номер стопки):
+    # с заданным --seed результат не зависит от числа процессов
+    index, count, args = task
+    rng = np.random.default_rng(None if args.seed is None else (args.seed, index))
+    seeds = random_seeds(count, args.size, args.density, rng)
+    result = run_soups(seeds, args.rule, args.box, args.max_generations)
+    return np.stack((result["population"], result["lifespan"], result["period"]), axis=1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m engine.soups",
+                                     description="Массовый расчёт случайных затравок до стабилизации")
+    parser.add_argument("-n", "--soups", type=int, default=1024)
+    parser.add_argument("-s", "--size", type=int, default=16, help="сторона затравки")
+    parser.add_argument("-d", "--density", type=float, default=0.5)
+    parser.add_argument("-b", "--box", type=int, default=256, help="сторона мира, кратна 64")
+    parser.add_argument("-g", "--max-generations", type=int, default=10000)
+    parser.add_argument("-c", "--chunk", type=int, default=256, help="миров в одной стопке")
+    parser.add_argument("-r", "--rule", default="B3/S23")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="процессов для стопок")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("-o", "--output", default=None, help="CSV: номер, население, время жизни, период")
+    args = parser.parse_args(argv)
+
+    tasks = [(index, min(args.chunk, args.soups - done), args)
+             for index, done in enumerate(range(0, args.soups, args.chunk))]
+    start_time = time.monotonic()
+    try:
+        if args.jobs > 1 and len(tasks) > 1:
+            with multiprocessing.Pool(min(args.jobs, len(tasks))) as pool:
+                results = pool.map(_run_chunk, tasks)
+        else:
+            results = list(map(_run_chunk, tasks))
+    except ValueError as error:
+        parser.error(str(error))
+    elapsed = time.monotonic() - start_time
+    results = np.concatenate(results)
+
+    if args.output is not None:
+        with open(args.output, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(("soup", "population", "lifespan", "period"))
+            writer.writerows([i, *row] for i, row in enumerate(results.tolist()))
+
+    longest = int(results[:, 1].argmax())
+    print(f"{len(results)} затравок за {elapsed:.1f} с ({len(results) / elapsed * 3600:.0f} в час)", file=sys.stderr)
+    print(f"время жизни: среднее {results[:, 1].mean():.0f}, наибольшее {results[longest, 1]} (затравка {longest}); "
+          f"не стабилизировались: {int((results[:, 2] == 0).sum())}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+from .rules import STANDARD_RULE, as_rule, make_table
+from .spatial import SpatialIndex, cell_array, cell_set, rasterize
+
+
+class SparseEngine:
+    offsets = ((-1, -1), (0, -1), (1, -1),
+               (-1, 0), (1, 0),
+               (-1, 1), (0, 1), (1, 1))
+
+    def __init__(self, rule=STANDARD_RULE, active_ratio=0.5):
+        # Шаг считается только вокруг изменившихся клеток, пока их не больше
+        # active_ratio от населения, иначе - полным проходом _get_stat
+        self.active_ratio = active_ratio
+        self.rule = rule
+        self._positions_of_alive_cells = set()
+        # Индекс по корзинам строится при первом запросе области
+        # и дальше обновляется по рождениям и смертям
+        self._index = None
+        # Рождения и смерти последнего поколения, None - мир менялся не шагом
+        self._changes = None
+        # Клетки, изменившиеся после прошлого шага (рождения, смерти и правки).
+        # Остальные клетки в следующем поколении могут измениться, только если рядом
+        # есть изменившаяся. None - пересчитать всё
+        self._dirty = None
+
+    @property
+    def rule(self):
+        return self._rule
+
+    @rule.setter
+    def rule(self, rule):
+        rule = as_rule(rule)
+        self._table = make_table(rule)
+        self._rule = rule
+        self._dirty = None
+
+    def set_positions_of_alive_cells(self, positions: set):
+        # Копия: множество меняется на месте при шаге
+        self._positions_of_alive_cells = set(cell_set(positions))
+        self._index = None
+        self._changes = None
+        self._dirty = None
+
+    def get_positions_of_alive_cells(self):
+        return self._positions_of_alive_cells
+
+    def get_cell_array(self):
+        return cell_array(self._positions_of_alive_cells)
+
+    def get_last_changes(self):
+        return self._changes
+
+    def get_population(self):
+        return len(self._positions_of_alive_cells)
+
+    def get_cells_in_rect(self, x0, y0, x1, y1):
+        if self._index is None:
+            self._index = SpatialIndex(self._positions_of_alive_cells)
+        return self._index.query(x0, y0, x1, y1)
+
+    def get_region(self, x0, y0, x1, y1):
+        return rasterize(self.get_cells_in_rect(x0, y0, x1, y1), x0, y0, x1, y1)
+
+    def toggle_cells(self, cells):
+        self._changes = None
+        for cell_pos in cells:
+            if self._dirty is not None:
+                self._dirty.add(cell_pos)
+            if cell_pos in self._positions_of_alive_cells:
+                self._positions_of_alive_cells.discard(cell_pos)
+                if self._index is not None:
+                    self._index.discard((cell_pos,))
+            else:
+                self._positions_of_alive_cells.add(cell_pos)
+                if self._index is not None:
+                    self._index.add((cell_pos,))
+
+    def clear(self):
+        self._positions_of_alive_cells = set()
+        self._index = None
+        self._changes = None
+        self._dirty = None
+
+    def calculate_next_gen(self):
+        dirty = self._dirty
+        if dirty is not None and len(dirty) <= self.active_ratio * len(self._positions_of_alive_cells):
+            self._calculate_active()
+            return
+
+        # Получает статистику о живых клетках рядом
+        # 0 0 0 0 0 | 1 1 2 1 1
+        # 0 1 0 1 0 | 1 0 2 0 1
+        # 0 0 0 0 0 | 1 1 2 1 1
+        stat = self._get_stat()  # -> dict {pos: count}
+
+        # Таблица переходов вместо проверок вхождения в наборы правила
+        table = self._table
+        alive = self._positions_of_alive_cells
+        new_positions = {pos for pos, count in stat.items() if table[(pos in alive) * 9 + count]}
+
+        births = new_positions - self._positions_of_alive_cells
+        deaths = self._positions_of_alive_cells - new_positions
+        if self._index is not None:
+            self._index.update(births, deaths)
+        self._changes = (births, deaths)
+        self._dirty = births | deaths
+        self._positions_of_alive_cells = new_positions
+
+    def _calculate_active(self):
+        # Пересчитываются только изменившиеся клетки и их соседи,
+        # стабильные области переходят в следующее поколение без затрат
+        table = self._table
+        alive = self._positions_of_alive_cells
+
+        candidates = set()
+        for x, y in self._dirty:
+            candidates.update(((x - 1, y - 1), (x, y - 1), (x + 1, y - 1),
+                               (x - 1, y), (x, y), (x + 1, y),
+                               (x - 1, y + 1), (x, y + 1), (x + 1, y + 1)))
+
+        births = set()
+        deaths = set()
+        for pos in candidates:
+            x, y = pos
+            count = (((x - 1, y - 1) in alive) + ((x, y - 1) in alive) + ((x + 1, y - 1) in alive) +
+                     ((x - 1, y) in alive) + ((x + 1, y) in alive) +
+                     ((x - 1, y + 1) in alive) + ((x, y + 1) in alive) + ((x + 1, y + 1) in alive))
+            if pos in alive:
+                if not table[9 + count]:
+                    deaths.add(pos)
+            elif table[count]:
+                births.add(pos)
+
+        alive -= deaths
+        alive |= births
+        if self._index is not None:
+            self._index.update(births, deaths)
+        self._changes = (births, deaths)
+        self._dirty = births | deaths
+
+    def _get_stat(self):
+        # Живые клетки без соседей тоже попадают в статистику: с S0 они выживают
+        stat = dict.fromkeys(self._positions_of_alive_cells, 0)
+
+        for pos in self._positions_of_alive_cells:
+            for offset in self.offsets:
+                new_pos = (pos[0] + offset[0], pos[1] + offset[1])
+                if new_pos in stat:
+                    stat[new_pos] += 1
+                else:
+                    stat[new_pos] = 1
+
+        return stat
@@ -0,0 +1,100 @@
+import itertools
+
+import numpy as np
+
+
+def cell_array(cells):
+    # Клетки в виде массива (N, 2) int64 из множества кортежей, массива numpy
+    # или engine.cellstore.CellSet
+    if hasattr(cells, "get_cell_array"):
+        return cells.get_cell_array()
+    if isinstance(cells, np.ndarray):
+        return cells.astype(np.int64).reshape(-1, 2)
+    cells = list(cells)
+    flat = np.fromiter(itertools.chain.from_iterable(cells), dtype=np.int64, count=2 * len(cells))
+    return flat.reshape(-1, 2)
+
+
+def cell_set(cells):
+    if isinstance(cells, set):
+        return cells
+    cells = cell_array(cells)
+    return set(zip(cells[:, 0].tolist(), cells[:, 1].tolist()))
+
+
+def pack_cells(cells):
+    # Клетка -> один ключ uint64: старшие 32 бита - x, младшие - y (со сдвигом 2 ** 31).
+    # Порядок ключей - по x, затем по y
+    if hasattr(cells, "get_keys"):
+        return cells.get_keys()
+    cells = cell_array(cells) + 2 ** 31
+    return cells[:, 0].astype(np.uint64) << np.uint64(32) | cells[:, 1].astype(np.uint64)
+
+
+def unpack_cells(keys):
+    xs = (keys >> np.uint64(32)).astype(np.int64) - 2 ** 31
+    ys = (keys & np.uint64(0xFFFFFFFF)).astype(np.int64) - 2 ** 31
+    return np.stack((xs, ys), axis=1)
+
+
+def rasterize(cells, x0, y0, x1, y1):
+    # Битовая карта области [x0, x1) x [y0, y1): region[y - y0, x - x0] = 1 для живых клеток
+    region = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+    cells = cell_array(cells)
+    if len(cells):
+        xs = cells[:, 0] - x0
+        ys = cells[:, 1] - y0
+        inside = (xs >= 0) & (xs < x1 - x0) & (ys >= 0) & (ys < y1 - y0)
+        region[ys[inside], xs[inside]] = 1
+    return region
+
+
+class SpatialIndex:
+    # Клетки, разложенные по квадратным корзинам chunk_size x chunk_size:
+    # {(cx, cy): множество клеток}
+    def __init__(self, positions=(), chunk_size=32):
+        self.chunk_size = chunk_size
+        self._chunks = {}
+        self.add(positions)
+
+    def add(self, cells):
+        size = self.chunk_size
+        chunks = self._chunks
+        for cell in cells:
+            key = (cell[0] // size, cell[1] // size)
+            chunk = chunks.get(key)
+            if chunk is None:
+                chunks[key] = {cell}
+            else:
+                chunk.add(cell)
+
+    def discard(self, cells):
+        size = self.chunk_size
+        chunks = self._chunks
+        for cell in cells:
+            key = (cell[0] // size, cell[1] // size)
+            chunk = chunks.get(key)
+            if chunk is not None:
+                chunk.discard(cell)
+                if not chunk:
+                    del chunks[key]
+
+    def update(self, births, deaths):
+        self.discard(deaths)
+        self.add(births)
+
+    def query(self, x0, y0, x1, y1):
+        # Клетки из корзин, пересекающих прямоугольник [x0, x1) x [y0, y1);
+        # клетки на краях корзин могут лежать вне прямоугольника
+        size = self.chunk_size
+        chunks = self._chunks
+        cx0, cy0 = x0 // size, y0 // size
+        cx1, cy1 = (x1 - 1) // size, (y1 - 1) // size
+
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(chunks):
+            keys = [key for key in chunks if cx0 <= key[0] <= cx1 and cy0 <= key[1] <= cy1]
+        else:
+            keys = [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1) if (cx, cy) in chunks]
+
+        for key in keys:
+            yield from chunks[key]
@@ -0,0 +1,197 @@
+import numpy as np
+
+from .rules import STANDARD_RULE, as_rule, make_table
+from .spatial import cell_array
+
+
+class TileEngine:
+    # Мир хранится как разреженный словарь {(tx, ty): массив tile_size x tile_size}
+    # Массив тайла индексируется как tile[y, x]
+    neighbour_offsets = ((-1, -1), (0, -1), (1, -1),
+                         (-1, 0), (0, 0), (1, 0),
+                         (-1, 1), (0, 1), (1, 1))
+
+    def __init__(self, rule=STANDARD_RULE, tile_size=64):
+        self.tile_size = tile_size
+        self._tiles = {}
+        # Тайлы, изменившиеся в прошлом поколении. Тайл, у которого не изменился
+        # ни он сам, ни соседи, в следующем поколении останется прежним
+        self._active = set()
+        self.rule = rule
+
+    @property
+    def rule(self):
+        return self._rule
+
+    @rule.setter
+    def rule(self, rule):
+        rule = as_rule(rule)
+        self._table = np.array(make_table(rule), dtype=np.uint8)
+        self._rule = rule
+        self._active = set(self._tiles)
+
+    def set_positions_of_alive_cells(self, positions):
+        self._tiles = {}
+        cells = cell_array(positions)
+        if len(cells):
+            self._add_cells(cells)
+        self._active = set(self._tiles)
+
+    def get_positions_of_alive_cells(self):
+        positions = set()
+        for (tx, ty), tile in self._tiles.items():
+            ys, xs = np.nonzero(tile)
+            xs = xs + tx * self.tile_size
+            ys = ys + ty * self.tile_size
+            positions.update(zip(xs.tolist(), ys.tolist()))
+        return positions
+
+    def get_cell_array(self):
+        size = self.tile_size
+        arrays = [np.zeros((0, 2), dtype=np.int64)]
+        for (tx, ty), tile in self._tiles.items():
+            ys, xs = np.nonzero(tile)
+            arrays.append(np.stack((xs + tx * size, ys + ty * size), axis=1).astype(np.int64))
+        return np.concatenate(arrays)
+
+    def get_cells_in_rect(self, x0, y0, x1, y1):
+        size = self.tile_size
+        positions = []
+        for tx, ty in self._keys_in_rect(x0, y0, x1, y1):
+            ys, xs = np.nonzero(self._tiles[(tx, ty)])
+            xs = xs + tx * size
+            ys = ys + ty * size
+            positions.extend(zip(xs.tolist(), ys.tolist()))
+        return positions
+
+    def get_region(self, x0, y0, x1, y1):
+        size = self.tile_size
+        region = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        for tx, ty in self._keys_in_rect(x0, y0, x1, y1):
+            left = max(x0, tx * size)
+            top = max(y0, ty * size)
+            right = min(x1, (tx + 1) * size)
+            bottom = min(y1, (ty + 1) * size)
+            tile = self._tiles[(tx, ty)]
+            region[top - y0:bottom - y0, left - x0:right - x0] = tile[top - ty * size:bottom - ty * size,
+                                                                      left - tx * size:right - tx * size]
+        return region
+
+    def get_population(self):
+        return int(sum(np.count_nonzero(tile) for tile in self._tiles.values()))
+
+    def toggle_cells(self, cells):
+        size = self.tile_size
+        for x, y in cells:
+            key = (x // size, y // size)
+            tile = self._tiles.get(key)
+            if tile is None:
+                tile = self._tiles[key] = np.zeros((size, size), dtype=np.uint8)
+            tile[y % size, x % size] ^= 1
+            if not tile.any():
+                del self._tiles[key]
+            self._active.add(key)
+
+    def clear(self):
+        self._tiles = {}
+        self._active = set()
+
+    def calculate_next_gen(self):
+        size = self.tile_size
+
+        # Пересчитываются только изменившиеся тайлы и их соседи,
+        # пустые соседи создаются, если в них может кто-то родиться
+        keys = set()
+        for tx, ty in self._active:
+            for dx, dy in self.neighbour_offsets:
+                keys.add((tx + dx, ty + dy))
+        keys = list(keys)
+
+        if not keys:
+            return
+
+        padded = np.zeros((len(keys), size + 2, size + 2), dtype=np.uint8)
+        for i, key in enumerate(keys):
+            self._fill_halo(padded[i], key)
+
+        counts = (padded[:, :-2, :-2] + padded[:, :-2, 1:-1] + padded[:, :-2, 2:] +
+                  padded[:, 1:-1, :-2] + padded[:, 1:-1, 2:] +
+                  padded[:, 2:, :-2] + padded[:, 2:, 1:-1] + padded[:, 2:, 2:])
+        alive = padded[:, 1:-1, 1:-1]
+        new = self._table[alive * 9 + counts]
+
+        changed = np.any(new != alive, axis=(1, 2))
+        not_empty = np.any(new, axis=(1, 2))
+
+        active = set()
+        for i, key in enumerate(keys):
+            if not changed[i]:
+                continue
+            active.add(key)
+            if not_empty[i]:
+                self._tiles[key] = new[i].copy()
+            else:
+                self._tiles.pop(key, None)
+
+        self._active = active
+
+    def _keys_in_rect(self, x0, y0, x1, y1):
+        size = self.tile_size
+        tx0, ty0 = x0 // size, y0 // size
+        tx1, ty1 = (x1 - 1) // size, (y1 - 1) // size
+
+        if (tx1 - tx0 + 1) * (ty1 - ty0 + 1) > len(self._tiles):
+            return [key for key in self._tiles if tx0 <= key[0] <= tx1 and ty0 <= key[1] <= ty1]
+        return [(tx, ty) for tx in range(tx0, tx1 + 1) for ty in range(ty0, ty1 + 1) if (tx, ty) in self._tiles]
+
+    def _fill_halo(self, target, key):
+        # target - массив (size + 2) x (size + 2): тайл в центре и по одной
+        # строке/столбцу от каждого соседа по краям
+        tx, ty = key
+        tiles = self._tiles
+
+        tile = tiles.get(key)
+        if tile is not None:
+            target[1:-1, 1:-1] = tile
+
+        tile = tiles.get((tx, ty - 1))
+        if tile is not None:
+            target[0, 1:-1] = tile[-1]
+        tile = tiles.get((tx, ty + 1))
+        if tile is not None:
+            target[-1, 1:-1] = tile[0]
+        tile = tiles.get((tx - 1, ty))
+        if tile is not None:
+            target[1:-1, 0] = tile[:, -1]
+        tile = tiles.get((tx + 1, ty))
+        if tile is not None:
+            target[1:-1, -1] = tile[:, 0]
+
+        tile = tiles.get((tx - 1, ty - 1))
+        if tile is not None:
+            target[0, 0] = tile[-1, -1]
+        tile = tiles.get((tx + 1, ty - 1))
+        if tile is not None:
+            target[0, -1] = tile[-1, 0]
+        tile = tiles.get((tx - 1, ty + 1))
+        if tile is not None:
+            target[-1, 0] = tile[0, -1]
+        tile = tiles.get((tx + 1, ty + 1))
+        if tile is not None:
+            target[-1, -1] = tile[0, 0]
+
+    def _add_cells(self, cells):
+        size = self.tile_size
+        tile_keys = cells // size
+        local = cells % size
+
+        order = np.lexsort((tile_keys[:, 1], tile_keys[:, 0]))
+        tile_keys = tile_keys[order]
+        local = local[order]
+
+        unique_keys, starts = np.unique(tile_keys, axis=0, return_index=True)
+        ends = list(starts[1:]) + [len(tile_keys)]
+        for key, start, end in zip(unique_keys.tolist(), starts, ends):
+            tile = np.zeros((size, size), dtype=np.uint8)
+            tile[local[start:end, 1], local[start:end, 0]] = 1
+            self._tiles[tuple(key)] = tile
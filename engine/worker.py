@@ -0,0 +1,124 @@
+import collections
+import threading
+import time
+
+# Готовый кадр: номер публикации, поколение, область (аргументы render) и её битовая карта
+Frame = collections.namedtuple("Frame", ("number", "generation", "rect", "region"))
+
+
+class SimulationWorker:
+    # Считает поколения в фоновом потоке и публикует последний готовый кадр.
+    # step() продвигает мир и возвращает число пройденных поколений,
+    # render(x0, y0, x1, y1) строит битовую карту области. Оба вызываются под lock,
+    # которым же должен пользоваться интерфейс при прямом доступе к движку
+    def __init__(self, step, render, interval=0.05, batch_time=0.05):
+        self.lock = threading.Lock()
+        self.interval = interval
+        # Поколения, срок которых наступил, считаются подряд и попадают в один кадр,
+        # но не дольше batch_time секунд между кадрами
+        self.batch_time = batch_time
+        self.generation = 0
+
+        self._step = step
+        self._render = render
+        self._running = False
+        self._stopped = False
+        self._commands = collections.deque()
+        self._wake = threading.Event()
+
+        self._viewport = None
+        self._frame = None
+        self._frame_number = 0
+        # Новый кадр строится, только если интерфейс забрал предыдущий:
+        # промежуточные поколения, которые никто не увидит, не растеризуются
+        self._taken_number = 0
+        # Мир изменён не шагом симуляции, кадр нужен в любом случае
+        self._dirty = True
+
+        self._thread = threading.Thread(target=self._run, name="SimulationWorker", daemon=True)
+        self._thread.start()
+
+    def set_running(self, running: bool):
+        self._running = running
+        self._wake.set()
+
+    def is_running(self):
+        return self._running
+
+    def set_interval(self, interval: float):
+        self.interval = interval
+        self._wake.set()
+
+    def set_viewport(self, rect: tuple):
+        self._viewport = rect
+
+    def submit(self, command):
+        # command() выполняется в потоке воркера перед следующим шагом
+        self._commands.append(command)
+        self._dirty = True
+        self._wake.set()
+
+    def invalidate(self):
+        # Мир изменён напрямую под lock - нужен новый кадр
+        self._dirty = True
+        self._wake.set()
+
+    def get_frame_number(self):
+        return self._frame_number
+
+    def get_frame(self):
+        frame = self._frame
+        if frame is not None:
+            self._taken_number = frame.number
+            if frame.generation != self.generation:
+                self._wake.set()
+        return frame
+
+    def publish(self, rect):
+        # Строит кадр в вызывающем потоке; lock должен быть захвачен
+        self._frame_number += 1
+        self._frame = Frame(self._frame_number, self.generation, rect, self._render(*rect))
+        self._dirty = False
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self):
+        next_time = time.monotonic()
+
+        while not self._stopped:
+            if self._running:
+                timeout = max(0.0, next_time - time.monotonic())
+            else:
+                timeout = None
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+            with self.lock:
+                while self._commands:
+                    self._commands.popleft()()
+
+            now = time.monotonic()
+            if self._running and now >= next_time:
+                # Скорость симуляции не привязана к отрисовке: если интервал короче
+                # шага вместе с кадром, за кадр проходит несколько поколений.
+                # lock отпускается между поколениями, чтобы интерфейс не ждал весь пакет
+                while self._running and next_time <= now:
+                    with self.lock:
+                        self.generation += self._step()
+                    next_time += self.interval
+                    if time.monotonic() - now >= self.batch_time:
+                        break
+                # Отставшая симуляция не догоняет пропущенные интервалы
+                next_time = max(next_time, now)
+            elif not self._running:
+                next_time = now
+
+            with self.lock:
+                frame = self._frame
+                if self._viewport is not None and (self._dirty or frame is None or
+                                                   (frame.generation != self.generation and
+                                                    self._taken_number == frame.number)):
+                    self.publish(self._viewport)
@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from engine import patterns
+from engine.census import SYMMETRIES, census, label_components, pattern_code
+from engine.cellstore import as_keys
+from engine.spatial import unpack_cells
+
+
+def components(cells, spacing=1):
+    # -> множество компонент, каждая - frozenset клеток
+    keys, labels = label_components(cells, spacing)
+    groups = {}
+    for cell, label in zip(unpack_cells(keys).tolist(), labels.tolist()):
+        groups.setdefault(label, set()).add(tuple(cell))
+    assert sorted(groups) == list(range(len(groups)))
+    return {frozenset(group) for group in groups.values()}
+
+
+def reference_components(cells, spacing=1):
+    cells = set(cells)
+    result = set()
+    while cells:
+        stack = [cells.pop()]
+        group = set(stack)
+        while stack:
+            x, y = stack.pop()
+            for dx in range(-spacing, spacing + 1):
+                for dy in range(-spacing, spacing + 1):
+                    if (x + dx, y + dy) in cells:
+                        cells.remove((x + dx, y + dy))
+                        group.add((x + dx, y + dy))
+                        stack.append((x + dx, y + dy))
+        result.add(frozenset(group))
+    return result
+
+
+def transformed(cells, symmetry, dx=0, dy=0):
+    swap, sx, sy = symmetry
+    result = set()
+    for x, y in cells:
+        x, y = x * sx, y * sy
+        if swap:
+            x, y = y, x
+        result.add((x + dx, y + dy))
+    return result
+
+
+def test_label_components_simple():
+    assert components(set()) == set()
+    # Диагональ - одна компонента при восьмисвязности
+    diagonal = {(i, i) for i in range(5)}
+    assert components(diagonal) == {frozenset(diagonal)}
+    # Блоки через клетку разделены при spacing 1 и слиты при spacing 2
+    blocks = set(patterns.BLOCK) | {(x + 3, y) for x, y in patterns.BLOCK}
+    assert len(components(blocks)) == 2
+    assert components(blocks, spacing=2) == {frozenset(blocks)}
+    # Клетки по обе стороны нуля и у границ 32-битных координат
+    far = {(-1, -1), (0, 0), (2 ** 31 - 1, 5), (2 ** 31 - 2, 6), (-2 ** 31, -2 ** 31)}
+    assert components(far) == {frozenset({(-1, -1), (0, 0)}), frozenset({(2 ** 31 - 1, 5), (2 ** 31 - 2, 6)}),
+                               frozenset({(-2 ** 31, -2 ** 31)})}
+
+
+@pytest.mark.parametrize("spacing", [1, 2, 3])
+@pytest.mark.parametrize("seed", range(4))
+def test_label_components_matches_flood_fill(seed, spacing):
+    random.seed(seed)
+    cells = {(random.randint(-40, 40), random.randint(-40, 40)) for _ in range(500)}
+    # Длинная змейка: union-find должен сжать пути через много шагов
+    cells |= {(x, 100 + (x // 10) % 2) for x in range(300)}
+    assert components(cells, spacing) == reference_components(cells, spacing)
+
+
+@pytest.mark.parametrize("name, cells, period", patterns.CENSUS_OBJECTS)
+def test_codes_ignore_position_and_symmetry(name, cells, period):
+    code = pattern_code(set(cells))
+    for symmetry in SYMMETRIES:
+        assert pattern_code(transformed(cells, symmetry, 1000, -77)) == code
+
+
+def test_codes_tell_objects_apart():
+    codes = {pattern_code(set(cells)) for _, cells, _ in patterns.CENSUS_OBJECTS}
+    assert len(codes) == len(patterns.CENSUS_OBJECTS)
+    # Зеркальные фигуры без собственной симметрии - один объект, разные фигуры - разные
+    assert pattern_code({(0, 0), (1, 0), (2, 0), (0, 1)}) == pattern_code({(0, 0), (1, 0), (2, 0), (2, 1)})
+    assert pattern_code({(0, 0), (1, 0), (2, 0), (0, 1)}) != pattern_code({(0, 0), (1, 0), (2, 0), (1, 1)})
+
+
+def test_census_counts_objects():
+    cells = set()
+    for i in range(5):
+        cells |= transformed(patterns.BLOCK, SYMMETRIES[i % 8], 10 * i, 0)
+    for i in range(3):
+        cells |= transformed(patterns.GLIDER, SYMMETRIES[i + 3], 10 * i, 50)
+    cells |= {(500, 500), (501, 500), (500, 501)}
+    objects = {item["name"]: item for item in census(cells)}
+    assert objects["блок"]["count"] == 5
+    assert objects["глайдер"]["count"] == 3 and objects["глайдер"]["population"] == 5
+    assert objects[None]["population"] == 3 and objects[None]["count"] == 1
+
+
+def test_census_keys_are_sorted():
+    # label_components ищет соседей бинарным поиском: ключи должны прийти отсортированными
+    keys = as_keys({(3, -1), (-5, 2), (0, 0)})
+    assert (keys[1:] > keys[:-1]).all()
@@ -0,0 +1,45 @@
+import collections
+import random
+
+import pytest
+
+from engine.batch import ENGINES
+from engine.rules import parse_rule
+
+RULES = ("B3/S23", "B36/S23", "B3/S012345678", "B2/S0", "B1/S1")
+OFFSETS = tuple((dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy)
+
+
+def reference_step(cells, rule):
+    counts = collections.Counter((x + dx, y + dy) for x, y in cells for dx, dy in OFFSETS)
+    born, survive = rule.birth, rule.survive
+    return ({pos for pos, count in counts.items() if pos not in cells and count in born} |
+            {pos for pos in cells if counts[pos] in survive})
+
+
+def soup(seed):
+    # Плотный суп и одинокие клетки вдали от него: у них нет ни одного соседа
+    random.seed(seed)
+    cells = {(x, y) for x in range(24) for y in range(24) if random.random() < 0.4}
+    return cells | {(100, 100), (-50, 70), (60, -90)}
+
+
+@pytest.mark.parametrize("rule", RULES)
+@pytest.mark.parametrize("name", sorted(ENGINES))
+def test_engine_matches_reference(name, rule):
+    rule = parse_rule(rule)
+    try:
+        engine = ENGINES[name](rule=rule)
+    except ValueError:
+        pytest.skip(f"{name} не поддерживает {rule}")
+
+    cells = soup(1)
+    engine.set_positions_of_alive_cells(cells)
+    try:
+        for generation in range(1, 21):
+            engine.calculate_next_gen()
+            cells = reference_step(cells, rule)
+            assert set(map(tuple, engine.get_cell_array().tolist())) == cells, f"поколение {generation}"
+    finally:
+        if hasattr(engine, "close"):
+            engine.close()
@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from engine import HashLifeEngine, SparseEngine, TileEngine
+
+
+def soup(seed, size=32, density=0.4):
+    random.seed(seed)
+    return {(x, y) for x in range(size) for y in range(size) if random.random() < density}
+
+
+def cells_of(engine):
+    return set(map(tuple, engine.get_positions_of_alive_cells()))
+
+
+@pytest.mark.parametrize("power", [1, 2, 3, 5, 7])
+def test_advance_matches_single_steps(power):
+    cells = soup(power)
+    reference = SparseEngine()
+    reference.set_positions_of_alive_cells(set(cells))
+    for _ in range(2 ** power):
+        reference.calculate_next_gen()
+
+    engine = HashLifeEngine()
+    engine.set_positions_of_alive_cells(set(cells))
+    engine.advance(power)
+    assert cells_of(engine) == cells_of(reference)
+    assert engine.generation == 2 ** power
+
+
+def test_engines_agree():
+    cells = soup(0)
+    engines = [SparseEngine(), TileEngine(tile_size=16), HashLifeEngine()]
+    for engine in engines:
+        engine.set_positions_of_alive_cells(set(cells))
+    for generation in range(1, 41):
+        for engine in engines:
+            engine.calculate_next_gen()
+        reference = cells_of(engines[0])
+        for engine in engines[1:]:
+            assert cells_of(engine) == reference, f"{type(engine).__name__}, поколение {generation}"
@@ -0,0 +1,126 @@
+import random
+
+import pytest
+
+from engine.history import History
+from engine.simulation import Simulation
+from engine.sparse import SparseEngine
+from engine.tiles import TileEngine
+
+from .test_simulation import run
+
+
+def soup(seed):
+    random.seed(seed)
+    return {(x, y) for x in range(16) for y in range(16) if random.random() < 0.4}
+
+
+def states(steps, seed=0):
+    engine = SparseEngine()
+    engine.set_positions_of_alive_cells(soup(seed))
+    result = [engine.get_positions_of_alive_cells().copy()]
+    changes = [None]
+    for _ in range(steps):
+        engine.calculate_next_gen()
+        result.append(engine.get_positions_of_alive_cells().copy())
+        changes.append(engine.get_last_changes())
+    return result, changes
+
+
+def as_set(cells):
+    return {tuple(cell) for cell in cells.tolist()}
+
+
+@pytest.mark.parametrize("by_changes", [False, True])
+def test_seek_returns_recorded_states(by_changes):
+    cells, changes = states(50)
+    history = History(keyframe_interval=8)
+    for generation, state in enumerate(cells):
+        if not by_changes or not history.record_changes(generation, *changes[generation] or ((), ())):
+            history.record(generation, state)
+
+    assert history.get_range() == (0, 50)
+    for generation in (0, 1, 7, 8, 9, 31, 50):
+        found, state = history.seek(generation)
+        assert found == generation and as_set(state) == cells[generation]
+    # Между записями - последняя не позже
+    assert history.seek(-1) is None
+    assert history.seek(1000)[0] == 50
+
+
+def test_changes_need_a_full_record_first():
+    cells, changes = states(3)
+    history = History()
+    assert not history.record_changes(1, *changes[1])
+    history.record(0, cells[0])
+    history.mark_edited()
+    assert not history.record_changes(1, *changes[1])
+    history.record(1, cells[1])
+    assert history.record_changes(2, *changes[2])
+    # Пропуск поколения дельтой не описывается
+    assert not history.record_changes(4, *changes[3])
+
+
+def test_truncate_drops_future():
+    cells, changes = states(30)
+    history = History(keyframe_interval=8)
+    history.record(0, cells[0])
+    for generation in range(1, 31):
+        assert history.record_changes(generation, *changes[generation]) or generation % 8 == 0
+        if generation % 8 == 0:
+            history.record(generation, cells[generation])
+    size = history.get_size()
+
+    history.truncate(12)
+    assert history.get_range() == (0, 12)
+    assert history.get_size() < size
+    assert as_set(history.seek(20)[1]) == cells[12]
+
+    # После обрезки дальше пишется полным сравнением от восстановленного состояния
+    assert not history.record_changes(13, *changes[13])
+    history.record(13, cells[13])
+    assert history.record_changes(14, *changes[14])
+    assert as_set(history.seek(14)[1]) == cells[14]
+
+    history.truncate(-1)
+    assert history.get_range() is None and history.get_size() == 0
+
+
+def test_record_into_past_truncates():
+    cells, _ = states(10)
+    history = History()
+    for generation in range(10):
+        history.record(generation, cells[generation])
+    history.record(4, cells[0])
+    assert history.get_range() == (0, 4)
+    assert as_set(history.seek(4)[1]) == cells[0]
+    assert as_set(history.seek(3)[1]) == cells[3]
+
+
+@pytest.mark.parametrize("engine", [SparseEngine, TileEngine])
+def test_simulation_history_survives_edits(engine):
+    cells, _ = states(10)
+    simulation = Simulation(engine())
+    simulation.set_positions_of_alive_cells(cells[0])
+    simulation.set_history_enabled(True)
+    run(simulation, 10)
+    # Правка между шагами должна попасть в историю, хотя движок отдаёт только дельту шага
+    simulation._toggle_cells([(100, 100), (101, 100), (102, 100)])
+    reference = SparseEngine()
+    reference.set_positions_of_alive_cells(simulation.get_positions_of_alive_cells())
+    run(simulation, 6)
+    expected = []
+    for _ in range(6):
+        reference.calculate_next_gen()
+        expected.append(set(reference.get_positions_of_alive_cells()))
+
+    for generation in (13, 16):
+        simulation.seek(generation)
+        assert set(simulation.get_positions_of_alive_cells()) == expected[generation - 11]
+
+    simulation.seek(5)
+    assert set(simulation.get_positions_of_alive_cells()) == cells[5]
+    run(simulation, 5)
+    assert set(simulation.get_positions_of_alive_cells()) == cells[10]
+    # Запись после перемотки заменила старое будущее
+    assert simulation.get_history_range() == (0, 10)
@@ -0,0 +1,50 @@
+import cProfile
+import os
+import time
+
+from engine import profiling
+from engine.profiling import Profiler
+from engine.simulation import Simulation
+from engine.sparse import SparseEngine
+
+
+def test_kind_is_published_last(monkeypatch, tmp_path):
+    # Вызов в другом потоке, увидевший вид снимка, должен застать готовый профиль
+    profiler = Profiler(directory=str(tmp_path))
+    seen = []
+    profile_class = cProfile.Profile
+
+    def make_profile():
+        seen.append((profiler.get_kind(), profiler.get_left()))
+        return profile_class()
+    monkeypatch.setattr(profiling.cProfile, "Profile", make_profile)
+    assert profiler.start("generations", window=5)
+    assert seen == [(None, 5)]
+    assert not profiler.start("frames")
+
+
+def test_capture_while_stepping(tmp_path):
+    profiler = Profiler(directory=str(tmp_path))
+    simulation = Simulation(SparseEngine(), profiler=profiler)
+    simulation.set_positions_of_alive_cells({(x, y) for x in range(30) for y in range(30) if (x * y) % 3})
+    simulation.set_interval(0)
+    simulation.set_running(True)
+    try:
+        paths = set()
+        for _ in range(5):
+            while not profiler.start("generations", window=3):
+                time.sleep(0.001)
+            deadline = time.monotonic() + 10
+            while profiler.get_kind() is not None and time.monotonic() < deadline:
+                time.sleep(0.001)
+            assert profiler.get_kind() is None
+            paths.add(profiler.last_path)
+        assert simulation._worker._thread.is_alive()
+    finally:
+        simulation.set_running(False)
+        simulation._worker.stop()
+
+    for path in paths:
+        assert os.path.exists(path + ".prof")
+        with open(path + ".txt", encoding="utf-8") as file:
+            assert file.readline().startswith("generations: 3 вызовов")
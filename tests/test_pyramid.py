@@ -0,0 +1,78 @@
+import random
+
+import numpy as np
+import pytest
+
+from engine.hashlife import HashLifeEngine
+from engine.pyramid import DensityPyramid, morton_cells, morton_keys
+from engine.simulation import Simulation
+from engine.sparse import SparseEngine
+
+RECTS = ((-5, -5, 5, 5), (-40, -40, 40, 40), (0, 0, 3, 2), (-12, -9, -3, -1), (2, -7, 9, 1))
+
+
+def soup(seed, count=2000, span=300):
+    random.seed(seed)
+    return {(random.randint(-span, span), random.randint(-span, span)) for _ in range(count)}
+
+
+def reference(cells, level, x0, y0, x1, y1):
+    region = np.zeros((y1 - y0, x1 - x0), dtype=np.int64)
+    for x, y in cells:
+        bx, by = x >> level, y >> level
+        if x0 <= bx < x1 and y0 <= by < y1:
+            region[by - y0, bx - x0] += 1
+    return region
+
+
+def test_morton_round_trip():
+    blocks = np.array([[0, 0], [-1, 5], [2 ** 31 - 1, -2 ** 31], [123456, -98765]])
+    for level in (0, 1, 7):
+        assert (morton_cells(morton_keys(blocks >> level, level), level) == blocks >> level).all()
+    # Ключ блока уровня k + 1 - ключ подблока, сдвинутый на два бита
+    assert morton_keys(np.array([[5, -3]]), 0) >> np.uint64(2) == morton_keys(np.array([[2, -2]]), 1)
+
+
+def test_rebuild_and_update_match_reference():
+    cells = soup(0)
+    built = DensityPyramid(levels=6)
+    built.rebuild(cells)
+
+    first, rest = set(list(cells)[:500]), set(list(cells)[500:])
+    updated = DensityPyramid(levels=6)
+    updated.rebuild(first | {(1000, 1000)})
+    updated.update(rest, {(1000, 1000)})
+
+    for level in range(1, 7):
+        for rect in RECTS:
+            expected = reference(cells, level, *rect)
+            assert (built.get_region(level, *rect) == expected).all()
+            assert (updated.get_region(level, *rect) == expected).all()
+
+
+@pytest.mark.parametrize("steps", [0, 1, 7])
+def test_hashlife_density_matches_pyramid(steps):
+    engine = HashLifeEngine()
+    engine.set_positions_of_alive_cells(soup(1, count=1500, span=60))
+    for _ in range(steps):
+        engine.advance(2)
+    engine.toggle_cells([(-301, 7), (250, -3)])
+    cells = engine.get_positions_of_alive_cells()
+
+    for level in range(1, 8):
+        for rect in RECTS:
+            assert (engine.get_density(level, *rect) == reference(cells, level, *rect)).all()
+
+
+def test_hashlife_zoomed_out_render_skips_cells():
+    simulation = Simulation(HashLifeEngine())
+    simulation.set_positions_of_alive_cells(soup(2))
+    expected = Simulation(SparseEngine())
+    expected.set_positions_of_alive_cells(soup(2))
+
+    def get_cell_array():
+        raise AssertionError("кадр отдалённого вида перебирает клетки")
+    simulation.get_engine().get_cell_array = get_cell_array
+    for level in (1, 4):
+        assert (simulation.render((-40, -40, 40, 40, level))[1] ==
+                expected.render((-40, -40, 40, 40, level))[1]).all()
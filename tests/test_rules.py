@@ -0,0 +1,75 @@
+import pytest
+
+from engine.batch import RULES
+from engine.rules import Rule, as_rule, format_rule, get_max_count, make_table, parse_rule
+
+
+@pytest.mark.parametrize("string, rule", [
+    ("B3/S23", Rule((2, 3), (3,))),
+    ("B36/S23", Rule((2, 3), (3, 6))),
+    ("B34/S34", Rule((3, 4), (3, 4))),
+    ("B1/S", Rule((), (1,))),
+    ("B2/S/C3", Rule((), (2,), 3)),
+    ("B35678/S5678/C5", Rule((5, 6, 7, 8), (3, 5, 6, 7, 8), 5)),
+    ("R5,C0,M1,S34..58,B34..45,NM", Rule(tuple(range(34, 59)), tuple(range(34, 46)), 2, 5, True)),
+    ("R2,C4,M0,S3,5..7,B2,9..10,NM", Rule((3, 5, 6, 7), (2, 9, 10), 4, 2, False)),
+])
+def test_round_trip(string, rule):
+    assert parse_rule(string) == rule
+    assert format_rule(rule) == string
+    assert parse_rule(format_rule(rule)) == rule
+
+
+@pytest.mark.parametrize("string, rule", [
+    ("b36/s23", Rule((2, 3), (3, 6))),
+    (" B3 / S23 ", Rule((2, 3), (3,))),
+    ("S23/B36", Rule((2, 3), (3, 6))),
+    ("23/36", Rule((2, 3), (3, 6))),
+    ("23/3/8", Rule((2, 3), (3,), 8)),
+    ("B2/S/3", Rule((), (2,), 3)),
+    ("B33/S32", Rule((2, 3), (3,))),
+    ("R5,C0,M1,S34-58,B34-45,NM", Rule(tuple(range(34, 59)), tuple(range(34, 46)), 2, 5, True)),
+    ("R1,B3,S2,3", Rule((2, 3), (3,))),
+])
+def test_other_notations(string, rule):
+    assert parse_rule(string) == rule
+
+
+@pytest.mark.parametrize("string", [
+    "", "B3", "S23", "B3/S23/", "B3/S23/C", "B3/S2a", "B3S23", "X3/Y23", "B3/S9", "B9/S23",
+    "B3/S23/C256",
+    # B0 оживило бы всё бесконечное пространство
+    "B0/S23", "B03/S23", "R2,C0,M0,S1,B0..3,NM",
+    "R0,C0,M0,S1,B1,NM", "R2,C0,M0,S1,B25,NM", "R1,C0,M1,S1,B10,NM", "R2,C0,M0,S1,B3,NV",
+    "R,C0,M0,S1,B1,NM", "RX,S1,B1", "R2,C0,S1..,B1", "R2,,S1,B1", "C0,M0,S1,B1,NM",
+])
+def test_rejects_malformed(string):
+    with pytest.raises(ValueError):
+        parse_rule(string)
+
+
+def test_neighbourhood_size():
+    assert get_max_count("B3/S23") == 8
+    assert get_max_count("R5,C0,M1,S34..58,B34..45,NM") == 121
+    assert get_max_count("R5,C0,M0,S34..58,B34..45,NM") == 120
+
+
+def test_as_rule_accepts_old_tuples():
+    # Старые сохранения и меню передавали (выживание, рождение) списками
+    assert as_rule([(2, 3), (3, 6)]) == Rule((2, 3), (3, 6))
+    assert as_rule(Rule((2, 3), (3,))) is not None
+
+
+def test_high_life():
+    # High Life - рождение при 3 и 6 соседях, выживание только при 2 и 3 (без S6)
+    rule = parse_rule(RULES["highlife"])
+    assert rule == Rule((2, 3), (3, 6))
+    table = make_table(rule)
+    assert [count for count in range(9) if table[count]] == [3, 6]
+    assert [count for count in range(9) if table[9 + count]] == [2, 3]
+
+
+def test_make_table_rejects_other_families():
+    for string in ("B2/S/C3", "R5,C0,M1,S34..58,B34..45,NM"):
+        with pytest.raises(ValueError):
+            make_table(string)
@@ -0,0 +1,111 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from engine import saves
+
+
+def soup(seed, size=64, density=0.4):
+    random.seed(seed)
+    return {(x, y) for x in range(size) for y in range(size) if random.random() < density}
+
+
+def as_set(cells):
+    return {tuple(cell) for cell in saves.cell_array(cells).tolist()}
+
+
+def normalized(cells):
+    # RLE хранит только форму: сравнение с точностью до сдвига
+    cells = as_set(cells)
+    if not cells:
+        return cells
+    min_x = min(x for x, y in cells)
+    min_y = min(y for x, y in cells)
+    return {(x - min_x, y - min_y) for x, y in cells}
+
+
+PATTERNS = {
+    "empty": set(),
+    "single": {(5, -7)},
+    "soup": soup(0),
+    "negative": {(x - 1000, y - 2000) for x, y in soup(1, 20)},
+    "far": {(-2 ** 40, 3), (0, 0), (2 ** 40, -2 ** 35), (7, 2 ** 33)},
+    "row": {(x, 0) for x in range(300)},
+}
+
+
+@pytest.mark.parametrize("name", sorted(PATTERNS))
+@pytest.mark.parametrize("extension", (".gol", ".lif", ".txt"))
+def test_round_trip(tmp_path, name, extension):
+    path = str(tmp_path / f"save{extension}")
+    saves.write_positions(path, PATTERNS[name])
+    assert as_set(saves.read_positions(path)) == PATTERNS[name]
+
+
+@pytest.mark.parametrize("name", ("single", "soup", "negative", "row"))
+def test_rle_round_trip(tmp_path, name):
+    path = str(tmp_path / "save.rle")
+    saves.write_positions(path, PATTERNS[name], rule=None)
+    assert normalized(saves.read_positions(path)) == normalized(PATTERNS[name])
+
+
+def test_rle_keeps_rule(tmp_path):
+    from engine.rules import parse_rule
+    path = str(tmp_path / "save.rle")
+    saves.write_positions(path, {(0, 0), (1, 0), (2, 0)}, rule=parse_rule("B36/S23"))
+    with open(path) as file:
+        assert "rule = B36/S23" in file.readline()
+
+
+@pytest.mark.parametrize("name", sorted(PATTERNS))
+def test_binary_encodings_decode(tmp_path, name):
+    cells = saves.cell_array(PATTERNS[name])
+    if not len(cells):
+        return
+    origin = cells.min(axis=0)
+    order = np.lexsort((cells[:, 0], cells[:, 1]))
+    rows = saves._encode_rows(cells[order] - origin)
+    values = saves._decode_varints(saves._encode_varints(rows.reshape(-1)), 2 * len(cells))
+    assert (saves._decode_rows(values.reshape(-1, 2)) + origin == cells[order]).all()
+
+
+def test_varints_boundaries():
+    values = np.array([0, 1, 127, 128, 16383, 16384, 2 ** 32, 2 ** 63 - 1], dtype=np.uint64)
+    data = saves._encode_varints(values)
+    assert len(data) == 1 + 1 + 1 + 2 + 2 + 3 + 5 + 9
+    assert (saves._decode_varints(data, len(values)) == values).all()
+
+
+def test_binary_is_compact(tmp_path):
+    # Разреженный суп: корзины 64x64 почти пусты, а пара int32 заняла бы 8 байт на клетку
+    path = str(tmp_path / "sparse.gol")
+    cells = soup(2, size=2000, density=0.002)
+    saves.write_positions(path, cells)
+    assert os.path.getsize(path) - saves.HEADER.size <= 3 * len(cells)
+    # Плотный суп упаковывается битовыми картами
+    path = str(tmp_path / "dense.gol")
+    saves.write_positions(path, PATTERNS["soup"])
+    assert os.path.getsize(path) - saves.HEADER.size <= len(PATTERNS["soup"])
+
+
+def test_chunk_keys_for_negative_chunks(tmp_path):
+    # Отрицательные корзины не должны расширяться знаком в старшие 32 бита ключа
+    path = str(tmp_path / "chunks.gol")
+    cells = set()
+    for cx, cy in ((-2, -3), (-1, 0), (0, -1), (1, 1)):
+        cells |= {(cx * 64 + x, cy * 64 + y) for x in range(64) for y in range(64) if (x + y) % 3}
+    saves.write_positions(path, cells)
+    with open(path, "rb") as file:
+        assert saves.HEADER.unpack(file.read(saves.HEADER.size))[2] == saves.CHUNKS
+    assert as_set(saves.read_positions(path)) == cells
+
+
+def test_truncated_binary(tmp_path):
+    path = str(tmp_path / "save.gol")
+    saves.write_positions(path, PATTERNS["row"])
+    with open(path, "r+b") as file:
+        file.truncate(saves.HEADER.size + 10)
+    with pytest.raises(ValueError):
+        saves.read_positions(path)
@@ -0,0 +1,39 @@
+import json
+
+from engine.server import IMAGE, RECT, STATE, SimulationServer, connect, read_message
+from engine.simulation import Simulation
+
+
+def read_until(file, kind):
+    while True:
+        message = read_message(file)
+        assert message is not None, "сервер закрыл соединение"
+        if message[0] == kind:
+            return message
+
+
+def test_bad_messages_are_reported_without_disconnecting(tmp_path):
+    simulation = Simulation()
+    server = SimulationServer(simulation, str(tmp_path / "server.sock"), allow_control=True)
+    server.start()
+    connection = connect(server.address)
+    file = connection.makefile("rb")
+    try:
+        read_until(file, STATE)
+        for message in (dict(command="set_rule", args=["B2/S/C3"]), dict(command="toggle_cells", args=[5]),
+                        [1, 2], dict(command="set_interval", args=["быстро"])):
+            connection.sendall(json.dumps(message).encode() + b"\n")
+            assert json.loads(read_until(file, STATE)[2])["error"]
+
+        # Огромная отдалённая область урезается до max_viewport
+        viewport = [-2 ** 40, -2 ** 40, 2 ** 40, 2 ** 40, 99]
+        connection.sendall(json.dumps(dict(viewport=viewport)).encode() + b"\n")
+        x0, y0, x1, y1, level = RECT.unpack_from(read_until(file, IMAGE)[2])
+        assert (x1 - x0, y1 - y0, level) == (server.max_viewport, server.max_viewport, simulation.max_zoom_out_level)
+
+        connection.sendall(json.dumps(dict(command="set_rule", args=["B36/S23"])).encode() + b"\n")
+        state = json.loads(read_until(file, STATE)[2])
+        assert state["error"] is None and state["rule"] == "B36/S23"
+    finally:
+        connection.close()
+        server.close()
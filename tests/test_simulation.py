@@ -0,0 +1,93 @@
+import pytest
+
+import functools
+
+from engine.bitboard import BitboardEngine
+from engine.bounded import BoundedEngine
+from engine.cycles import Cycle
+from engine.hashlife import HashLifeEngine
+from engine.packed import PackedEngine
+from engine.simulation import Simulation
+from engine.sparse import SparseEngine
+from engine.tiles import TileEngine
+
+BLINKER = {(3, 4), (4, 4), (5, 4)}
+
+
+def run(simulation, steps):
+    # Шаги так же, как их делает воркер, но без его потока
+    for _ in range(steps):
+        with simulation._worker.lock:
+            simulation._worker.generation += simulation._step()
+
+
+# Движки без рождений и смертей тоже находят циклы, в том числе в ограниченном мире и на торе
+CYCLE_ENGINES = [PackedEngine, SparseEngine, HashLifeEngine, TileEngine, BitboardEngine,
+                 functools.partial(BoundedEngine, width=8, height=8),
+                 functools.partial(BoundedEngine, width=8, height=8, torus=True)]
+
+
+@pytest.mark.parametrize("engine", CYCLE_ENGINES)
+def test_cycle_of_loaded_blinker_starts_at_load(engine):
+    simulation = Simulation(engine())
+    simulation.set_positions_of_alive_cells(BLINKER)
+    run(simulation, 3)
+    assert simulation.get_cycle() == Cycle(0, 2)
+
+
+def test_engine_change_drops_found_cycle():
+    simulation = Simulation(PackedEngine())
+    simulation.set_positions_of_alive_cells({(0, 0), (1, 0), (0, 1), (1, 1)})
+    run(simulation, 2)
+    assert simulation.get_cycle() == Cycle(0, 1)
+
+    # В мире шириной в клетку от блока остаются две клетки, и они умирают
+    simulation.set_engine(BoundedEngine(width=1, height=4))
+    assert simulation.get_cycle() is None
+    run(simulation, 2)
+    assert simulation.get_positions_of_alive_cells() == set()
+
+
+@pytest.mark.parametrize("engine", CYCLE_ENGINES)
+def test_auto_pause_stops_on_cycle(engine):
+    simulation = Simulation(engine())
+    simulation.set_positions_of_alive_cells(BLINKER)
+    simulation.set_auto_pause(True)
+    simulation.set_running(True)
+    run(simulation, 3)
+    assert not simulation.is_running()
+
+
+def test_hyper_speed_change_drops_found_cycle():
+    simulation = Simulation(TileEngine())
+    simulation.set_positions_of_alive_cells(BLINKER)
+    simulation.set_hyper_speed(3)
+    run(simulation, 2)
+    assert simulation.get_cycle() == Cycle(0, 8)
+    simulation.set_hyper_speed(3)
+    assert simulation.get_cycle() == Cycle(0, 8)
+    simulation.set_hyper_speed(None)
+    assert simulation.get_cycle() is None
+    run(simulation, 3)
+    assert simulation.get_cycle() == Cycle(16, 2)
+
+
+def test_hashlife_skips_cycle_with_jumps():
+    # Ряд из 10 клеток становится пентадекатлоном с периодом 15
+    row = {(x, 0) for x in range(10)}
+    simulation = Simulation(HashLifeEngine())
+    simulation.set_positions_of_alive_cells(row)
+    run(simulation, 40)
+    assert simulation.get_cycle().period == 15
+
+    def single_step():
+        raise AssertionError("остаток периода досчитывается по одному поколению")
+    simulation.get_engine().calculate_next_gen = single_step
+    simulation.seek(1051)
+
+    reference = SparseEngine()
+    reference.set_positions_of_alive_cells(row)
+    for _ in range(1051):
+        reference.calculate_next_gen()
+    assert simulation.get_generation() == 1051
+    assert set(simulation.get_positions_of_alive_cells()) == reference.get_positions_of_alive_cells()
@@ -0,0 +1,23 @@
+import threading
+
+from engine import ParallelEngine
+from engine.simulation import Simulation
+
+
+def test_set_workers_waits_for_generation():
+    simulation = Simulation(ParallelEngine(workers=1))
+    simulation.set_positions_of_alive_cells({(0, 0), (1, 0), (2, 0)})
+
+    # Воркер посреди поколения: пул нельзя закрывать, пока он не закончит
+    simulation._worker.lock.acquire()
+    changer = threading.Thread(target=simulation.set_workers, args=(2,))
+    changer.start()
+    changer.join(0.2)
+    try:
+        assert changer.is_alive()
+        assert simulation.get_engine().workers == 1
+    finally:
+        simulation._worker.lock.release()
+    changer.join(5)
+    assert simulation.get_engine().workers == 2
+    simulation.get_engine().close()